@@ -1,22 +1,191 @@
+import mmap
+import os
 import re
+from array import array
+from collections import namedtuple
+from itertools import islice
 
 # Analisis Lexico
 token_patron = {
-    "KEYWORD": r"\b(if|else|while|return|int|float|void|for|print|scanf)\b",
+    "KEYWORD": r"\b(?:if|else|while|return|int|float|void|for|print|scanf)\b",
     "IDENTIFIER": r"\b[a-zA-Z_][a-zA-Z0-9_]*\b",
-    "NUMBER": r"\b\d+(\.\d+)?\b",
-    "OPERATOR": r"(==|!=|<=|>=|&&|\|\||\+\+|--|[+\-*/=<>!&])",
-    "STRING": r'"([^"]*)"',
+    "NUMBER": r"\b\d+(?:\.\d+)?\b",
+    "OPERATOR": r"(?:==|!=|<=|>=|&&|\|\||\+\+|--|[+\-*/=<>!&])",
+    "STRING": r'"(?:[^"]*)"',
     "DELIMITER": r"[(),;{}]",
     "WHITESPACE": r"\s+",
 }
 
+IGNORADOS = frozenset(["WHITESPACE"])
+
+# Registro compacto de un token: offset en caracteres (o bytes si la fuente es
+# binaria), linea y columna empiezan en 1
+Token = namedtuple("Token", ["tipo", "valor", "offset", "linea", "columna"])
+
+# Identificadores numericos de tipo para BufferTokens; 0 marca el fin de la entrada
+TIPOS = ("FIN",) + tuple(token_patron)
+TIPO_ID = {tipo: i for i, tipo in enumerate(TIPOS)}
+FIN = TIPO_ID["FIN"]
+
+
+class AnalizadorLexico:
+    def __init__(self, patrones=token_patron, ignorados=IGNORADOS):
+        # El patron general se compila una sola vez; los grupos internos son
+        # no capturantes para que match.lastgroup sea siempre el tipo de token
+        patron_general = "|".join(f"(?P<{token}>{patron})" for token, patron in patrones.items())
+        self.patron_regex = re.compile(patron_general)
+        self.patron_bytes = re.compile(patron_general.encode())
+        self.ignorados = ignorados
+
+    def tokenizar(self, text):
+        ignorados = self.ignorados
+        for match in self.patron_regex.finditer(text):
+            tipo = match.lastgroup
+            if tipo not in ignorados:
+                yield (tipo, match.group())
+
+    def flujo(self, fuente):
+        if isinstance(fuente, str):
+            return self._recorrer(self.patron_regex, fuente, "\n", False)
+        return self._recorrer(self.patron_bytes, fuente, b"\n", True)
+
+    def flujo_archivo(self, ruta):
+        with open(ruta, "rb") as archivo:
+            if os.fstat(archivo.fileno()).st_size == 0:
+                return
+            with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as datos:
+                yield from self._recorrer(self.patron_bytes, datos, b"\n", True)
+
+    def _recorrer(self, patron, texto, salto, decodificar):
+        ignorados = self.ignorados
+        linea = 1
+        inicio_linea = 0
+        for match in patron.finditer(texto):
+            tipo = match.lastgroup
+            valor = match.group()
+            inicio = match.start()
+            if tipo not in ignorados:
+                yield Token(tipo, valor.decode() if decodificar else valor, inicio, linea, inicio - inicio_linea + 1)
+            # Solo los espacios y las cadenas pueden contener saltos de linea
+            if salto in valor:
+                linea += valor.count(salto)
+                inicio_linea = inicio + valor.rindex(salto) + 1
+
+
+lexer = AnalizadorLexico()
+
+
+class BufferTokens:
+    # Tokens en arreglos paralelos: tipo (1 byte), indice en la tabla de valores
+    # internados, offset en la fuente, linea y columna. Si se indica un bloque,
+    # el flujo se carga por partes y recargar() descarta los tokens consumidos
+    def __init__(self, tokens=None, bloque=None):
+        self.tipos = array("B")
+        self.ids = array("L")
+        self.offsets = array("q")
+        self.lineas = array("L")
+        self.columnas = array("L")
+        # El valor None (id 0) corresponde al token FIN que cierra la entrada
+        self.valores = [None]
+        self.id_valor = {None: 0}
+        self.base = 0
+        self.bloque = bloque
+        self.agotado = False
+        if tokens is not None:
+            self._fuente = iter(tokens)
+            self._cargar(bloque)
+    
+    @classmethod
+    def desde_texto(cls, texto):
+        buffer = cls()
+        buffer._cargar_texto(texto, lexer)
+        return buffer
+    
+    @classmethod
+    def desde_archivo(cls, ruta, bloque=4096):
+        return cls(lexer.flujo_archivo(ruta), bloque)
+    
+    def __len__(self):
+        return len(self.tipos)
+    
+    def agregar(self, token):
+        valor = token[1]
+        id_valor = self.id_valor.get(valor)
+        if id_valor is None:
+            id_valor = self.id_valor[valor] = len(self.valores)
+            self.valores.append(valor)
+        self.tipos.append(TIPO_ID[token[0]])
+        self.ids.append(id_valor)
+        if len(token) > 2:
+            self.offsets.append(token[2])
+            self.lineas.append(token[3])
+            self.columnas.append(token[4])
+        else:
+            # Tuplas (tipo, valor) sin informacion de posicion
+            self.offsets.append(-1)
+            self.lineas.append(0)
+            self.columnas.append(0)
+    
+    def _cargar(self, cantidad):
+        antes = len(self.tipos)
+        for token in islice(self._fuente, cantidad):
+            self.agregar(token)
+        if cantidad is None or len(self.tipos) - antes < cantidad:
+            self.agotado = True
+            self.agregar(("FIN", None, -1, 0, 0))
+    
+    def _cargar_texto(self, texto, analizador):
+        # Igual que cargar analizador.flujo(texto) pero sin crear un Token por coincidencia
+        tipos, ids, offsets, lineas, columnas = self.tipos, self.ids, self.offsets, self.lineas, self.columnas
+        valores, id_valor, ignorados = self.valores, self.id_valor, analizador.ignorados
+        linea = 1
+        inicio_linea = 0
+        for match in analizador.patron_regex.finditer(texto):
+            tipo = match.lastgroup
+            valor = match.group()
+            inicio = match.start()
+            if tipo not in ignorados:
+                id_actual = id_valor.get(valor)
+                if id_actual is None:
+                    id_actual = id_valor[valor] = len(valores)
+                    valores.append(valor)
+                tipos.append(TIPO_ID[tipo])
+                ids.append(id_actual)
+                offsets.append(inicio)
+                lineas.append(linea)
+                columnas.append(inicio - inicio_linea + 1)
+            if "\n" in valor:
+                linea += valor.count("\n")
+                inicio_linea = inicio + valor.rindex("\n") + 1
+        self.agotado = True
+        self.agregar(("FIN", None, -1, 0, 0))
+    
+    def recargar(self, desde):
+        # Descarta los tokens anteriores a 'desde' y carga el siguiente bloque.
+        # Devuelve cuantos tokens se descartaron para que el llamador ajuste sus indices
+        for arreglo in (self.tipos, self.ids, self.offsets, self.lineas, self.columnas):
+            del arreglo[:desde]
+        self.base += desde
+        self._cargar(self.bloque)
+        return desde
+    
+    def tipo(self, i):
+        return TIPOS[self.tipos[i]]
+    
+    def valor(self, i):
+        return self.valores[self.ids[i]]
+    
+    def token(self, i):
+        return Token(TIPOS[self.tipos[i]], self.valores[self.ids[i]], self.offsets[i], self.lineas[i], self.columnas[i])
+
+
 def identificar(text):
-    patron_general = "|".join(f"(?P<{token}>{patron})" for token, patron in token_patron.items())
-    patron_regex = re.compile(patron_general)
-    tokens_encontrados = []
-    for match in patron_regex.finditer(text):
-        for token, valor in match.groupdict().items():
-            if valor is not None and token != "WHITESPACE":
-                tokens_encontrados.append((token, valor))
-    return tokens_encontrados
+    return list(lexer.tokenizar(text))
+
+
+def identificar_flujo(fuente):
+    return lexer.flujo(fuente)
+
+
+def identificar_archivo(ruta):
+    return lexer.flujo_archivo(ruta)
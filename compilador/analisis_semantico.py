@@ -1,3 +1,6 @@
+from nodes import *
+
+
 class TablaSimbolos:
     def __init__(self, padre=None):
         self.padre = padre
@@ -50,53 +53,85 @@ class TablaSimbolos:
         else:
             raise Exception(f"Error: La funcion '{nombre}' no a sido declarada")
         
-class AnalizadorSemantico:
+class AnalizadorSemantico(Visitante):
+    # Recorre el AST con Visitante: entrar() abre el ambito de cada funcion y
+    # los metodos analizar_<Nodo> se aplican en post-orden con los tipos ya
+    # calculados de sus hijos. Las funciones se declaran todas al entrar al
+    # programa, asi se puede llamar a una que esta definida mas abajo, y cada
+    # cuerpo de if, else, while y for tiene su propio ambito
     def __init__(self):
         self.tabla_global = TablaSimbolos()
         self.tabla_actual = self.tabla_global
         self.funcion_actual = None
         
     def analizar(self, nodo):
+        return self.recorrer(nodo)
+    
+    def entrar(self, nodo):
+        if isinstance(nodo, NodoPrograma):
+            for funcion in nodo.funciones:
+                self.declarar_funcion(funcion)
+        if isinstance(nodo, NodoFuncion):
+            self.entrar_funcion(nodo)
+        # Las variables de scanf se declaran al leerlas, no se analizan como expresiones
+        return not isinstance(nodo, NodoScanf)
+    
+    def pasos(self, nodo):
+        # El if, el while y el for visitan sus hijos en el orden de siempre,
+        # con acciones que abren y cierran el ambito de cada cuerpo. La
+        # variable de un for se declara dentro del ambito del for
+        if isinstance(nodo, NodoIf):
+            return [nodo.condicion, self.abrir_ambito, *nodo.cuerpo, self.cerrar_ambito,
+                    self.abrir_ambito, *nodo.cuerpo_else, self.cerrar_ambito]
+        if isinstance(nodo, NodoWhile):
+            return [nodo.condicion, self.abrir_ambito, *nodo.cuerpo, self.cerrar_ambito]
+        if isinstance(nodo, NodoFor):
+            return [self.abrir_ambito, nodo.inicializacion, nodo.condicion, nodo.incremento, *nodo.cuerpo, self.cerrar_ambito]
+        return None
+    
+    def abrir_ambito(self):
+        self.tabla_actual = TablaSimbolos(padre=self.tabla_actual)
+        
+    def cerrar_ambito(self):
+        self.tabla_actual = self.tabla_actual.padre
+        
+    def salir(self, nodo, hijos):
         metodo = f"analizar_{type(nodo).__name__}"
         if hasattr(self, metodo):
-            return getattr(self, metodo)(nodo)
+            return getattr(self, metodo)(nodo, *(hijos or ()))
         else:
             return None
         
-    def analizar_nodoPrograma(self, nodo):
-        for funcion in nodo.funciones:
-            self.analizar(funcion)
-        
+    def analizar_NodoPrograma(self, nodo, funciones):
         if not nodo.tiene_main():
             raise Exception("Error: No se encontro la funcion main")
         
-    def analizar_nodoFuncion(self, nodo):
+    def declarar_funcion(self, nodo):
         self.tabla_global.declarar_funcion(
             nodo.nombre,
             nodo.tipo,
             [(p.tipo, p.nombre) for p in nodo.parametros]
         )
         
+    def entrar_funcion(self, nodo):
+        # Una funcion analizada sola, fuera de un programa, no se declaro antes
+        if nodo.nombre not in self.tabla_global.funciones:
+            self.declarar_funcion(nodo)
+        
+        # Los parametros se declaran al visitar cada NodoParametro dentro de este ambito
         ambito_funcion = TablaSimbolos(padre=self.tabla_global)
         self.tabla_actual = ambito_funcion
         self.funcion_actual = nodo.nombre
         
-        for param in nodo.parametros:
-            self.tabla_actual.declarar_variable(param.nombre, param.tipo)
-            
-        for instruccion in nodo.cuerpo:
-            self.analizar(instruccion)
-            
+    def analizar_NodoFuncion(self, nodo, parametros, cuerpo):
         self.tabla_actual = self.tabla_global
         self.funcion_actual = None
         
-    def analizar_nodoParametro(self, nodo):
+    def analizar_NodoParametro(self, nodo):
         self.tabla_actual.declarar_variable(nodo.nombre, nodo.tipo)
         return nodo.tipo
     
-    def analizar_nodoAsignacion(self, nodo):
-        tipo_expresion = self.analizar(nodo.expresion)
-        
+    def analizar_NodoAsignacion(self, nodo, tipo_expresion):
         if nodo.tipo:
             if nodo.tipo != tipo_expresion:
                 raise Exception(f"Error semantico: Tipo de expresion ({tipo_expresion}) no coincide con el tipo de la variable ({nodo.tipo}) para '{nodo.nombre}'")
@@ -106,80 +141,66 @@ class AnalizadorSemantico:
             if tipo_variable != tipo_expresion:
                 raise Exception(f"Error semantico: Tipo de expresion ({tipo_expresion}) no coincide con el tipo de la variable ({tipo_variable}) para '{nodo.nombre}'")
             
-    def analizar_nodoIdentificador(self, nodo):
+    def analizar_NodoIdentificador(self, nodo):
         return self.tabla_actual.obtener_tipo_variable(nodo.nombre)
     
-    def analizar_nodoNumero(self, nodo):
-        return "int" if "." not in nodo.valor else "float"
+    def analizar_NodoNumero(self, nodo):
+        return "float" if isinstance(nodo.numero, float) else "int"
     
-    def analizar_nodoOperacion(self, nodo):
-        tipo_izquierda = self.analizar(nodo.izquierda)
-        tipo_derecha = self.analizar(nodo.derecha)
+    def analizar_NodoFloat(self, nodo):
+        return "float"
         
+    def analizar_NodoOperacion(self, nodo, tipo_izquierda, tipo_derecha):
         if tipo_izquierda != tipo_derecha:
             raise Exception(f"Error semantico: Tipos incompatibles en la operacion '{nodo.operador}' ({tipo_izquierda} y {tipo_derecha})")
         return tipo_izquierda
     
-    def analizar_scanf(self, nodo_scanf):
-        for var in nodo_scanf.variables:
-            var_name = var.nombre
-            if var_name not in self.tabla_simbolos:
-                self.tabla_simbolos[var_name] = {
-                    'tipo': 'int', 
-                    'ambito': self.ambito_actual,
-                    'declarada_en': 'scanf'
-                }
+    def analizar_NodoOperacionUnaria(self, nodo, tipo_operando):
+        return tipo_operando
             
-    def analizar_nodoRetorno(self, nodo):
+    def analizar_NodoScanf(self, nodo):
+        # scanf puede declarar implicitamente variables enteras
+        for var in nodo.variables:
+            try:
+                self.tabla_actual.obtener_tipo_variable(var.nombre)
+            except Exception:
+                self.tabla_actual.declarar_variable(var.nombre, "int")
+    
+    def analizar_NodoRetorno(self, nodo, tipo_expresion):
         if not self.funcion_actual:
             raise Exception("Error semantico: 'return' fuera de la funcion")
         
-        tipo_expresion = self.analizar(nodo.expresion)
         tipo_funcion = self.tabla_global.obtener_funcion(self.funcion_actual)["tipo_retorno"]
         
         if tipo_expresion != tipo_funcion:
             raise Exception(f"Error semantico: Tipo de retorno de la funcion '{self.funcion_actual}' no coincide con el tipo de la expresion ({tipo_expresion} != {tipo_funcion})")
         return tipo_expresion
     
-    def analizar_nodoIf(self, nodo):
-        tipo_condicion = self.analizar(nodo.condicion)
+    def analizar_NodoIf(self, nodo, tipo_condicion, *cuerpos):
         if tipo_condicion != "int":
             raise Exception(f"Error semantico: La condicion del if debe ser de tipo 'int', pero se encontro '{tipo_condicion}'")
-        for instruccion in nodo.cuerpo:
-            self.analizar(instruccion)
             
-    def analizar_nodoFor(self, nodo):
-        tipo_inicializacion = self.analizar(nodo.inicializacion)
-        tipo_condicion = self.analizar(nodo.condicion)
-        tipo_incremento = self.analizar(nodo.incremento)
-        
+    def analizar_NodoFor(self, nodo, tipo_inicializacion, tipo_condicion, tipo_incremento, *cuerpo):
         if tipo_condicion != "int":
             raise Exception(f"Error semantico: La condicion del for debe ser de tipo 'int', pero se encontro '{tipo_condicion}'")
         if tipo_inicializacion != tipo_incremento:
             raise Exception(f"Error semantico: Tipos incompatibles en la inicializacion y el incremento del for ({tipo_inicializacion} y {tipo_incremento})")
         
-        for instruccion in nodo.cuerpo:
-            self.analizar(instruccion)
-            
-    def analizar_nodoWhile(self, nodo):
-        tipo_condicion = self.analizar(nodo.condicion)
+    def analizar_NodoWhile(self, nodo, tipo_condicion, *cuerpo):
         if tipo_condicion != "int":
             raise Exception(f"Error semantico: La condicion del while debe ser de tipo 'int', pero se encontro '{tipo_condicion}'")
-        for instruccion in nodo.cuerpo:
-            self.analizar(instruccion)
         
-    def analizar_nodoLlamadaFuncion(self, nodo):
+    def analizar_NodoLlamadaFuncion(self, nodo, tipos_argumentos):
         try:
             info_funcion = self.tabla_global.obtener_funcion(nodo.nombre)
         except Exception as e:
             raise Exception(f"Error semantico: Funcion '{nodo.nombre}' no declarada")
         
         if len(nodo.argumentos) != len(info_funcion["parametros"]):
-            raise Exception(f"Error semantico: La funcion '{nodo.nombre}' espera {len(info_funcion("parametros"))} argumentos, pero se proporcionaron {len(nodo.argumentos)}")
+            raise Exception(f"Error semantico: La funcion '{nodo.nombre}' espera {len(info_funcion['parametros'])} argumentos, pero se proporcionaron {len(nodo.argumentos)}")
         
-        for i, (arg, (tipo_parametro, _)) in enumerate(zip(nodo.argumentos, info_funcion["parametros"])):
-            tipo_argumento = self.analizar(arg)
+        for i, (tipo_argumento, (tipo_parametro, _)) in enumerate(zip(tipos_argumentos, info_funcion["parametros"])):
             if tipo_argumento != tipo_parametro:
                 raise Exception(f"Error semantico: El argumento {i+1} de la funcion '{nodo.nombre}' es de tipo '{tipo_argumento}', pero se esperaba '{tipo_parametro}'")
             
-            return info_funcion["tipo_retorno"]
+        return info_funcion["tipo_retorno"]
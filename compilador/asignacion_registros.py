@@ -0,0 +1,70 @@
+from nodes import *
+from bisect import insort
+
+# Asignacion de registros por barrido lineal (Poletto y Sarkar). Las
+# posiciones son el orden de los nodos de la funcion en pre-orden; el
+# intervalo de vida de una variable va desde su primera aparicion hasta la
+# ultima. Como el valor de una variable usada dentro de un ciclo puede volver
+# por el salto hacia atras, su intervalo se extiende a todo el ciclo.
+#
+# Solo se usan registros que preservan las llamadas en la convencion de
+# Windows x64, asi printf, scanf y las funciones del programa no los pisan;
+# rax, rbx, rcx, rdx, r8 y r9 siguen siendo los registros de trabajo del
+# generador y r10/r11 sus temporales
+
+REGISTROS_VARIABLES = ("rsi", "rdi", "r12", "r13", "r14", "r15")
+
+
+def intervalos_de_vida(funcion):
+    # nombre -> [inicio, fin] para las variables locales de la funcion: los
+    # parametros que llegan en registros, las declaraciones y las variables
+    # que lee scanf. Los demas nombres son simbolos externos
+    intervalos = {}
+    locales = {parametro.nombre for parametro in funcion.parametros[:4]}
+    ciclos = []
+    for posicion, nodo in enumerate(iterar_nodos(funcion)):
+        if isinstance(nodo, (NodoWhile, NodoFor)):
+            ciclos.append((posicion, posicion + sum(1 for _ in iterar_nodos(nodo)) - 1))
+        elif isinstance(nodo, (NodoIdentificador, NodoAsignacion, NodoIncremento, NodoParametro)):
+            intervalo = intervalos.setdefault(nodo.nombre, [posicion, posicion])
+            intervalo[1] = posicion
+            if isinstance(nodo, NodoAsignacion) and nodo.tipo:
+                locales.add(nodo.nombre)
+        elif isinstance(nodo, NodoScanf):
+            locales.update(variable.nombre for variable in nodo.variables)
+    locales.difference_update(parametro.nombre for parametro in funcion.parametros[4:])
+    intervalos = {nombre: intervalo for nombre, intervalo in intervalos.items() if nombre in locales}
+    
+    # Los ciclos internos van despues de los externos en pre-orden; al
+    # extender primero los internos, la extension del externo ya los abarca
+    for inicio, fin in reversed(ciclos):
+        for intervalo in intervalos.values():
+            if intervalo[0] <= fin and intervalo[1] >= inicio:
+                intervalo[0] = min(intervalo[0], inicio)
+                intervalo[1] = max(intervalo[1], fin)
+    return intervalos
+
+
+def barrido_lineal(intervalos, registros=REGISTROS_VARIABLES):
+    # nombre -> registro; las variables que no aparecen quedan en memoria.
+    # Sin registros libres se desaloja el intervalo que termina mas tarde,
+    # que es el que mas tiempo tendria ocupado el registro
+    asignacion = {}
+    activos = []
+    libres = list(reversed(registros))
+    for nombre, (inicio, fin) in sorted(intervalos.items(), key=lambda elemento: elemento[1][0]):
+        while activos and activos[0][0] < inicio:
+            _, terminado = activos.pop(0)
+            libres.append(asignacion[terminado])
+        if libres:
+            asignacion[nombre] = libres.pop()
+            insort(activos, (fin, nombre))
+        elif activos[-1][0] > fin:
+            _, desalojado = activos.pop()
+            asignacion[nombre] = asignacion.pop(desalojado)
+            insort(activos, (fin, nombre))
+    return asignacion
+
+
+def asignar_registros(funcion, registros=REGISTROS_VARIABLES):
+    return barrido_lineal(intervalos_de_vida(funcion), registros)
@@ -0,0 +1,374 @@
+from nodes import *
+from array import array
+import json
+import mmap
+import os
+import struct
+import sys
+
+# Formato binario del AST. Los nodos se guardan en tablas planas en post-orden
+# (los hijos antes que el padre) y las hojas compartidas se guardan una sola vez:
+#
+#   encabezado    MAGICO, version y cantidad de secciones
+#   esquema       JSON pequeno con el nombre de cada clase, el tipo de cada uno
+#                 de sus campos, el orden de bytes y el indice de la raiz
+#   etiquetas     tipo de cada valor del pool (None, str, int o float)
+#   offsets       inicio de cada valor del pool dentro de 'textos'
+#   textos        los valores del pool como texto UTF-8
+#   tipos         clase de cada nodo (indice en el esquema)
+#   inicios       posicion de los campos de cada nodo dentro de 'datos'
+#   datos         los campos de cada nodo: indice en el pool para los valores,
+#                 indice de nodo + 1 (0 si es None) para los hijos, y cantidad
+#                 e inicio en 'hijos' para las tuplas de nodos
+#   hijos         indices de nodo de todas las tuplas de hijos
+#
+# Cada tabla usa el tipo entero sin signo mas chico que alcanza (B, H o I),
+# indicado en el esquema. Cada seccion va precedida por su longitud y alineada
+# a 8 bytes, asi que al abrir el archivo con mmap las tablas se leen sin copiarlas
+
+MAGICO = b"ASTB"
+VERSION = 1
+SECCIONES = ("esquema", "etiquetas", "offsets", "textos", "tipos", "inicios", "datos", "hijos")
+
+# Tipos de campo en el esquema
+VALOR, NODO, SECUENCIA = 0, 1, 2
+
+# Etiquetas del pool de valores
+NULO, TEXTO, ENTERO, REAL = 0, 1, 2, 3
+
+_ENCABEZADO = struct.Struct("<4sII")
+_LONGITUD = struct.Struct("<Q")
+
+# Marca de los valores del pool que todavia no se decodificaron
+_SIN_LEER = object()
+
+CLASES = {clase.__name__: clase for clase in NodoAST.__subclasses__()}
+
+
+def _alinear(n):
+    return (n + 7) & ~7
+
+
+class _Escritor:
+    def __init__(self):
+        self.clases = []
+        self.id_clase = {}
+        self.etiquetas = array("B")
+        self.valores = []
+        self.id_valor = {}
+        self.tipos = array("B")
+        self.inicios = array("I")
+        self.datos = array("I")
+        self.hijos = array("I")
+        self.indices = {}
+    
+    def valor(self, valor):
+        # La clave incluye el tipo para no confundir 1, 1.0 y "1"
+        clave = (type(valor), valor)
+        indice = self.id_valor.get(clave)
+        if indice is None:
+            indice = self.id_valor[clave] = len(self.valores)
+            if valor is None:
+                self.etiquetas.append(NULO)
+                self.valores.append(b"")
+            elif isinstance(valor, str):
+                self.etiquetas.append(TEXTO)
+                self.valores.append(valor.encode("utf-8"))
+            elif isinstance(valor, int):
+                self.etiquetas.append(ENTERO)
+                self.valores.append(str(valor).encode())
+            else:
+                self.etiquetas.append(REAL)
+                self.valores.append(repr(float(valor)).encode())
+        return indice
+    
+    def clase(self, nodo):
+        clase = type(nodo)
+        indice = self.id_clase.get(clase)
+        if indice is None:
+            tipos_campo = []
+            for campo in clase.campos:
+                if campo not in clase.campos_hijos:
+                    tipos_campo.append(VALOR)
+                elif type(getattr(nodo, campo)) is tuple:
+                    tipos_campo.append(SECUENCIA)
+                else:
+                    tipos_campo.append(NODO)
+            indice = self.id_clase[clase] = len(self.clases)
+            self.clases.append([clase.__name__, tipos_campo])
+        return indice
+    
+    def agregar(self, nodo):
+        id_clase = self.clase(nodo)
+        self.tipos.append(id_clase)
+        self.inicios.append(len(self.datos))
+        for campo, tipo_campo in zip(nodo.campos, self.clases[id_clase][1]):
+            valor = getattr(nodo, campo)
+            if tipo_campo == VALOR:
+                self.datos.append(self.valor(valor))
+            elif tipo_campo == NODO:
+                self.datos.append(0 if valor is None else self.indices[id(valor)] + 1)
+            else:
+                self.datos.append(len(valor))
+                self.datos.append(len(self.hijos))
+                self.hijos.extend(self.indices[id(hijo)] for hijo in valor)
+        self.indices[id(nodo)] = len(self.tipos) - 1
+    
+    def recorrer(self, raiz):
+        # Post-orden iterativo; un nodo que ya tiene indice (hoja compartida) no se repite
+        pila = [(raiz, False)]
+        while pila:
+            nodo, listo = pila.pop()
+            if id(nodo) in self.indices:
+                continue
+            if listo:
+                self.agregar(nodo)
+                continue
+            pila.append((nodo, True))
+            for campo in reversed(nodo.campos_hijos):
+                valor = getattr(nodo, campo)
+                if type(valor) is tuple:
+                    pila.extend((hijo, False) for hijo in reversed(valor))
+                elif valor is not None:
+                    pila.append((valor, False))
+        return self.indices[id(raiz)]
+    
+    def secciones(self, raiz):
+        offsets = array("I", [0])
+        for valor in self.valores:
+            offsets.append(offsets[-1] + len(valor))
+        tablas = {
+            "offsets": _compactar(offsets),
+            "inicios": _compactar(self.inicios),
+            "datos": _compactar(self.datos),
+            "hijos": _compactar(self.hijos),
+        }
+        esquema = {
+            "clases": self.clases,
+            "orden": sys.byteorder,
+            "raiz": raiz,
+            "formatos": {nombre: tabla.typecode for nombre, tabla in tablas.items()},
+        }
+        return [
+            json.dumps(esquema).encode(),
+            self.etiquetas.tobytes(),
+            tablas["offsets"].tobytes(),
+            b"".join(self.valores),
+            self.tipos.tobytes(),
+            tablas["inicios"].tobytes(),
+            tablas["datos"].tobytes(),
+            tablas["hijos"].tobytes(),
+        ]
+
+
+def _compactar(tabla):
+    maximo = max(tabla, default=0)
+    for formato in ("B", "H"):
+        if maximo < 1 << (8 * array(formato).itemsize):
+            return array(formato, tabla)
+    return tabla
+
+
+def escribir_ast_binario(ast, archivo):
+    escritor = _Escritor()
+    raiz = escritor.recorrer(ast)
+    archivo.write(_ENCABEZADO.pack(MAGICO, VERSION, len(SECCIONES)))
+    posicion = _ENCABEZADO.size
+    for seccion in escritor.secciones(raiz):
+        relleno = _alinear(posicion + _LONGITUD.size) - posicion - _LONGITUD.size
+        archivo.write(b"\0" * relleno)
+        archivo.write(_LONGITUD.pack(len(seccion)))
+        archivo.write(seccion)
+        posicion += relleno + _LONGITUD.size + len(seccion)
+
+
+def guardar_ast_binario(ast, ruta):
+    with open(ruta, "wb") as archivo:
+        escribir_ast_binario(ast, archivo)
+
+
+class ArchivoAST:
+    # AST binario abierto con mmap. Los nodos se construyen solo cuando se
+    # piden: funcion(nombre) materializa una sola funcion sin tocar el resto
+    # del archivo, y programa() el arbol completo. Los nodos ya construidos se
+    # reutilizan, asi que las hojas compartidas siguen siendo el mismo objeto
+    def __init__(self, ruta):
+        self._archivo = open(ruta, "rb")
+        if os.fstat(self._archivo.fileno()).st_size < _ENCABEZADO.size:
+            self._archivo.close()
+            raise ValueError(f"{ruta} no es un AST binario")
+        self._mapa = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        self._vistas = []
+        try:
+            self._leer_secciones(ruta)
+        except Exception:
+            self.cerrar()
+            raise
+        self._nodos = [None] * len(self._tipos)
+        self._valores = [_SIN_LEER] * len(self._etiquetas)
+    
+    def _leer_secciones(self, ruta):
+        magico, version, cantidad = _ENCABEZADO.unpack_from(self._mapa, 0)
+        if magico != MAGICO:
+            raise ValueError(f"{ruta} no es un AST binario")
+        if version != VERSION or cantidad != len(SECCIONES):
+            raise ValueError(f"Version de AST binario no soportada: {version}")
+        memoria = memoryview(self._mapa)
+        self._vistas.append(memoria)
+        secciones = []
+        posicion = _ENCABEZADO.size
+        for _ in range(cantidad):
+            posicion = _alinear(posicion + _LONGITUD.size) - _LONGITUD.size
+            longitud, = _LONGITUD.unpack_from(self._mapa, posicion)
+            posicion += _LONGITUD.size
+            secciones.append(memoria[posicion:posicion + longitud])
+            posicion += longitud
+        self._vistas.extend(secciones)
+        esquema, etiquetas, offsets, textos, tipos, inicios, datos, hijos = secciones
+        
+        esquema = json.loads(bytes(esquema))
+        self.clases = [(CLASES[nombre], tipos_campo) for nombre, tipos_campo in esquema["clases"]]
+        self.raiz = esquema["raiz"]
+        self._textos = textos
+        self._etiquetas = etiquetas
+        formatos = esquema["formatos"]
+        self._offsets = self._tabla(offsets, formatos["offsets"], esquema["orden"])
+        self._tipos = tipos
+        self._inicios = self._tabla(inicios, formatos["inicios"], esquema["orden"])
+        self._datos = self._tabla(datos, formatos["datos"], esquema["orden"])
+        self._hijos = self._tabla(hijos, formatos["hijos"], esquema["orden"])
+    
+    def _tabla(self, vista, formato, orden):
+        if orden == sys.byteorder or formato == "B":
+            tabla = vista.cast(formato)
+            self._vistas.append(tabla)
+            return tabla
+        # Archivo escrito con otro orden de bytes: se copia y se invierte
+        tabla = array(formato, vista.tobytes())
+        tabla.byteswap()
+        return tabla
+    
+    def __len__(self):
+        return len(self._tipos)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *excepcion):
+        self.cerrar()
+    
+    def cerrar(self):
+        for vista in reversed(self._vistas):
+            vista.release()
+        self._vistas = []
+        self._mapa.close()
+        self._archivo.close()
+    
+    def valor(self, indice):
+        valor = self._valores[indice]
+        if valor is _SIN_LEER:
+            etiqueta = self._etiquetas[indice]
+            texto = bytes(self._textos[self._offsets[indice]:self._offsets[indice + 1]])
+            if etiqueta == NULO:
+                valor = None
+            elif etiqueta == TEXTO:
+                valor = texto.decode("utf-8")
+            elif etiqueta == ENTERO:
+                valor = int(texto)
+            else:
+                valor = float(texto)
+            self._valores[indice] = valor
+        return valor
+    
+    def _campos(self, indice):
+        # (tipo de campo, dato) de cada campo del nodo, sin construirlo
+        tipos_campo = self.clases[self._tipos[indice]][1]
+        posicion = self._inicios[indice]
+        for tipo_campo in tipos_campo:
+            if tipo_campo == SECUENCIA:
+                cantidad, inicio = self._datos[posicion], self._datos[posicion + 1]
+                yield tipo_campo, self._hijos[inicio:inicio + cantidad]
+                posicion += 2
+            else:
+                yield tipo_campo, self._datos[posicion]
+                posicion += 1
+    
+    def _indices_hijos(self, indice):
+        for tipo_campo, dato in self._campos(indice):
+            if tipo_campo == SECUENCIA:
+                yield from dato
+            elif tipo_campo == NODO and dato:
+                yield dato - 1
+    
+    def _construir(self, indices):
+        # Construye los nodos en orden creciente de indice: como la tabla esta
+        # en post-orden, los hijos de cada nodo ya estan construidos
+        construidos, valores, valor = self._nodos, self._valores, self.valor
+        clases, tipos, inicios, datos, hijos = self.clases, self._tipos, self._inicios, self._datos, self._hijos
+        for indice in indices:
+            clase, tipos_campo = clases[tipos[indice]]
+            posicion = inicios[indice]
+            argumentos = []
+            for tipo_campo in tipos_campo:
+                dato = datos[posicion]
+                if tipo_campo == VALOR:
+                    resultado = valores[dato]
+                    argumentos.append(valor(dato) if resultado is _SIN_LEER else resultado)
+                elif tipo_campo == NODO:
+                    argumentos.append(construidos[dato - 1] if dato else None)
+                else:
+                    inicio = datos[posicion + 1]
+                    argumentos.append(tuple([construidos[hijo] for hijo in hijos[inicio:inicio + dato]]))
+                    posicion += 1
+                posicion += 1
+            construidos[indice] = clase(*argumentos)
+    
+    def nodo(self, indice):
+        # Reune con una pila explicita los nodos del subarbol que faltan y los construye
+        construidos = self._nodos
+        faltantes = set()
+        pila = [indice]
+        while pila:
+            actual = pila.pop()
+            if construidos[actual] is None and actual not in faltantes:
+                faltantes.add(actual)
+                pila.extend(self._indices_hijos(actual))
+        self._construir(sorted(faltantes))
+        return construidos[indice]
+    
+    def programa(self):
+        construidos = self._nodos
+        self._construir([indice for indice in range(self.raiz + 1) if construidos[indice] is None])
+        return construidos[self.raiz]
+    
+    def _funciones(self):
+        # Indices de las funciones del programa, leidos sin construir nodos
+        for tipo_campo, dato in self._campos(self.raiz):
+            if tipo_campo == SECUENCIA:
+                return list(dato)
+        return []
+    
+    def nombres_funciones(self):
+        nombres = []
+        for indice in self._funciones():
+            clase = self.clases[self._tipos[indice]][0]
+            for campo, (_, dato) in zip(clase.campos, self._campos(indice)):
+                if campo == "nombre":
+                    nombres.append(self.valor(dato))
+                    break
+        return nombres
+    
+    def funcion(self, nombre):
+        for indice, nombre_funcion in zip(self._funciones(), self.nombres_funciones()):
+            if nombre_funcion == nombre:
+                return self.nodo(indice)
+        raise KeyError(f"La funcion '{nombre}' no esta en el AST")
+
+
+def abrir_ast_binario(ruta):
+    return ArchivoAST(ruta)
+
+
+def cargar_ast_binario(ruta):
+    with ArchivoAST(ruta) as archivo:
+        return archivo.programa()
@@ -0,0 +1,808 @@
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+import analisis_lexico
+import ast_binario
+import generate_ast_json
+import optimizador
+import seleccion
+from cadenas import bytes_de
+from codigo_intermedio import construir_ir
+from emisor import EmisorEnsamblador
+from generadorEnsamblador import GeneradorEnsamblador
+from generadorIR import GeneradorIR
+from mirilla import optimizar_mirilla
+from nodes import NodoLlamadaFuncion, iterar_nodos
+from parsear import Parser, parsear_texto
+from simulador import simular
+
+
+# Programas de prueba
+
+def generar_funcion(nombre, n_instrucciones=20):
+    lineas = [f"int {nombre}(int a, int b) {{", "    int x = a + b * 2;"]
+    for i in range(n_instrucciones):
+        lineas.append(f"    int v{i} = (x + {i}) * b - a / 3;")
+        lineas.append(f"    if (v{i} > x) {{")
+        lineas.append(f"        x = x + v{i};")
+        lineas.append("    }")
+        lineas.append(f'    print("iteracion {i}");')
+    lineas.append("    return x;")
+    lineas.append("}")
+    return "\n".join(lineas)
+
+
+def generar_programa(tamano_bytes):
+    partes = []
+    total = 0
+    i = 0
+    while total < tamano_bytes:
+        funcion = generar_funcion(f"funcion_{i}")
+        partes.append(funcion)
+        total += len(funcion) + 1
+        i += 1
+    partes.append("int main() {\n    int r = funcion_0(1, 2);\n    print(r);\n    return 0;\n}")
+    return "\n".join(partes)
+
+
+def generar_anidado(profundidad=40, repeticiones=200):
+    # Una funcion main con muchos bloques if/while anidados
+    lineas = ["int main() {", "    int x = 0;", "    int y = 1;"]
+    for r in range(repeticiones):
+        for nivel in range(profundidad):
+            sangria = "    " * (nivel + 1)
+            if nivel % 2 == 0:
+                lineas.append(f"{sangria}if (x < {nivel + r}) {{")
+            else:
+                lineas.append(f"{sangria}while (y > {nivel}) {{")
+            lineas.append(f"{sangria}    x = x + y;")
+            lineas.append(f"{sangria}    print(x);")
+        for nivel in reversed(range(profundidad)):
+            lineas.append("    " * (nivel + 1) + "}")
+    lineas.append("    return x;")
+    lineas.append("}")
+    return "\n".join(lineas)
+
+
+def generar_expresion(n_terminos):
+    operadores = ["+", "*", "-", "/", "<", "&&", "+", "==", "||", "*"]
+    partes = ["x0"]
+    for i in range(1, n_terminos):
+        partes.append(operadores[i % len(operadores)])
+        partes.append(f"x{i % 50}" if i % 3 else str(i))
+    return "int main() {\n    int r = " + " ".join(partes) + ";\n    return r;\n}"
+
+
+def generar_ciclos(iteraciones=2000):
+    # Ciclos con calculos que no dependen de las variables que cambian en el ciclo
+    return "\n".join([
+        "int main() {",
+        "    int n = 0;",
+        "    int m = 0;",
+        '    scanf("%d", &n);',
+        '    scanf("%d", &m);',
+        "    int total = 0;",
+        "    int i = 0;",
+        f"    while (i < {iteraciones}) {{",
+        "        total = total + (n * m + n / 4) * (m - 3) + i;",
+        "        if (total > n * m * 100) {",
+        "            total = total - n * m * 100;",
+        "        }",
+        "        i = i + 1;",
+        "    }",
+        f"    for (int j = 0; j < {iteraciones // 2}; j++) {{",
+        "        int k = 0;",
+        "        while (k < 3) {",
+        "            total = total + j * (n + m * 3) + k * (n - 1) + m / n;",
+        "            k = k + 1;",
+        "        }",
+        "    }",
+        "    print(total);",
+        "    return 0;",
+        "}",
+    ])
+
+
+def generar_induccion(filas=40, columnas=50):
+    # Calculo de indices como en un arreglo de dos dimensiones
+    return "\n".join([
+        "int main() {",
+        "    int ancho = 0;",
+        "    int escala = 0;",
+        '    scanf("%d", &ancho);',
+        '    scanf("%d", &escala);',
+        "    int suma = 0;",
+        f"    for (int i = 0; i < {filas}; i++) {{",
+        f"        for (int j = 0; j < {columnas}; j++) {{",
+        "            int indice = i * ancho + j;",
+        "            suma = suma + indice * 4 + j * 12 + (j * 12) / 8 + j * escala;",
+        "        }",
+        "        suma = suma - i * 6;",
+        "    }",
+        "    print(suma);",
+        "    return 0;",
+        "}",
+    ])
+
+
+def generar_llamadas(iteraciones=2000):
+    # Ciclo caliente que llama a funciones auxiliares pequenas
+    return "\n".join([
+        "int sumar(int a, int b) {",
+        "    return a + b;",
+        "}",
+        "int cuadrado(int x) {",
+        "    int y = x * x;",
+        "    return y;",
+        "}",
+        "int distancia(int a, int b) {",
+        "    return sumar(cuadrado(a), cuadrado(b));",
+        "}",
+        "int main() {",
+        "    int n = 0;",
+        '    scanf("%d", &n);',
+        "    int total = 0;",
+        f"    for (int i = 0; i < {iteraciones}; i++) {{",
+        "        total = sumar(total, distancia(i, n));",
+        "    }",
+        "    print(total);",
+        "    return 0;",
+        "}",
+    ])
+
+
+def generar_presion(variables=10, iteraciones=500):
+    # Mas variables vivas en el ciclo que registros disponibles
+    nombres = [f"v{i}" for i in range(variables)]
+    lineas = ["int main() {", "    int n = 0;", '    scanf("%d", &n);']
+    lineas += [f"    int {nombre} = n + {i};" for i, nombre in enumerate(nombres)]
+    lineas.append(f"    for (int i = 0; i < {iteraciones}; i++) {{")
+    for i, nombre in enumerate(nombres):
+        lineas.append(f"        {nombre} = {nombre} + {nombres[i - 1]} * i - {nombres[(i + 3) % variables]} / 3;")
+    lineas.append("    }")
+    lineas.append("    print(" + " + ".join(nombres) + ");")
+    lineas += ["    return 0;", "}"]
+    return "\n".join(lineas)
+
+
+def generar_subexpresiones(iteraciones=2000):
+    # Expresiones repetidas dentro del cuerpo y entre la condicion y las ramas
+    return "\n".join([
+        "int main() {",
+        "    int a = 0;",
+        "    int b = 0;",
+        '    scanf("%d", &a);',
+        '    scanf("%d", &b);',
+        "    int total = 0;",
+        f"    for (int i = 0; i < {iteraciones}; i++) {{",
+        "        int x = (i + a) * (i + b);",
+        "        int y = (i + a) * (i + b) + (i - a) * (i - b);",
+        "        if ((i + a) * (i + b) > (i - a) * (i - b) + a * b) {",
+        "            total = total + x - (i - a) * (i - b);",
+        "        } else {",
+        "            total = total - y + a * b;",
+        "        }",
+        "        total = total + (x + y) / 8 - (y + x) / 8 + a * b;",
+        "    }",
+        "    print(total);",
+        "    return 0;",
+        "}",
+    ])
+
+
+def generar_menu(iteraciones=2000, casos=10):
+    # Una cadena de if/else if con valores seguidos (tabla de saltos) y otra
+    # con valores dispersos (busqueda binaria), sobre la misma variable
+    densa = " else ".join(f"if (op == {k}) {{ total = total + {k * 3 + 1}; }}" for k in range(casos))
+    dispersa = " else ".join(f"if (codigo == {k * k * 37}) {{ total = total - {k + 2}; }}" for k in range(casos))
+    return "\n".join([
+        "int main() {",
+        "    int a = 0;",
+        '    scanf("%d", &a);',
+        "    int total = 0;",
+        f"    for (int i = 0; i < {iteraciones}; i++) {{",
+        f"        int op = (i + a) - (i + a) / {casos + 2} * {casos + 2};",
+        "        int codigo = op * op * 37;",
+        f"        {densa} else {{ total = total * 2; }}",
+        f"        {dispersa} else {{ total = total + 1; }}",
+        "    }",
+        "    print(total);",
+        "    return 0;",
+        "}",
+    ])
+
+
+def generar_mensajes(n_mensajes=2000):
+    # Muchos print de cadenas: la mayoria distintas, algunas repetidas y
+    # varias que terminan igual que otras
+    lineas = ["int main() {"]
+    for k in range(n_mensajes):
+        if k % 5 == 0:
+            lineas.append('    print("listo\\n");')
+        elif k % 5 == 1:
+            lineas.append(f'    print("paso {k // 10} listo\\n");')
+        elif k % 5 == 2:
+            lineas.append(f'    print("{k - 1}: \\tvalor");')
+        else:
+            lineas.append(f'    print("mensaje {k}: \\tvalor");')
+    lineas.extend(["    return 0;", "}"])
+    return "\n".join(lineas)
+
+
+def medir_memoria(funcion, *args):
+    tracemalloc.start()
+    try:
+        resultado = funcion(*args)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pico, resultado
+
+
+def medir(funcion, *args, repeticiones=3):
+    mejor = None
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        transcurrido = time.perf_counter() - inicio
+        if mejor is None or transcurrido < mejor:
+            mejor = transcurrido
+    return mejor, resultado
+
+
+# Analisis lexico
+
+def _identificar_original(text):
+    # Implementacion previa: recompila el patron en cada llamada y recorre groupdict()
+    patron_general = "|".join(f"(?P<{token}>{patron})" for token, patron in analisis_lexico.token_patron.items())
+    patron_regex = re.compile(patron_general)
+    tokens_encontrados = []
+    for match in patron_regex.finditer(text):
+        for token, valor in match.groupdict().items():
+            if valor is not None and token != "WHITESPACE":
+                tokens_encontrados.append((token, valor))
+    return tokens_encontrados
+
+
+def bench_lexico(tamano_bytes=1_000_000):
+    fuente = generar_programa(tamano_bytes)
+    t_original, tokens_original = medir(_identificar_original, fuente)
+    t_nuevo, tokens_nuevo = medir(analisis_lexico.identificar, fuente)
+
+    if tokens_original != tokens_nuevo:
+        raise AssertionError("Los analizadores lexicos producen tokens distintos")
+
+    print(f"Analisis lexico ({len(fuente) / 1_000_000:.2f} MB, {len(tokens_nuevo)} tokens)")
+    print(f"  original:  {t_original:.3f} s")
+    print(f"  compilado: {t_nuevo:.3f} s  (x{t_original / t_nuevo:.2f})")
+
+
+def _contar_tokens(tokens):
+    total = 0
+    for _ in tokens:
+        total += 1
+    return total
+
+
+def _tokens_de_archivo_en_lista(ruta):
+    with open(ruta) as archivo:
+        return len(analisis_lexico.identificar(archivo.read()))
+
+
+def bench_flujo(tamanos=(1_000_000, 4_000_000)):
+    print("Pico de memoria al tokenizar (lista completa vs flujo desde mmap)")
+    for tamano in tamanos:
+        fuente = generar_programa(tamano)
+        with tempfile.NamedTemporaryFile("w", suffix=".c", delete=False) as archivo:
+            archivo.write(fuente)
+            ruta = archivo.name
+        try:
+            pico_lista, n_lista = medir_memoria(_tokens_de_archivo_en_lista, ruta)
+            pico_flujo, n_flujo = medir_memoria(_contar_tokens, analisis_lexico.identificar_archivo(ruta))
+        finally:
+            os.remove(ruta)
+        if n_lista != n_flujo:
+            raise AssertionError("El flujo y la lista producen un numero distinto de tokens")
+        print(f"  {tamano / 1_000_000:.0f} MB ({n_flujo} tokens): lista {pico_lista / 1024:.0f} KiB, flujo {pico_flujo / 1024:.0f} KiB")
+
+
+def bench_parser(tamano_bytes=1_000_000):
+    fuente = generar_programa(tamano_bytes)
+    pico_lista, tokens = medir_memoria(analisis_lexico.identificar, fuente)
+    pico_buffer, buffer = medir_memoria(analisis_lexico.BufferTokens.desde_texto, fuente)
+    n_tokens = len(tokens)
+    t_parser, _ = medir(lambda: Parser(buffer).parsear())
+
+    print(f"Parser sobre BufferTokens ({n_tokens} tokens)")
+    print(f"  almacenamiento: lista de tuplas {pico_lista / n_tokens:.1f} B/token, buffer {pico_buffer / n_tokens:.1f} B/token")
+    print(f"  parser: {t_parser:.3f} s, {n_tokens / t_parser:,.0f} tokens/s")
+
+
+def bench_sentencias(profundidad=40, repeticiones=200):
+    fuente = generar_anidado(profundidad, repeticiones)
+    buffer = analisis_lexico.BufferTokens.desde_texto(fuente)
+    t_parser, _ = medir(lambda: Parser(buffer).parsear(), repeticiones=5)
+    n_tokens = len(buffer) - 1
+    print(f"Parser en if/while anidados (profundidad {profundidad}, {n_tokens} tokens)")
+    print(f"  parser: {t_parser:.3f} s, {n_tokens / t_parser:,.0f} tokens/s")
+
+
+def bench_expresiones(tamanos=(10_000, 20_000, 40_000)):
+    print("Parser de expresiones (una expresion de n terminos)")
+    for n_terminos in tamanos:
+        buffer = analisis_lexico.BufferTokens.desde_texto(generar_expresion(n_terminos))
+        t_parser, _ = medir(lambda: Parser(buffer).parsear())
+        print(f"  {n_terminos} terminos: {t_parser:.3f} s, {t_parser / n_terminos * 1e6:.2f} us/termino")
+
+
+def contar_nodos(raiz):
+    return sum(1 for _ in iterar_nodos(raiz))
+
+
+def bench_memoria_ast(nodos_objetivo=100_000):
+    funcion = generar_funcion("f")
+    nodos_funcion = contar_nodos(parsear_texto(funcion))
+    fuente = generar_programa(len(funcion) * nodos_objetivo // nodos_funcion)
+    buffer = analisis_lexico.BufferTokens.desde_texto(fuente)
+    tracemalloc.start()
+    try:
+        programa = Parser(buffer).parsear()
+        memoria, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    n_nodos = contar_nodos(programa)
+    print(f"Memoria del AST ({n_nodos} nodos)")
+    print(f"  total: {memoria / 1024:.0f} KiB, {memoria / n_nodos:.1f} B/nodo")
+
+
+def _generador_de(programa, asignar_registros=True, clase=GeneradorEnsamblador):
+    generador = clase(asignar_registros)
+    generador.generar(programa)
+    return generador
+
+
+def _generador_ir_de(programa):
+    generador = GeneradorIR()
+    generador.generar(construir_ir(programa))
+    return generador
+
+
+def _generar_codigo(programa):
+    return _generador_de(programa).codigo
+
+
+class _GeneradorCadenasOriginal(GeneradorEnsamblador):
+    # Implementacion previa: recorre todas las cadenas para buscar un valor repetido
+    def nuevo_string_literal(self, valor):
+        if valor.startswith('"') and valor.endswith('"'):
+            valor = valor[1:-1]
+        for str_id, str_val in self.cadenas.por_id.items():
+            if str_val == valor:
+                return str_id
+        return self.cadenas.agregar(valor)
+
+
+def _bytes_datos(lineas):
+    # Bytes que ocupan las lineas db de la seccion .data
+    total = 0
+    for linea in lineas:
+        _, separador, operandos = linea.partition(" db ")
+        if separador:
+            total += sum(len(texto) if texto else 1 for texto in re.findall(r'"([^"]*)"|\d+', operandos))
+    return total
+
+
+def bench_cadenas(tamanos=(1000, 2000, 4000)):
+    print("Tabla de cadenas literales (busqueda lineal -> diccionario)")
+    for n_mensajes in tamanos:
+        programa = parsear_texto(generar_mensajes(n_mensajes))
+        t_original, original = medir(_generador_de, programa, False, _GeneradorCadenasOriginal)
+        t_nuevo, nuevo = medir(_generador_de, programa, False)
+        if original.obtener_codigo() != nuevo.obtener_codigo():
+            raise AssertionError("Las dos tablas de cadenas generan codigo distinto")
+        sin_unir = sum(len(bytes_de(valor)) + 1 for valor in nuevo.cadenas.por_id.values())
+        print(f"  {n_mensajes} print: original {t_original * 1000:.1f} ms, diccionario {t_nuevo * 1000:.1f} ms "
+              f"(x{t_original / t_nuevo:.2f}); {len(nuevo.cadenas)} cadenas, "
+              f"{sin_unir} -> {_bytes_datos(nuevo.cadenas.lineas())} bytes en .data uniendo finales")
+
+
+def _escribir_completo(programa, ruta):
+    generador = _generador_de(programa)
+    with open(ruta, "w") as archivo:
+        archivo.write(generador.obtener_codigo())
+        archivo.write("\n")
+
+
+def _escribir_por_funciones(programa, ruta):
+    with open(ruta, "w") as archivo:
+        GeneradorEnsamblador().generar(programa, EmisorEnsamblador(archivo))
+
+
+def bench_emisor(tamanos=(250_000, 1_000_000)):
+    print("Pico de memoria al generar el ensamblador (todo el codigo en memoria vs una funcion a la vez)")
+    for tamano in tamanos:
+        programa = parsear_texto(generar_programa(tamano))
+        with tempfile.TemporaryDirectory() as directorio:
+            completo, por_funciones = os.path.join(directorio, "completo.asm"), os.path.join(directorio, "funciones.asm")
+            pico_completo, _ = medir_memoria(_escribir_completo, programa, completo)
+            pico_funciones, _ = medir_memoria(_escribir_por_funciones, programa, por_funciones)
+            t_completo, _ = medir(_escribir_completo, programa, completo)
+            t_funciones, _ = medir(_escribir_por_funciones, programa, por_funciones)
+            with open(completo) as a, open(por_funciones) as b:
+                if a.read() != b.read():
+                    raise AssertionError("El emisor escribe un ensamblador distinto al de obtener_codigo()")
+            tamano_salida = os.path.getsize(completo)
+        print(f"  {len(programa.funciones)} funciones ({tamano_salida / 1_000_000:.1f} MB de salida): "
+              f"completo {pico_completo / 1024:.0f} KiB {t_completo:.2f} s, "
+              f"por funciones {pico_funciones / 1024:.0f} KiB {t_funciones:.2f} s")
+
+
+def _generar_con(programa, trabajadores):
+    generador = GeneradorEnsamblador()
+    generador.generar(programa, trabajadores=trabajadores)
+    return generador.obtener_codigo()
+
+
+def bench_paralelo(tamano_bytes=1_000_000, trabajadores=(1, 2, 4)):
+    # Generacion por funciones repartida entre procesos; el ensamblador debe
+    # ser el mismo con cualquier cantidad de procesos
+    programa = parsear_texto(generar_programa(tamano_bytes))
+    print(f"Generacion en paralelo ({len(programa.funciones)} funciones, {os.cpu_count()} nucleos)")
+    esperado = None
+    for cantidad in trabajadores:
+        tiempo, codigo = medir(_generar_con, programa, cantidad)
+        if esperado is None:
+            esperado, base = codigo, tiempo
+        elif codigo != esperado:
+            raise AssertionError(f"Con {cantidad} procesos el ensamblador es distinto")
+        print(f"  {cantidad} procesos: {tiempo:.2f} s (x{base / tiempo:.2f})")
+
+
+def bench_recorrido(tamanos=(10_000, 20_000, 40_000)):
+    # Con el recorrido iterativo el tiempo por nodo debe mantenerse constante
+    # aunque la profundidad del arbol supere el limite de recursion
+    print(f"Pasadas sobre expresiones profundas (limite de recursion {sys.getrecursionlimit()})")
+    for n_terminos in tamanos:
+        programa = parsear_texto(generar_expresion(n_terminos))
+        n_nodos = contar_nodos(programa)
+        t_dict, _ = medir(programa.to_dict)
+        t_codigo, _ = medir(_generar_codigo, programa)
+        print(f"  {n_terminos} terminos: to_dict {t_dict / n_nodos * 1e6:.2f} us/nodo, generar {t_codigo / n_nodos * 1e6:.2f} us/nodo")
+
+
+def _escribir_json_original(programa, ruta):
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        archivo.write(json.dumps(programa.to_dict(), indent=4))
+
+
+def bench_json(tamano_bytes=1_000_000):
+    programa = parsear_texto(generar_programa(tamano_bytes))
+    directorio = tempfile.mkdtemp()
+    variantes = [
+        ("to_dict + json.dumps(indent=4)", "original.json", lambda ruta: _escribir_json_original(programa, ruta)),
+        ("flujo indentado", "indentado.json", lambda ruta: generate_ast_json.guardar_ast(programa, ruta, compacto=False)),
+        ("flujo compacto", "compacto.json", lambda ruta: generate_ast_json.guardar_ast(programa, ruta)),
+        ("flujo compacto + gzip", "compacto.json.gz", lambda ruta: generate_ast_json.guardar_ast(programa, ruta)),
+    ]
+    print(f"Serializacion del AST a JSON ({contar_nodos(programa)} nodos)")
+    try:
+        for nombre, archivo, escribir in variantes:
+            ruta = os.path.join(directorio, archivo)
+            t_escritura, _ = medir(escribir, ruta)
+            pico, _ = medir_memoria(escribir, ruta)
+            t_carga, cargado = medir(generate_ast_json.cargar_ast, ruta)
+            if cargado.to_dict() != programa.to_dict():
+                raise AssertionError(f"{nombre}: el AST cargado no coincide con el original")
+            print(f"  {nombre}: {os.path.getsize(ruta) / 1024:.0f} KiB, escritura {t_escritura:.3f} s (pico {pico / 1024:.0f} KiB), carga {t_carga:.3f} s")
+    finally:
+        for archivo in os.listdir(directorio):
+            os.remove(os.path.join(directorio, archivo))
+        os.rmdir(directorio)
+
+
+def _cargar_funcion_binaria(ruta, nombre):
+    with ast_binario.abrir_ast_binario(ruta) as archivo:
+        return archivo.funcion(nombre)
+
+
+def bench_binario(tamano_bytes=1_000_000):
+    programa = parsear_texto(generar_programa(tamano_bytes))
+    original = programa.to_dict()
+    directorio = tempfile.mkdtemp()
+    ruta_json = os.path.join(directorio, "ast.json")
+    ruta_binaria = os.path.join(directorio, "ast.astb")
+    try:
+        generate_ast_json.guardar_ast(programa, ruta_json)
+        ast_binario.guardar_ast_binario(programa, ruta_binaria)
+        t_json, _ = medir(generate_ast_json.cargar_ast, ruta_json)
+        t_binario, cargado = medir(ast_binario.cargar_ast_binario, ruta_binaria)
+        t_funcion, funcion = medir(_cargar_funcion_binaria, ruta_binaria, "main")
+        
+        # Ida y vuelta: el arbol completo y la funcion cargada sola deben coincidir con to_dict()
+        if cargado.to_dict() != original:
+            raise AssertionError("El AST binario cargado no coincide con el original")
+        if funcion.to_dict() != programa.funciones[-1].to_dict():
+            raise AssertionError("La funcion cargada del AST binario no coincide con la original")
+        
+        print(f"AST binario con mmap ({contar_nodos(programa)} nodos, {len(programa.funciones)} funciones)")
+        print(f"  tamano: JSON compacto {os.path.getsize(ruta_json) / 1024:.0f} KiB, binario {os.path.getsize(ruta_binaria) / 1024:.0f} KiB")
+        print(f"  carga completa: JSON {t_json:.3f} s, binario {t_binario:.3f} s  (x{t_json / t_binario:.2f})")
+        print(f"  una sola funcion del binario: {t_funcion * 1000:.2f} ms")
+    finally:
+        for ruta in (ruta_json, ruta_binaria):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        os.rmdir(directorio)
+
+
+def generar_plegable(n_funciones=200):
+    # Funciones con constantes, identidades algebraicas y ramas que nunca se ejecutan
+    partes = []
+    for f in range(n_funciones):
+        partes.append("\n".join([
+            f"int plegable_{f}(int a) {{",
+            f"    int x = a * 1 + 0;",
+            f"    int y = (x + {f}) + 2 * 8 - 4;",
+            f"    int c = {f % 7} + 1;",
+            f"    int d = c * 7;",
+            f"    print(d + c);",
+            f"    int sin_uso = a * {f + 2};",
+            f"    if (3 > 4) {{",
+            f"        print(x);",
+            f"        y = y + 1;",
+            f"    }} else {{",
+            f"        y = y - 0;",
+            f"    }}",
+            f"    while (1 - 1) {{",
+            f"        x = x + 1;",
+            f"    }}",
+            f"    return x * (10 / 5 - 1) + y * (4 - 2 * 2);",
+            f"    print(y);",
+            "}",
+        ]))
+    partes.append("int main() {\n    int r = plegable_0(1);\n    print(r);\n    return 0;\n}")
+    return "\n".join(partes)
+
+
+def bench_optimizador(n_funciones=200):
+    programa = parsear_texto(generar_plegable(n_funciones))
+    t_optimizar, (optimizado, reporte) = medir(optimizador.optimizar_programa, programa)
+    
+    # Un segundo paso sobre el resultado no debe encontrar nada: es un punto fijo
+    repetido, _ = optimizador.optimizar_programa(optimizado)
+    if repetido is not optimizado:
+        raise AssertionError("El optimizador no llego a un punto fijo")
+    
+    codigo_antes = _generar_codigo(programa)
+    codigo_despues = _generar_codigo(optimizado)
+    cargas_antes = sum(1 for linea in codigo_antes if linea.startswith("    mov rax, [rbp"))
+    cargas_despues = sum(1 for linea in codigo_despues if linea.startswith("    mov rax, [rbp"))
+    print(f"Optimizacion del AST ({n_funciones} funciones) en {t_optimizar:.3f} s")
+    print(f"  ensamblador: {len(codigo_antes)} -> {len(codigo_despues)} lineas, {cargas_antes} -> {cargas_despues} lecturas de variables")
+    for linea in str(reporte).splitlines():
+        print(f"  {linea}")
+
+
+
+def _ejecutar_optimizado(programa, pasadas, entrada):
+    optimizado, _ = optimizador.optimizar_programa(programa, pasadas)
+    generador = GeneradorEnsamblador()
+    generador.generar(optimizado)
+    return simular(generador, entrada)
+
+
+def _comparar_ejecuciones(variantes, entrada):
+    # Ejecuta cada variante en el simulador; todas deben imprimir lo mismo
+    esperado = None
+    for nombre, ejecutar in variantes:
+        salida, ejecutadas, ciclos = ejecutar()
+        if esperado is None:
+            esperado = salida
+        elif salida != esperado:
+            raise AssertionError(f"{nombre}: la salida {salida!r} no coincide con {esperado!r}")
+        print(f"  {nombre}: {ejecutadas} instrucciones ejecutadas, ~{ciclos} ciclos, salida {salida}")
+
+
+def _variantes_sin(programa, pasada, entrada):
+    sin_pasada = [otra for otra in optimizador.PASADAS if otra is not pasada]
+    return [
+        ("sin optimizar", lambda: simular(_generador_de(programa), entrada)),
+        (f"pipeline sin {pasada.nombre}", lambda: _ejecutar_optimizado(programa, sin_pasada, entrada)),
+        ("pipeline completo", lambda: _ejecutar_optimizado(programa, None, entrada)),
+    ]
+
+
+def bench_invariantes(iteraciones=2000, entrada=(7, 5)):
+    programa = parsear_texto(generar_ciclos(iteraciones))
+    print(f"Movimiento de invariantes de ciclo ({iteraciones} iteraciones)")
+    _comparar_ejecuciones(_variantes_sin(programa, optimizador.MovimientoInvariantes, entrada), entrada)
+
+
+def bench_induccion(filas=40, columnas=50, entrada=(50, 3)):
+    programa = parsear_texto(generar_induccion(filas, columnas))
+    codigo = _generar_codigo(optimizador.optimizar_programa(programa)[0])
+    multiplicaciones = sum(1 for linea in codigo if linea.startswith("    imul"))
+    desplazamientos = sum(1 for linea in codigo if linea.startswith(("    shl", "    sar")))
+    print(f"Reduccion de fuerza en ciclos for ({filas}x{columnas} iteraciones)")
+    print(f"  codigo optimizado: {multiplicaciones} imul, {desplazamientos} desplazamientos")
+    _comparar_ejecuciones(_variantes_sin(programa, optimizador.ReduccionFuerza, entrada), entrada)
+
+
+def bench_subexpresiones(iteraciones=2000, entrada=(7, 5)):
+    programa = parsear_texto(generar_subexpresiones(iteraciones))
+    print(f"Eliminacion de subexpresiones comunes ({iteraciones} iteraciones)")
+    _comparar_ejecuciones(_variantes_sin(programa, optimizador.EliminacionSubexpresiones, entrada), entrada)
+    
+    # Instrucciones emitidas para cada programa de prueba con y sin la pasada
+    sin_pasada = [pasada for pasada in optimizador.PASADAS if pasada is not optimizador.EliminacionSubexpresiones]
+    programas = [
+        ("ciclos", generar_ciclos(iteraciones)),
+        ("induccion", generar_induccion()),
+        ("llamadas", generar_llamadas(iteraciones)),
+        ("presion", generar_presion()),
+        ("subexpresiones", generar_subexpresiones(iteraciones)),
+    ]
+    for nombre, fuente in programas:
+        programa = parsear_texto(fuente)
+        antes, despues = (
+            sum(1 for linea in _generar_codigo(optimizador.optimizar_programa(programa, pasadas)[0]) if linea.startswith("    "))
+            for pasadas in (sin_pasada, None)
+        )
+        print(f"  {nombre}: {antes} -> {despues} instrucciones emitidas")
+
+
+def bench_seleccion(iteraciones=2000, entrada=(3,)):
+    # Cadenas de if/else if comparadas caso por caso o con despacho, en los
+    # dos generadores y sobre el mismo AST optimizado
+    programa = optimizador.optimizar_programa(parsear_texto(generar_menu(iteraciones)))[0]
+    print(f"Seleccion multiple ({iteraciones} iteraciones, comparaciones -> despacho)")
+    minimo = seleccion.MINIMO_CASOS
+    for etiqueta, generar in (("directo", _generador_de), ("IR", _generador_ir_de)):
+        resultados = []
+        for casos in (float("inf"), minimo):
+            seleccion.MINIMO_CASOS = casos
+            try:
+                generador = generar(programa)
+            finally:
+                seleccion.MINIMO_CASOS = minimo
+            estaticas = sum(1 for linea in generador.codigo if linea.startswith("    ") and not linea.startswith("    dq "))
+            resultados.append((estaticas,) + simular(generador, entrada))
+        (estaticas_a, salida_a, ejecutadas_a, ciclos_a), (estaticas_b, salida_b, ejecutadas_b, ciclos_b) = resultados
+        if salida_a != salida_b:
+            raise AssertionError(f"{etiqueta}: la salida {salida_b!r} no coincide con {salida_a!r}")
+        print(f"  {etiqueta}: {estaticas_a} -> {estaticas_b} instrucciones, {ejecutadas_a} -> {ejecutadas_b} ejecutadas, "
+              f"~{ciclos_a} -> ~{ciclos_b} ciclos")
+
+
+def bench_expansion(iteraciones=2000, entrada=(3,)):
+    programa = parsear_texto(generar_llamadas(iteraciones))
+    optimizado = optimizador.optimizar_programa(programa)[0]
+    main = next(funcion for funcion in optimizado.funciones if funcion.nombre == "main")
+    llamadas = sum(1 for nodo in iterar_nodos(main) if isinstance(nodo, NodoLlamadaFuncion))
+    print(f"Expansion en linea de funciones pequenas ({iteraciones} iteraciones)")
+    print(f"  llamadas que quedan en main: {llamadas}")
+    _comparar_ejecuciones(_variantes_sin(programa, optimizador.ExpansionEnLinea, entrada), entrada)
+
+
+# Programas sobre los que se comparan variantes de la generacion de codigo:
+# asignacion de registros, codigo intermedio y mirilla
+PROGRAMAS_GENERADORES = (
+    ("ciclos", generar_ciclos(500)),
+    ("induccion", generar_induccion(20, 25)),
+    ("llamadas", generar_llamadas(500)),
+    ("presion", generar_presion()),
+)
+
+
+def bench_registros(entrada=(7, 5)):
+    # Mismo AST optimizado, con las variables en memoria y la pila como
+    # temporal o con la asignacion de registros por barrido lineal
+    print("Asignacion de registros (memoria -> registros)")
+    for nombre, fuente in PROGRAMAS_GENERADORES:
+        programa = optimizador.optimizar_programa(parsear_texto(fuente))[0]
+        resultados = []
+        for asignar in (False, True):
+            generador = _generador_de(programa, asignar)
+            instrucciones = [linea for linea in generador.codigo if linea.startswith("    ")]
+            accesos = sum(1 for linea in instrucciones if "[rbp" in linea or linea.split()[0] in ("push", "pop"))
+            resultados.append((len(instrucciones), accesos) + simular(generador, entrada))
+        (estaticas_a, accesos_a, salida_a, ejecutadas_a, ciclos_a), (estaticas_b, accesos_b, salida_b, ejecutadas_b, ciclos_b) = resultados
+        if salida_a != salida_b:
+            raise AssertionError(f"{nombre}: la salida {salida_b!r} no coincide con {salida_a!r}")
+        print(f"  {nombre}: {estaticas_a} -> {estaticas_b} instrucciones, {accesos_a} -> {accesos_b} accesos a memoria, "
+              f"{ejecutadas_a} -> {ejecutadas_b} ejecutadas, ~{ciclos_a} -> ~{ciclos_b} ciclos")
+
+
+def bench_ir(entrada=(7, 5)):
+    # Tiempo de cada etapa pasando por el codigo intermedio y comparacion del
+    # codigo que genera con el del generador directo sobre el mismo AST
+    print("Codigo intermedio (generador directo -> generador desde IR)")
+    for nombre, fuente in PROGRAMAS_GENERADORES:
+        inicio = time.perf_counter()
+        programa = parsear_texto(fuente)
+        parseado = time.perf_counter()
+        programa = optimizador.optimizar_programa(programa)[0]
+        optimizado = time.perf_counter()
+        programa_ir = construir_ir(programa)
+        construido = time.perf_counter()
+        generador_ir = GeneradorIR()
+        generador_ir.generar(programa_ir)
+        generado = time.perf_counter()
+        bloques = sum(len(funcion.bloques) for funcion in programa_ir.funciones)
+        operaciones = sum(1 for funcion in programa_ir.funciones for _ in funcion.instrucciones())
+        print(f"  {nombre}: parseo {(parseado - inicio) * 1000:.1f} ms, optimizacion {(optimizado - parseado) * 1000:.1f} ms, "
+              f"IR {(construido - optimizado) * 1000:.1f} ms ({bloques} bloques, {operaciones} instrucciones), "
+              f"ensamblador {(generado - construido) * 1000:.1f} ms")
+        
+        resultados = []
+        for generador in (_generador_de(programa), generador_ir):
+            estaticas = sum(1 for linea in generador.codigo if linea.startswith("    "))
+            resultados.append((estaticas,) + simular(generador, entrada))
+        (estaticas_a, salida_a, ejecutadas_a, ciclos_a), (estaticas_b, salida_b, ejecutadas_b, ciclos_b) = resultados
+        if salida_a != salida_b:
+            raise AssertionError(f"{nombre}: la salida {salida_b!r} no coincide con {salida_a!r}")
+        print(f"    {estaticas_a} -> {estaticas_b} instrucciones, {ejecutadas_a} -> {ejecutadas_b} ejecutadas, "
+              f"~{ciclos_a} -> ~{ciclos_b} ciclos")
+
+
+def bench_mirilla(entrada=(7, 5)):
+    # Codigo de los dos generadores antes y despues de la mirilla, con las
+    # reglas que se aplicaron sumadas sobre todos los programas
+    print("Mirilla (antes -> despues)")
+    aplicaciones = Counter()
+    for nombre, fuente in PROGRAMAS_GENERADORES:
+        programa = optimizador.optimizar_programa(parsear_texto(fuente))[0]
+        generador_ir = GeneradorIR()
+        generador_ir.generar(construir_ir(programa))
+        for etiqueta, generador in (("directo", _generador_de(programa)), ("IR", generador_ir)):
+            salida_a, ejecutadas_a, ciclos_a = simular(generador, entrada)
+            generador.codigo, reporte = optimizar_mirilla(generador.codigo)
+            salida_b, ejecutadas_b, ciclos_b = simular(generador, entrada)
+            if salida_a != salida_b:
+                raise AssertionError(f"{nombre} ({etiqueta}): la salida {salida_b!r} no coincide con {salida_a!r}")
+            aplicaciones.update(reporte.aplicaciones)
+            print(f"  {nombre} ({etiqueta}): {reporte.instrucciones_antes} -> {reporte.instrucciones_despues} instrucciones, "
+                  f"{ejecutadas_a} -> {ejecutadas_b} ejecutadas, ~{ciclos_a} -> ~{ciclos_b} ciclos, {reporte.tiempo * 1000:.1f} ms")
+    for regla, veces in aplicaciones.items():
+        print(f"    {regla}: {veces}")
+
+
+BENCHMARKS = {
+    "lexico": bench_lexico,
+    "flujo": bench_flujo,
+    "parser": bench_parser,
+    "sentencias": bench_sentencias,
+    "expresiones": bench_expresiones,
+    "memoria_ast": bench_memoria_ast,
+    "recorrido": bench_recorrido,
+    "json": bench_json,
+    "binario": bench_binario,
+    "cadenas": bench_cadenas,
+    "emisor": bench_emisor,
+    "paralelo": bench_paralelo,
+    "optimizador": bench_optimizador,
+    "invariantes": bench_invariantes,
+    "induccion": bench_induccion,
+    "subexpresiones": bench_subexpresiones,
+    "seleccion": bench_seleccion,
+    "expansion": bench_expansion,
+    "registros": bench_registros,
+    "ir": bench_ir,
+    "mirilla": bench_mirilla,
+}
+
+
+if __name__ == "__main__":
+    nombres = sys.argv[1:] or list(BENCHMARKS)
+    for nombre in nombres:
+        if nombre not in BENCHMARKS:
+            print(f"Benchmark desconocido: {nombre}. Disponibles: {', '.join(BENCHMARKS)}")
+            sys.exit(1)
+        BENCHMARKS[nombre]()
@@ -0,0 +1,106 @@
+import hashlib
+
+# Tabla de cadenas literales para la seccion .data. El identificador de una
+# cadena sale de sus bytes, asi que las tablas de funciones generadas por
+# separado (incluso en otros procesos) le dan el mismo, y al unirlas cada
+# cadena queda una sola vez. Se busca por diccionario en las dos direcciones.
+# Al emitir, una cadena que es el final de otra no se escribe aparte: su
+# etiqueta se pone dentro de la mas larga, que comparte el mismo 0 final
+
+ESCAPES = {"n": 10, "t": 9, "r": 13, "0": 0, "\\": 92, '"': 34, "'": 39}
+
+
+def bytes_de(valor):
+    # Bytes de una cadena tal como aparece en el fuente, con sus secuencias \n, \t...
+    resultado = bytearray()
+    i = 0
+    while i < len(valor):
+        if valor[i] == "\\" and i + 1 < len(valor) and valor[i + 1] in ESCAPES:
+            resultado.append(ESCAPES[valor[i + 1]])
+            i += 2
+        else:
+            resultado.extend(valor[i].encode("utf-8"))
+            i += 1
+    return bytes(resultado)
+
+
+def operandos_db(datos):
+    # Operandos de db: los caracteres imprimibles entre comillas y el resto
+    # (saltos de linea, comillas, bytes fuera de ASCII) como numeros
+    partes = []
+    texto = []
+    for byte in datos:
+        if 32 <= byte < 127 and byte != 34:
+            texto.append(chr(byte))
+            continue
+        if texto:
+            partes.append(f'"{"".join(texto)}"')
+            texto = []
+        partes.append(str(byte))
+    if texto:
+        partes.append(f'"{"".join(texto)}"')
+    return ", ".join(partes)
+
+
+def identificador(valor, prefijo="string"):
+    # 64 bits de hash: para que dos cadenas distintas choquen harian falta
+    # miles de millones de literales
+    return f"{prefijo}_{hashlib.blake2b(bytes_de(valor), digest_size=8).hexdigest()}"
+
+
+class TablaCadenas:
+    def __init__(self, prefijo="string"):
+        self.prefijo = prefijo
+        # Valor -> identificador; identificador -> el primer valor con esos
+        # bytes ("\t" y un tabulador comparten identificador)
+        self.por_valor = {}
+        self.por_id = {}
+    
+    def agregar(self, valor):
+        str_id = self.por_valor.get(valor)
+        if str_id is None:
+            str_id = self.por_valor[valor] = identificador(valor, self.prefijo)
+            self._registrar(str_id, valor)
+        return str_id
+    
+    def unir(self, otra):
+        # Agrega las cadenas de otra tabla; las que ya estaban no se repiten
+        for valor, str_id in otra.por_valor.items():
+            self.por_valor.setdefault(valor, str_id)
+        for str_id, valor in otra.por_id.items():
+            self._registrar(str_id, valor)
+    
+    def _registrar(self, str_id, valor):
+        anterior = self.por_id.setdefault(str_id, valor)
+        if anterior != valor and bytes_de(anterior) != bytes_de(valor):
+            raise Exception(f"Error: Las cadenas '{anterior}' y '{valor}' tienen el mismo identificador {str_id}")
+    
+    def __len__(self):
+        return len(self.por_id)
+    
+    def lineas(self):
+        # Lineas db de la seccion .data en el orden en que se agregaron
+        datos = {str_id: bytes_de(valor) + b"\0" for str_id, valor in self.por_id.items()}
+        
+        # Con las cadenas invertidas y ordenadas, si una es el final de otra
+        # tambien lo es de la que le sigue, asi que basta comparar vecinas
+        invertidas = sorted(datos, key=lambda str_id: datos[str_id][::-1])
+        contenedora = {}
+        for actual, siguiente in zip(reversed(invertidas[:-1]), reversed(invertidas[1:])):
+            if datos[siguiente].endswith(datos[actual]):
+                contenedora[actual] = contenedora.get(siguiente, siguiente)
+        
+        # Etiquetas que van dentro de cada cadena, por desplazamiento
+        internas = {}
+        for str_id, otra in contenedora.items():
+            internas.setdefault(otra, []).append((len(datos[otra]) - len(datos[str_id]), str_id))
+        
+        lineas = []
+        for str_id in datos:
+            if str_id in contenedora:
+                continue
+            cortes = [(0, str_id)] + sorted(internas.get(str_id, ()))
+            for (inicio, etiqueta), (fin, _) in zip(cortes, cortes[1:] + [(len(datos[str_id]), None)]):
+                lineas.append(f"{etiqueta} db {operandos_db(datos[str_id][inicio:fin])}")
+        
+        return lineas
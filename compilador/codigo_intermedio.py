@@ -0,0 +1,413 @@
+from nodes import *
+from seleccion import cadena_de_casos
+
+# Codigo intermedio de tres direcciones entre el AST y el ensamblador. Cada
+# funcion es una lista de bloques basicos; cada bloque termina en un salto, un
+# salto condicional o un retorno, asi que el grafo de flujo de control queda
+# explicito en 'sucesores' y 'predecesores'.
+#
+# Los operandos son nombres de variables (str), temporales (str que empiezan
+# con '%'), constantes enteras (int) o literales de texto (Cadena). Cada
+# temporal se asigna una sola vez, como en SSA; las variables del programa
+# no, porque no hay funciones phi.
+#
+#   operacion       destino   operandos
+#   copiar          x         (a,)
+#   + - * / % && || == != < > <= >=
+#                   x         (a, b)
+#   neg             x         (a,)
+#   llamar          x o None  (funcion, argumentos...)
+#   imprimir        None      (a,)
+#   leer            x         (formato,)
+#   saltar          None      (etiqueta,)
+#   saltar_si       None      (comparacion, a, b, etiqueta si, etiqueta no)
+#   elegir          None      (a, etiqueta por defecto, valor, etiqueta, valor, etiqueta...)
+#   retornar        None      () o (a,)
+
+OPERACIONES_BINARIAS = ("+", "-", "*", "/", "%", "&&", "||", "==", "!=", "<", ">", "<=", ">=")
+COMPARACIONES = ("==", "!=", "<", ">", "<=", ">=")
+TERMINADORES = ("saltar", "saltar_si", "elegir", "retornar")
+COMPARACION_NEGADA = {"==": "!=", "!=": "==", "<": ">=", ">=": "<", ">": "<=", "<=": ">"}
+
+
+class Cadena:
+    __slots__ = ("valor",)
+    
+    def __init__(self, valor):
+        self.valor = valor
+    
+    def __repr__(self):
+        return self.valor
+
+
+def texto(operando):
+    return operando.valor if type(operando) is Cadena else str(operando)
+
+
+def es_temporal(operando):
+    return type(operando) is str and operando.startswith("%")
+
+
+class Instruccion:
+    __slots__ = ("operacion", "destino", "operandos")
+    
+    def __init__(self, operacion, destino=None, operandos=()):
+        self.operacion = operacion
+        self.destino = destino
+        self.operandos = tuple(operandos)
+    
+    def usos(self):
+        # Operandos que son valores (no etiquetas, formatos ni nombres de funcion)
+        if self.operacion == "llamar":
+            return self.operandos[1:]
+        if self.operacion == "saltar_si":
+            return self.operandos[1:3]
+        if self.operacion == "elegir":
+            return self.operandos[:1]
+        if self.operacion in ("leer", "saltar"):
+            return ()
+        return self.operandos
+    
+    def destinos_de_salto(self):
+        if self.operacion == "saltar":
+            return self.operandos
+        if self.operacion == "saltar_si":
+            return self.operandos[3:]
+        if self.operacion == "elegir":
+            return self.operandos[1:2] + self.operandos[3::2]
+        return ()
+    
+    def casos(self):
+        # (valor, etiqueta) de una instruccion elegir
+        return list(zip(self.operandos[2::2], self.operandos[3::2]))
+    
+    def __str__(self):
+        operacion, destino = self.operacion, self.destino
+        operandos = [texto(operando) for operando in self.operandos]
+        if operacion in OPERACIONES_BINARIAS:
+            return f"{destino} = {operandos[0]} {operacion} {operandos[1]}"
+        if operacion == "copiar":
+            return f"{destino} = {operandos[0]}"
+        if operacion == "neg":
+            return f"{destino} = {operacion} {operandos[0]}"
+        if operacion == "llamar":
+            llamada = f"llamar {operandos[0]}({', '.join(operandos[1:])})"
+            return f"{destino} = {llamada}" if destino else llamada
+        if operacion == "leer":
+            return f"leer {destino} {operandos[0]}"
+        if operacion == "saltar_si":
+            comparacion, a, b, si, no = operandos
+            return f"si {a} {comparacion} {b} saltar {si} sino {no}"
+        if operacion == "elegir":
+            casos = ", ".join(f"{valor}: {etiqueta}" for valor, etiqueta in zip(operandos[2::2], operandos[3::2]))
+            return f"elegir {operandos[0]} [{casos}] sino {operandos[1]}"
+        return " ".join([operacion] + operandos)
+
+
+class BloqueBasico:
+    __slots__ = ("etiqueta", "instrucciones", "sucesores", "predecesores")
+    
+    def __init__(self, etiqueta):
+        self.etiqueta = etiqueta
+        self.instrucciones = []
+        self.sucesores = []
+        self.predecesores = []
+    
+    @property
+    def terminador(self):
+        if self.instrucciones and self.instrucciones[-1].operacion in TERMINADORES:
+            return self.instrucciones[-1]
+        return None
+    
+    def __str__(self):
+        return "\n".join([f"{self.etiqueta}:"] + [f"    {instruccion}" for instruccion in self.instrucciones])
+
+
+class FuncionIR:
+    def __init__(self, nombre, parametros, bloques):
+        self.nombre = nombre
+        self.parametros = parametros
+        self.bloques = bloques
+        self.calcular_cfg()
+    
+    def calcular_cfg(self):
+        # Descarta los bloques que no se alcanzan desde el primero y completa
+        # sucesores y predecesores
+        por_etiqueta = {bloque.etiqueta: bloque for bloque in self.bloques}
+        alcanzados = {self.bloques[0].etiqueta}
+        pendientes = [self.bloques[0]]
+        while pendientes:
+            bloque = pendientes.pop()
+            bloque.sucesores = list(dict.fromkeys(bloque.terminador.destinos_de_salto()))
+            for etiqueta in bloque.sucesores:
+                if etiqueta not in alcanzados:
+                    alcanzados.add(etiqueta)
+                    pendientes.append(por_etiqueta[etiqueta])
+        self.bloques = [bloque for bloque in self.bloques if bloque.etiqueta in alcanzados]
+        for bloque in self.bloques:
+            bloque.predecesores = []
+        for bloque in self.bloques:
+            for etiqueta in bloque.sucesores:
+                por_etiqueta[etiqueta].predecesores.append(bloque.etiqueta)
+    
+    def instrucciones(self):
+        for bloque in self.bloques:
+            yield from bloque.instrucciones
+    
+    def __str__(self):
+        return "\n".join([f"funcion {self.nombre}({', '.join(self.parametros)}):"] + [str(bloque) for bloque in self.bloques])
+
+
+class ProgramaIR:
+    def __init__(self, funciones):
+        self.funciones = funciones
+    
+    def tiene_main(self):
+        return any(funcion.nombre == "main" for funcion in self.funciones)
+    
+    def __str__(self):
+        return "\n\n".join(str(funcion) for funcion in self.funciones)
+
+
+class ConstructorIR(Visitante):
+    # Traduce el AST a codigo intermedio con el mismo esquema de pasos que
+    # GeneradorEnsamblador: cada expresion deja su operando en 'valores' y las
+    # sentencias consumen de ahi. Las condiciones que son comparaciones se
+    # traducen directamente a saltar_si, sin calcular un 0/1 intermedio, y los
+    # ciclos quedan rotados (la condicion al final) como en el generador
+    def construir(self, programa):
+        self.funciones = []
+        self.recorrer(programa)
+        return ProgramaIR(self.funciones)
+    
+    def pasos(self, nodo):
+        constructor = self.constructores.get(type(nodo))
+        if constructor is None:
+            return ()
+        return constructor(self, nodo)
+    
+    def emitir(self, operacion, destino=None, *operandos):
+        if self.bloque.terminador is not None:
+            # Codigo despues de un return: queda en un bloque inalcanzable
+            self.iniciar(self.nueva_etiqueta())
+        instruccion = Instruccion(operacion, destino, operandos)
+        self.bloque.instrucciones.append(instruccion)
+        return instruccion
+    
+    def nueva_etiqueta(self):
+        self.contador_etiquetas += 1
+        return f"B{self.contador_etiquetas}"
+    
+    def nuevo_temporal(self):
+        self.contador_temporales += 1
+        return f"%t{self.contador_temporales}"
+    
+    def iniciar(self, etiqueta):
+        # Empieza un bloque; si el anterior no termino en un salto, cae en este
+        if self.bloques and self.bloque.terminador is None:
+            self.bloque.instrucciones.append(Instruccion("saltar", None, (etiqueta,)))
+        self.bloque = BloqueBasico(etiqueta)
+        self.bloques.append(self.bloque)
+    
+    def accion(self, operacion, destino=None, *operandos):
+        return lambda: self.emitir(operacion, destino, *operandos)
+    
+    def saltar(self, etiqueta):
+        if self.bloque.terminador is None:
+            self.emitir("saltar", None, etiqueta)
+    
+    def _ir_funcion(self, nodo):
+        self.bloques = []
+        self.contador_etiquetas = -1
+        self.contador_temporales = -1
+        self.valores = []
+        self.iniciar(self.nueva_etiqueta())
+        
+        def terminar():
+            if self.bloque.terminador is None:
+                self.emitir("retornar")
+            self.funciones.append(FuncionIR(nodo.nombre, [parametro.nombre for parametro in nodo.parametros], self.bloques))
+        return self._sentencias(nodo.cuerpo) + [terminar]
+    
+    def _ir_programa(self, nodo):
+        return list(nodo.funciones)
+    
+    def _ir_asignacion(self, nodo):
+        def asignar():
+            valor = self.valores.pop()
+            ultima = self.bloque.instrucciones[-1] if self.bloque.instrucciones else None
+            # Cada temporal se usa una sola vez, asi que la instruccion que lo
+            # acaba de calcular puede escribir directamente en la variable
+            if es_temporal(valor) and ultima is not None and ultima.destino == valor:
+                ultima.destino = nodo.nombre
+            else:
+                self.emitir("copiar", nodo.nombre, valor)
+        return [nodo.expresion, asignar]
+    
+    def _ir_incremento(self, nodo):
+        self.emitir(nodo.operador[0], nodo.nombre, nodo.nombre, 1)
+        return ()
+    
+    def _ir_operacion(self, nodo):
+        def operar():
+            derecha = self.valores.pop()
+            izquierda = self.valores.pop()
+            temporal = self.nuevo_temporal()
+            self.emitir(nodo.operador, temporal, izquierda, derecha)
+            self.valores.append(temporal)
+        return [nodo.izquierda, nodo.derecha, operar]
+    
+    def _ir_operacion_unaria(self, nodo):
+        if nodo.operador not in ("-", "+", "!"):
+            # & y * necesitan direcciones de memoria, que el codigo intermedio no tiene
+            raise Exception(f"Error: Operador unario '{nodo.operador}' no soportado en el codigo intermedio")
+        def operar():
+            if nodo.operador == "-":
+                temporal = self.nuevo_temporal()
+                self.emitir("neg", temporal, self.valores.pop())
+                self.valores.append(temporal)
+            elif nodo.operador == "!":
+                # !x es x == 0
+                temporal = self.nuevo_temporal()
+                self.emitir("==", temporal, self.valores.pop(), 0)
+                self.valores.append(temporal)
+        return [nodo.operando, operar]
+    
+    def _ir_identificador(self, nodo):
+        self.valores.append(nodo.nombre)
+        return ()
+    
+    def _ir_numero(self, nodo):
+        self.valores.append(int(nodo.numero))
+        return ()
+    
+    def _ir_string(self, nodo):
+        self.valores.append(Cadena(nodo.valor))
+        return ()
+    
+    def _ir_llamada_funcion(self, nodo):
+        def llamar():
+            argumentos = self.valores[len(self.valores) - len(nodo.argumentos):]
+            del self.valores[len(self.valores) - len(nodo.argumentos):]
+            temporal = self.nuevo_temporal()
+            self.emitir("llamar", temporal, nodo.nombre, *argumentos)
+            self.valores.append(temporal)
+        return list(nodo.argumentos) + [llamar]
+    
+    def _ir_print(self, nodo):
+        return [nodo.expresion, lambda: self.emitir("imprimir", None, self.valores.pop())]
+    
+    def _ir_retorno(self, nodo):
+        if nodo.expresion is None:
+            return [self.accion("retornar")]
+        return [nodo.expresion, lambda: self.emitir("retornar", None, self.valores.pop())]
+    
+    def _ir_scanf(self, nodo):
+        for variable in nodo.variables:
+            self.emitir("leer", variable.nombre, nodo.formato)
+        return ()
+    
+    def _condicion(self, condicion, si, no):
+        # Pasos que evaluan la condicion y saltan a 'si' o a 'no'
+        if isinstance(condicion, NodoOperacion) and condicion.operador in COMPARACIONES:
+            def saltar():
+                derecha = self.valores.pop()
+                izquierda = self.valores.pop()
+                self.emitir("saltar_si", None, condicion.operador, izquierda, derecha, si, no)
+            return [condicion.izquierda, condicion.derecha, saltar]
+        return [condicion, lambda: self.emitir("saltar_si", None, "!=", self.valores.pop(), 0, si, no)]
+    
+    def _sentencias(self, sentencias):
+        # Una llamada usada como sentencia descarta su resultado
+        pasos = []
+        for sentencia in sentencias:
+            pasos.append(sentencia)
+            if isinstance(sentencia, NodoLlamadaFuncion):
+                pasos.append(self._descartar)
+        return pasos
+    
+    def _descartar(self):
+        self.valores.pop()
+        self.bloque.instrucciones[-1].destino = None
+    
+    def _ir_condicional(self, nodo):
+        cadena = cadena_de_casos(nodo)
+        if cadena is not None:
+            return self._ir_seleccion(cadena)
+        entonces, sino, fin = self.nueva_etiqueta(), self.nueva_etiqueta(), self.nueva_etiqueta()
+        pasos = self._condicion(nodo.condicion, entonces, sino if nodo.cuerpo_else else fin)
+        pasos.append(lambda: self.iniciar(entonces))
+        pasos.extend(self._sentencias(nodo.cuerpo))
+        if nodo.cuerpo_else:
+            pasos.append(lambda: (self.saltar(fin), self.iniciar(sino)))
+            pasos.extend(self._sentencias(nodo.cuerpo_else))
+        pasos.append(lambda: self.iniciar(fin))
+        return pasos
+    
+    def _ir_seleccion(self, cadena):
+        # Cadena de if/else if sobre la misma variable: un solo bloque que
+        # termina en elegir y un bloque por caso
+        etiquetas = [self.nueva_etiqueta() for _ in cadena.casos]
+        defecto, fin = self.nueva_etiqueta(), self.nueva_etiqueta()
+        casos = [operando for (valor, _), etiqueta in zip(cadena.casos, etiquetas) for operando in (valor, etiqueta)]
+        pasos = [cadena.variable, lambda: self.emitir("elegir", None, self.valores.pop(), defecto, *casos)]
+        for (_, cuerpo), etiqueta in zip(cadena.casos, etiquetas):
+            pasos.append(lambda etiqueta=etiqueta: self.iniciar(etiqueta))
+            pasos.extend(self._sentencias(cuerpo))
+            pasos.append(lambda: self.saltar(fin))
+        pasos.append(lambda: self.iniciar(defecto))
+        pasos.extend(self._sentencias(cadena.defecto))
+        pasos.append(lambda: self.iniciar(fin))
+        return pasos
+    
+    def _ir_ciclo_while(self, nodo):
+        cuerpo, condicion, fin = self.nueva_etiqueta(), self.nueva_etiqueta(), self.nueva_etiqueta()
+        self.emitir("saltar", None, condicion)
+        pasos = [lambda: self.iniciar(cuerpo)]
+        pasos.extend(self._sentencias(nodo.cuerpo))
+        pasos.append(lambda: self.iniciar(condicion))
+        pasos.extend(self._condicion(nodo.condicion, cuerpo, fin))
+        pasos.append(lambda: self.iniciar(fin))
+        return pasos
+    
+    def _ir_ciclo_for(self, nodo):
+        cuerpo, condicion, fin = self.nueva_etiqueta(), self.nueva_etiqueta(), self.nueva_etiqueta()
+        pasos = []
+        if nodo.inicializacion is not None:
+            pasos.append(nodo.inicializacion)
+        pasos.append(self.accion("saltar", None, condicion))
+        pasos.append(lambda: self.iniciar(cuerpo))
+        pasos.extend(self._sentencias(nodo.cuerpo))
+        if nodo.incremento is not None:
+            pasos.append(nodo.incremento)
+        pasos.append(lambda: self.iniciar(condicion))
+        if nodo.condicion is not None:
+            pasos.extend(self._condicion(nodo.condicion, cuerpo, fin))
+        else:
+            pasos.append(self.accion("saltar", None, cuerpo))
+        pasos.append(lambda: self.iniciar(fin))
+        return pasos
+    
+    constructores = {
+        NodoPrograma: _ir_programa,
+        NodoFuncion: _ir_funcion,
+        NodoAsignacion: _ir_asignacion,
+        NodoIncremento: _ir_incremento,
+        NodoOperacion: _ir_operacion,
+        NodoOperacionUnaria: _ir_operacion_unaria,
+        NodoIdentificador: _ir_identificador,
+        NodoNumero: _ir_numero,
+        NodoFloat: _ir_numero,
+        NodoString: _ir_string,
+        NodoLlamadaFuncion: _ir_llamada_funcion,
+        NodoPrint: _ir_print,
+        NodoRetorno: _ir_retorno,
+        NodoIf: _ir_condicional,
+        NodoWhile: _ir_ciclo_while,
+        NodoFor: _ir_ciclo_for,
+        NodoScanf: _ir_scanf,
+    }
+
+
+def construir_ir(programa):
+    return ConstructorIR().construir(programa)
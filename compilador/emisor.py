@@ -0,0 +1,30 @@
+from mirilla import OptimizadorMirilla, ReporteMirilla
+
+# Salida del ensamblador por partes. El generador entrega cada funcion al
+# terminar su epilogo (el tamano del marco ya se conoce desde el prologo) y la
+# seccion de datos al final, asi que en memoria solo queda el codigo de la
+# funcion que se esta generando y no el programa completo. Con mirilla=True
+# cada funcion pasa por la mirilla antes de escribirse
+
+
+class EmisorEnsamblador:
+    def __init__(self, salida, mirilla=False):
+        # salida: un archivo de texto o cualquier objeto con write()
+        self.salida = salida
+        self.mirilla = OptimizadorMirilla() if mirilla else None
+        self.reporte_mirilla = ReporteMirilla(self.mirilla.reglas) if mirilla else None
+        self.lineas = 0
+    
+    def escribir(self, lineas):
+        if lineas:
+            self.salida.write("\n".join(lineas))
+            self.salida.write("\n")
+            self.lineas += len(lineas)
+    
+    def escribir_funcion(self, lineas):
+        # Ningun salto va de una funcion a otra, asi que la mirilla puede
+        # trabajar sobre cada una por separado
+        if self.mirilla is not None:
+            lineas = self.mirilla.optimizar(lineas)
+            self.reporte_mirilla.sumar(self.mirilla.reporte)
+        self.escribir(lineas)
@@ -1,13 +1,101 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
 from nodes import *
+from asignacion_registros import REGISTROS_VARIABLES, asignar_registros
+from seleccion import cadena_de_casos, lineas_de_despacho
+from cadenas import TablaCadenas
+
+INSTRUCCIONES_OPERADOR = {
+    '+': ["    add rax, rbx"],
+    '-': ["    sub rax, rbx"],
+    '*': ["    imul rax, rbx"],
+    '/': ["    mov rcx, rbx", "    cqo", "    idiv rcx"],
+    '%': ["    mov rcx, rbx", "    cqo", "    idiv rcx", "    mov rax, rdx"],
+    '&&': ["    and rax, rbx"],
+    '||': ["    or rax, rbx"],
+}
+
+# Operaciones que aceptan el operando derecho directamente (registro, memoria o
+# inmediato) sin pasar por rbx
+INSTRUCCION_DIRECTA = {
+    '+': "add",
+    '-': "sub",
+    '*': "imul",
+    '&&': "and",
+    '||': "or",
+}
+
+# Temporales para el operando izquierdo mientras se evalua el derecho; no los
+# preserva una llamada, asi que solo se usan si el derecho no llama a nada
+REGISTROS_TEMPORALES = ("r10", "r11")
+
+SECCION_TEXTO = [
+    'section .text',
+    'default rel',
+    'extern printf',
+    'extern scanf',
+    'extern ExitProcess'
+]
 
-class GeneradorEnsamblador:
-    def __init__(self):
+SALTOS_COMPARACION = {
+    '==': "je",
+    '!=': "jne",
+    '<': "jl",
+    '>': "jg",
+    '<=': "jle",
+    '>=': "jge",
+}
+
+def _inmediato(nodo):
+    # Valor de una constante entera que cabe como operando inmediato de 32 bits
+    if isinstance(nodo, NodoNumero) and type(nodo.numero) is int and -2**31 <= nodo.numero < 2**31:
+        return nodo.numero
+    return None
+
+def generar_funcion(clase, funcion, asignar_registros):
+    # (codigo, cadenas) de una sola funcion con un generador nuevo. Las
+    # etiquetas llevan el nombre de la funcion como prefijo y las cadenas un
+    # identificador que sale de su contenido, asi que no dependen de las demas
+    # funciones y esto puede correr en otro proceso
+    generador = clase(asignar_registros)
+    generador.current_function = funcion.nombre
+    generador._generar_funcion(funcion)
+    return generador.codigo, generador.cadenas
+
+def _nodos_con_llamadas(raiz):
+    # Nodos que contienen alguna llamada. En el pre-orden invertido cada nodo
+    # aparece despues de sus hijos, asi que basta una pasada
+    con_llamadas = set()
+    for nodo in reversed(list(iterar_nodos(raiz))):
+        if isinstance(nodo, NodoLlamadaFuncion):
+            con_llamadas.add(nodo)
+            continue
+        for campo in nodo.campos_hijos:
+            valor = getattr(nodo, campo)
+            if any(hijo in con_llamadas for hijo in (valor if type(valor) is tuple else (valor,))):
+                con_llamadas.add(nodo)
+                break
+    return con_llamadas
+
+class GeneradorEnsamblador(Visitante):
+    def __init__(self, asignar_registros=True):
+        self.asignar_registros = asignar_registros
         self.codigo = []
         self.data_section = []
-        self.string_literals = {}
-        self.string_counter = 0
+        # Con un EmisorEnsamblador (emisor.py) cada funcion se escribe al
+        # terminarla y self.codigo solo guarda la que se esta generando
+        self.emisor = None
+        self.cadenas = TablaCadenas()
         self.current_function = None
+        self.retorno_final = None
         self.local_vars = {}
+        # Variables que viven en un registro (asignacion_registros.py) y
+        # desplazamiento donde se guarda cada registro preservado que se usa
+        self.registros = {}
+        self.registros_guardados = []
+        self.temporales = list(reversed(REGISTROS_TEMPORALES)) if asignar_registros else []
+        self.con_llamadas = set()
         self.param_offset = 0
         self.stack_offset = 8  # Comenzar desde 8 para evitar [rbp - 0]
         self.label_count = 0
@@ -15,126 +103,213 @@ class GeneradorEnsamblador:
         self.main_function_found = False
         
     def nueva_etiqueta(self):
+        # Un punto no puede aparecer en un nombre del lenguaje, asi que no
+        # choca con otra funcion
         self.label_count += 1
-        return f"ETIQUETA_{self.label_count}"
+        return f"{self._nombre_asm()}.{self.label_count}"
+    
+    def _nombre_asm(self):
+        return '_main_impl' if self.current_function == 'main' else self.current_function
     
     def nuevo_string_literal(self, valor):
         if valor.startswith('"') and valor.endswith('"'):
             valor = valor[1:-1]
+        return self.cadenas.agregar(valor)
+    
+    def generar(self, programa, emisor=None, trabajadores=1):
+        # Cada funcion se genera por separado y los resultados se unen en el
+        # orden del programa. Con trabajadores > 1 las funciones se reparten
+        # entre procesos y la salida es la misma byte a byte
+        self.emisor = emisor
+        self._gen_cabecera()
+        self.main_function_found = programa.tiene_main()
+        argumentos = (repeat(type(self)), programa.funciones, repeat(self.asignar_registros))
+        if trabajadores > 1:
+            porcion = max(1, len(programa.funciones) // (trabajadores * 4))
+            with ProcessPoolExecutor(trabajadores) as ejecutor:
+                self._unir_funciones(ejecutor.map(generar_funcion, *argumentos, chunksize=porcion))
+        else:
+            self._unir_funciones(map(generar_funcion, *argumentos))
+        self._gen_fin()
+    
+    def _unir_funciones(self, resultados):
+        for codigo, cadenas in resultados:
+            self.codigo.extend(codigo)
+            self.cadenas.unir(cadenas)
+            self._volcar_funcion()
+    
+    def _generar_funcion(self, funcion):
+        self.recorrer(funcion)
+    
+    def pasos(self, nodo):
+        # Cada generador emite lo que va antes del primer hijo y devuelve el
+        # resto como una secuencia de nodos y acciones que recorrer() ejecuta
+        # en orden, sin recursion
+        generador = self.generadores.get(type(nodo))
+        if generador is None:
+            # Mejor fallar que dejar el nodo sin codigo
+            raise Exception(f"Error: El generador no sabe traducir {type(nodo).__name__}")
+        return generador(self, nodo)
+    
+    def emitir(self, *lineas):
+        # Accion que agrega las lineas al codigo cuando llega su turno en el recorrido
+        return lambda: self.codigo.extend(lineas)
+    
+    def _guardar_variable(self, nombre):
+        # El desplazamiento se consulta al ejecutar la accion, despues de evaluar la expresion
+        return lambda: self.codigo.append(f"    mov {self._ubicacion(nombre)}, rax")
+    
+    def _ubicacion(self, nombre):
+        if nombre in self.registros:
+            return self.registros[nombre]
+        return f"[rbp - {self.local_vars[nombre]}]"
+    
+    def _operando(self, nodo):
+        # Un operando que se puede usar tal cual en la instruccion: inmediato,
+        # registro o posicion de memoria; None si hay que evaluarlo
+        if _inmediato(nodo) is not None:
+            return str(_inmediato(nodo))
+        if isinstance(nodo, NodoIdentificador) and (nodo.nombre in self.registros or nodo.nombre in self.local_vars):
+            return self._ubicacion(nodo.nombre)
+        return None
+    
+    def _gen_operandos(self, derecha):
+        # Con el operando izquierdo ya en rax, evalua el derecho y deja
+        # izquierdo en rax y derecho en rbx. Mientras se evalua el derecho el
+        # izquierdo se aparta en un temporal libre, o en la pila si no queda
+        # ninguno o si el derecho tiene llamadas
+        operando = self._operando(derecha)
+        if operando is not None:
+            return [self.emitir(f"    mov rbx, {operando}")]
+        apartado = []
+        sin_llamadas = derecha not in self.con_llamadas
+        
+        def apartar():
+            if sin_llamadas and self.temporales:
+                apartado.append(self.temporales.pop())
+                self.codigo.append(f"    mov {apartado[0]}, rax")
+            else:
+                self.codigo.append("    push rax")
         
-        for str_id, str_val in self.string_literals.items():
-            if str_val == valor:
-                return str_id
+        def recuperar():
+            self.codigo.append("    mov rbx, rax")
+            if apartado:
+                self.codigo.append(f"    mov rax, {apartado[0]}")
+                self.temporales.append(apartado[0])
+            else:
+                self.codigo.append("    pop rax")
         
-        str_id = f"string_{self.string_counter}"
-        self.string_literals[str_id] = valor
-        self.string_counter += 1
-        return str_id
+        return [apartar, derecha, recuperar]
     
-    def generar(self, nodo):
-        if isinstance(nodo, NodoPrograma):
-            self._gen_cabecera()
-            for funcion in nodo.funciones:
-                if funcion.nombre == 'main':
-                    self.main_function_found = True
-                self.generar(funcion)
-            self._gen_fin()
+    def _gen_funcion(self, nodo):
+        self.current_function = nodo.nombre
+        # Un return que no es la ultima sentencia salta al epilogo; el ultimo
+        # ya termina justo antes
+        self.retorno_final = nodo.cuerpo[-1] if nodo.cuerpo else None
+        return self._gen_funcion_prologo(nodo) + list(nodo.cuerpo) + [self._gen_funcion_epilogo]
             
-        elif isinstance(nodo, NodoFuncion):
-            self.current_function = nodo.nombre
-            self._gen_funcion_prologo(nodo)
-            for instr in nodo.cuerpo:
-                self.generar(instr)
-            self._gen_funcion_epilogo()
-            
-        elif isinstance(nodo, NodoAsignacion):
-            if nodo.tipo:  
-                self.local_vars[nodo.nombre] = self.stack_offset
-                self.stack_offset += 8
-            self.generar(nodo.expresion)
-            self.codigo.append(f"    mov [rbp - {self.local_vars[nodo.nombre]}], rax")
-            
-        elif isinstance(nodo, NodoOperacion):
-            if nodo.operador in ['==', '!=', '<', '>', '<=', '>=']:
-                self._gen_comparacion(nodo)
-                return
-                
-            self.generar(nodo.izquierda)
-            self.codigo.append("    push rax")  
-            self.generar(nodo.derecha)
-            self.codigo.append("    mov rbx, rax")
-            self.codigo.append("    pop rax")     
+    def _gen_asignacion(self, nodo):
+        if nodo.tipo:  
+            self.local_vars[nodo.nombre] = self.stack_offset
+            self.stack_offset += 8
+        return [nodo.expresion, self._guardar_variable(nodo.nombre)]
             
-            if nodo.operador == '+':
-                self.codigo.append("    add rax, rbx")  
-            elif nodo.operador == '-':
-                self.codigo.append("    sub rax, rbx")  
-            elif nodo.operador == '*':
-                self.codigo.append("    imul rax, rbx") 
-            elif nodo.operador == '/':
-                self.codigo.append("    mov rcx, rbx")  
-                self.codigo.append("    cqo")           
-                self.codigo.append("    idiv rcx")      
-            elif nodo.operador == '%':
-                self.codigo.append("    mov rcx, rbx")  
-                self.codigo.append("    cqo")           
-                self.codigo.append("    idiv rcx")      
-                self.codigo.append("    mov rax, rdx")  
-            elif nodo.operador == '&&':
-                self.codigo.append("    and rax, rbx") 
-            elif nodo.operador == '||':
-                self.codigo.append("    or rax, rbx")   
+    def _gen_operacion(self, nodo):
+        if nodo.operador in SALTOS_COMPARACION:
+            return self._gen_comparacion(nodo)
+        
+        if _inmediato(nodo.derecha) is not None:
+            instrucciones = self._instrucciones_inmediatas(nodo.operador, _inmediato(nodo.derecha))
+            if instrucciones is not None:
+                return [nodo.izquierda, self.emitir(*instrucciones)]
                 
-        elif isinstance(nodo, NodoIdentificador):
-            if nodo.nombre in self.local_vars:
-                self.codigo.append(f"    mov rax, [rbp - {self.local_vars[nodo.nombre]}]")
-            else:
-                self.codigo.append(f"    mov rax, {nodo.nombre}")
-                
-        elif isinstance(nodo, NodoNumero):
-            try:
-                if isinstance(nodo.valor, str) and '.' in nodo.valor:
-                    valor_entero = int(float(nodo.valor))
-                    self.codigo.append(f"    mov rax, {valor_entero}")
-                else:
-                    self.codigo.append(f"    mov rax, {nodo.valor}")
-            except ValueError:
-                self.codigo.append(f"    mov rax, {nodo.valor}")
-            
-        elif isinstance(nodo, NodoString):
-            str_id = self.nuevo_string_literal(nodo.valor)
-            self.codigo.append(f"    lea rax, [{str_id}]")
-            
-        elif isinstance(nodo, NodoLlamadaFuncion):
-            self._gen_llamada_funcion(nodo)
-            
-        elif isinstance(nodo, NodoPrint):
-            self.generar(nodo.expresion)
+        operando = self._operando(nodo.derecha)
+        if operando is not None and nodo.operador in INSTRUCCION_DIRECTA:
+            return [nodo.izquierda, self.emitir(f"    {INSTRUCCION_DIRECTA[nodo.operador]} rax, {operando}")]
+        
+        return [
+            nodo.izquierda,
+            *self._gen_operandos(nodo.derecha),
+            self.emitir(*INSTRUCCIONES_OPERADOR.get(nodo.operador, ())),
+        ]
             
-            if isinstance(nodo.expresion, NodoString):
-                self.codigo.append("    mov rdx, rax")         
-                self.codigo.append("    lea rcx, [fmt_str_s]") 
-            else:
-                self.codigo.append("    mov rdx, rax")         
-                self.codigo.append("    lea rcx, [fmt_str_d]") 
-            self.codigo.append("    sub rsp, 32") 
-            self.codigo.append("    call printf")
-            self.codigo.append("    add rsp, 32")
+    def _gen_operacion_unaria(self, nodo):
+        if nodo.operador == '-':
+            return [nodo.operando, self.emitir("    neg rax")]
+        if nodo.operador == '!':
+            return [nodo.operando, self.emitir("    cmp rax, 0", "    sete al", "    movzx rax, al")]
+        if nodo.operador == '+':
+            return [nodo.operando]
+        # & y * necesitan direcciones de memoria, que el generador no maneja
+        raise Exception(f"Error: Operador unario '{nodo.operador}' no soportado por el generador")
+    
+    def _gen_incremento(self, nodo):
+        instruccion = "add" if nodo.operador == "++" else "sub"
+        ubicacion = self._ubicacion(nodo.nombre)
+        self.codigo.extend([f"    mov rax, {ubicacion}", f"    {instruccion} rax, 1", f"    mov {ubicacion}, rax"])
+        return ()
             
-        elif isinstance(nodo, NodoRetorno):
-            self.generar(nodo.expresion)
+    def _instrucciones_inmediatas(self, operador, valor):
+        # Con una constante a la derecha no hace falta evaluarla en rbx: se usa
+        # como operando inmediato, y las multiplicaciones y divisiones por
+        # potencias de dos se hacen con desplazamientos
+        if operador == '+':
+            return [f"    add rax, {valor}"]
+        if operador == '-':
+            return [f"    sub rax, {valor}"]
+        if operador == '*':
+            if valor > 0 and valor & (valor - 1) == 0:
+                return [f"    shl rax, {valor.bit_length() - 1}"] if valor > 1 else []
+            return [f"    imul rax, rax, {valor}"]
+        if operador == '/' and valor > 0 and valor & (valor - 1) == 0:
+            if valor == 1:
+                return []
+            # sar redondea hacia menos infinito; sumar 2^k - 1 a los negativos
+            # lo convierte en el truncamiento hacia cero de idiv
+            desplazamiento = valor.bit_length() - 1
+            return [
+                "    mov rbx, rax",
+                "    sar rbx, 63",
+                f"    shr rbx, {64 - desplazamiento}",
+                "    add rax, rbx",
+                f"    sar rax, {desplazamiento}",
+            ]
+        return None
             
-        elif isinstance(nodo, NodoIf):
-            self._gen_condicional(nodo)
+    def _gen_identificador(self, nodo):
+        if nodo.nombre in self.registros or nodo.nombre in self.local_vars:
+            self.codigo.append(f"    mov rax, {self._ubicacion(nodo.nombre)}")
+        else:
+            self.codigo.append(f"    mov rax, {nodo.nombre}")
+        return ()
+                
+    def _gen_numero(self, nodo):
+        # El valor numerico ya viene convertido desde el constructor del nodo
+        self.codigo.append(f"    mov rax, {int(nodo.numero)}")
+        return ()
             
-        elif isinstance(nodo, NodoWhile):
-            self._gen_ciclo_while(nodo)
+    def _gen_string(self, nodo):
+        str_id = self.nuevo_string_literal(nodo.valor)
+        self.codigo.append(f"    lea rax, [{str_id}]")
+        return ()
             
-        elif isinstance(nodo, NodoFor):
-            self._gen_ciclo_for(nodo)
+    def _gen_print(self, nodo):
+        if isinstance(nodo.expresion, NodoString):
+            formato = "    lea rcx, [fmt_str_s]"
+        else:
+            formato = "    lea rcx, [fmt_str_d]"
+        return [
+            nodo.expresion,
+            self.emitir("    mov rdx, rax", formato, "    sub rsp, 32", "    call printf", "    add rsp, 32"),
+        ]
             
-        elif isinstance(nodo, NodoScanf):
-            self._gen_scanf(nodo)
+    def _gen_retorno(self, nodo):
+        if nodo is self.retorno_final:
+            return [nodo.expresion]
+        return [nodo.expresion, self.emitir(f"    jmp {self._etiqueta_epilogo()}")]
+    
+    def _etiqueta_epilogo(self):
+        return f"{self._nombre_asm()}.fin"
     
     def _gen_cabecera(self):
         self.data_section = [
@@ -145,11 +320,11 @@ class GeneradorEnsamblador:
             'fmt_scanf_int db "%d", 0',
             'fmt_scanf_str db "%s", 0'
         ]
+        if self.emisor is not None:
+            self.emisor.escribir(SECCION_TEXTO + [''])
         
     def _gen_fin(self):
-        for str_id, str_val in self.string_literals.items():
-            escaped_val = str_val.replace('\\n', '", 10, "')
-            self.data_section.append(f'{str_id} db "{escaped_val}", 0')
+        self.data_section.extend(self.cadenas.lineas())
             
         if not self.entry_point_added and self.main_function_found:
             self.codigo.extend([
@@ -163,6 +338,10 @@ class GeneradorEnsamblador:
             ])
             self.entry_point_added = True
         
+        self._volcar_funcion()
+        if self.emisor is not None:
+            self.emisor.escribir([''] + self.data_section)
+        
     def _gen_funcion_prologo(self, funcion):
         func_name = '_main_impl' if funcion.nombre == 'main' else funcion.nombre
         
@@ -172,47 +351,76 @@ class GeneradorEnsamblador:
         self.codigo.append("    mov rbp, rsp")
         
         self.local_vars = {}
-        param_offset = 8  # Offset para parámetros (empezando desde [rbp+16])
-        
-        for i, param in enumerate(funcion.parametros):
-            if i < 4:
-                self.local_vars[param.nombre] = param_offset
-                param_offset += 8
-            else:
-                self.local_vars[param.nombre] = 16 + (i-4)*8  # [rbp+16], [rbp+24], etc.
-        
-        variables_locales = []
+        param_offset = 8
+        
+        # Cada parametro tiene su lugar en el marco. Los de registro se guardan
+        # ahi al entrar; los de pila se copian desde [rbp + 48], despues de la
+        # direccion de retorno, rbp y los 32 bytes de sombra
+        for param in funcion.parametros:
+            self.local_vars[param.nombre] = param_offset
+            param_offset += 8
+        
+        # Se reserva lugar para todas las declaraciones de la funcion, tambien
+        # las de bloques anidados, en el mismo orden en que _gen_asignacion y
+        # _gen_scanf se lo asignan durante el cuerpo, y a continuacion de los
+        # parametros para no pisarlos
+        local_var_offset = param_offset
+        conocidas = set(self.local_vars)
+        conocidas.update(instr.nombre for instr in funcion.cuerpo if isinstance(instr, NodoAsignacion) and instr.tipo)
         for instr in funcion.cuerpo:
-            if isinstance(instr, NodoAsignacion) and instr.tipo:
-                variables_locales.append(instr)
-        
-        local_var_offset = 8
-        for var in variables_locales:
-            self.local_vars[var.nombre] = local_var_offset
-            local_var_offset += 8
+            for nodo in iterar_nodos(instr):
+                if isinstance(nodo, NodoAsignacion) and nodo.tipo:
+                    if nodo is instr:
+                        self.local_vars[nodo.nombre] = local_var_offset
+                    local_var_offset += 8
+                elif isinstance(nodo, NodoScanf):
+                    for var in nodo.variables:
+                        if var.nombre not in conocidas:
+                            conocidas.add(var.nombre)
+                            local_var_offset += 8
+        self.stack_offset = param_offset
+        
+        # Los registros preservados que se usan se guardan despues de las variables
+        self.registros = asignar_registros(funcion) if self.asignar_registros else {}
+        self.con_llamadas = _nodos_con_llamadas(funcion) if self.asignar_registros else set()
+        self.registros_guardados = []
+        for reg in REGISTROS_VARIABLES:
+            if reg in self.registros.values():
+                self.registros_guardados.append((reg, local_var_offset))
+                local_var_offset += 8
         
         total_space = ((local_var_offset - 1 + 15) // 16 * 16)
         self.codigo.append(f"    sub rsp, {total_space}")
+        for reg, offset in self.registros_guardados:
+            self.codigo.append(f"    mov [rbp - {offset}], {reg}")
         
         for i, param in enumerate(funcion.parametros):
             if i < 4:
                 reg = ['rcx', 'rdx', 'r8', 'r9'][i]
-                self.codigo.append(f"    mov [rbp - {self.local_vars[param.nombre]}], {reg}")
-        
-        for instr in funcion.cuerpo:
-            if isinstance(instr, NodoAsignacion) and instr.tipo:
-                self.generar(instr.expresion)
-                self.codigo.append(f"    mov [rbp - {self.local_vars[instr.nombre]}], rax")
+                self.codigo.append(f"    mov {self._ubicacion(param.nombre)}, {reg}")
+            else:
+                self.codigo.append(f"    mov rax, [rbp + {48 + (i - 4) * 8}]")
+                self.codigo.append(f"    mov {self._ubicacion(param.nombre)}, rax")
+        return []
             
     def _gen_funcion_epilogo(self):
+        self.codigo.append(f"{self._etiqueta_epilogo()}:")
+        for reg, offset in self.registros_guardados:
+            self.codigo.append(f"    mov {reg}, [rbp - {offset}]")
         self.codigo.append("    mov rsp, rbp")
         self.codigo.append("    pop rbp")
         self.codigo.append("    ret")
+    
+    def _volcar_funcion(self):
+        if self.emisor is not None:
+            self.emisor.escribir_funcion(self.codigo)
+            self.codigo = []
         
     def _gen_llamada_funcion(self, nodo):
         called_func = '_main_impl' if nodo.nombre == 'main' else nodo.nombre
         
-        args_reversed = list(reversed(nodo.argumentos))
+        en_registros = nodo.argumentos[:4]
+        en_pila = nodo.argumentos[4:]
         
         if len(nodo.argumentos) > 4:
             stack_args = len(nodo.argumentos) - 4
@@ -220,16 +428,15 @@ class GeneradorEnsamblador:
             if padding > 0:
                 self.codigo.append(f"    sub rsp, {padding}")
         
-        for i, arg in enumerate(args_reversed):
-            self.generar(arg)
-            if i < 4:
-                reg = ['rcx', 'rdx', 'r8', 'r9'][i]
-                self.codigo.append(f"    mov {reg}, rax")
-            else:
-                self.codigo.append("    push rax")
-        
-        self.codigo.append("    sub rsp, 32")
-        self.codigo.append(f"    call {called_func}")
+        # Los argumentos de pila van del ultimo al quinto; los de registro se
+        # evaluan en orden y se guardan en la pila hasta el final, porque una
+        # llamada dentro de un argumento pisaria rcx, rdx, r8 y r9
+        pasos = []
+        for arg in list(reversed(en_pila)) + list(en_registros):
+            pasos.append(arg)
+            pasos.append(self.emitir("    push rax"))
+        registros = ['rcx', 'rdx', 'r8', 'r9'][:len(en_registros)]
+        pasos.append(self.emitir(*(f"    pop {reg}" for reg in reversed(registros))))
         
         args_on_stack = max(0, len(nodo.argumentos) - 4) * 8
         total_to_add = 32 + args_on_stack
@@ -240,34 +447,30 @@ class GeneradorEnsamblador:
             total_to_add += padding
         
         if args_on_stack > 0:
-            self.codigo.append(f"    add rsp, {total_to_add}")
+            restaurar = f"    add rsp, {total_to_add}"
         else:
-            self.codigo.append("    add rsp, 32")
+            restaurar = "    add rsp, 32"
+        pasos.append(self.emitir("    sub rsp, 32", f"    call {called_func}", restaurar))
+        return pasos
     
     def _gen_comparacion(self, nodo):
-        self.generar(nodo.izquierda)
-        self.codigo.append("    push rax")
+        operando = self._operando(nodo.derecha)
+        if operando is not None:
+            return [nodo.izquierda, lambda: self._gen_salto_comparacion(nodo.operador, operando)]
+        return [
+            nodo.izquierda,
+            *self._gen_operandos(nodo.derecha),
+            lambda: self._gen_salto_comparacion(nodo.operador, "rbx"),
+        ]
         
-        self.generar(nodo.derecha)
-        self.codigo.append("    mov rbx, rax") 
-        self.codigo.append("    pop rax")
-        self.codigo.append("    cmp rax, rbx")
+    def _gen_salto_comparacion(self, operador, operando):
+        self.codigo.append(f"    cmp rax, {operando}")
         
+        # Las etiquetas se crean despues de generar los operandos, que pueden tener las suyas
         etiq_verdadero = self.nueva_etiqueta()
         etiq_fin = self.nueva_etiqueta()
         
-        if nodo.operador == "==":
-            self.codigo.append(f"    je {etiq_verdadero}")
-        elif nodo.operador == "!=":
-            self.codigo.append(f"    jne {etiq_verdadero}")
-        elif nodo.operador == "<":
-            self.codigo.append(f"    jl {etiq_verdadero}")
-        elif nodo.operador == ">":
-            self.codigo.append(f"    jg {etiq_verdadero}")
-        elif nodo.operador == "<=":
-            self.codigo.append(f"    jle {etiq_verdadero}")
-        elif nodo.operador == ">=":
-            self.codigo.append(f"    jge {etiq_verdadero}")
+        self.codigo.append(f"    {SALTOS_COMPARACION[operador]} {etiq_verdadero}")
         
         self.codigo.append("    mov rax, 0")
         self.codigo.append(f"    jmp {etiq_fin}")
@@ -278,31 +481,45 @@ class GeneradorEnsamblador:
         self.codigo.append(f"{etiq_fin}:")
         
     def _gen_condicional(self, nodo):
+        cadena = cadena_de_casos(nodo)
+        if cadena is not None:
+            return self._gen_seleccion(cadena)
+        
         else_label = self.nueva_etiqueta()
         fin_label = self.nueva_etiqueta()
         
-        self.generar(nodo.condicion)
-        
-        self.codigo.append("    test rax, rax")
-        self.codigo.append(f"    jz {else_label}")
-        
-        for instr in nodo.cuerpo:
-            self.generar(instr)
+        pasos = [nodo.condicion, self.emitir("    test rax, rax", f"    jz {else_label}")]
+        pasos.extend(nodo.cuerpo)
             
         if nodo.cuerpo_else:
-            self.codigo.append(f"    jmp {fin_label}")
-        
-        self.codigo.append(f"{else_label}:")
-        for instr in nodo.cuerpo_else:
-            self.generar(instr)
+            pasos.append(self.emitir(f"    jmp {fin_label}", f"{else_label}:"))
+        else:
+            pasos.append(self.emitir(f"{else_label}:"))
+        pasos.extend(nodo.cuerpo_else)
         
-        self.codigo.append(f"{fin_label}:")
+        pasos.append(self.emitir(f"{fin_label}:"))
+        return pasos
+    
+    def _gen_seleccion(self, cadena):
+        # Una cadena de if/else if que compara la misma variable con
+        # constantes: se carga una vez y se salta al caso con seleccion.py
+        etiquetas = [self.nueva_etiqueta() for _ in cadena.casos]
+        defecto_label = self.nueva_etiqueta()
+        fin_label = self.nueva_etiqueta()
+        casos = [(valor, etiqueta) for (valor, _), etiqueta in zip(cadena.casos, etiquetas)]
+        
+        pasos = [cadena.variable, lambda: self.codigo.extend(lineas_de_despacho("rax", casos, defecto_label, self.nueva_etiqueta))]
+        for (_, cuerpo), etiqueta in zip(cadena.casos, etiquetas):
+            pasos.append(self.emitir(f"{etiqueta}:"))
+            pasos.extend(cuerpo)
+            pasos.append(self.emitir(f"    jmp {fin_label}"))
+        pasos.append(self.emitir(f"{defecto_label}:"))
+        pasos.extend(cadena.defecto)
+        pasos.append(self.emitir(f"{fin_label}:"))
+        return pasos
     
     def _gen_scanf(self, nodo):
-        formato = nodo.formato.strip('"')
-        fmt_id = f"scanf_fmt_{self.string_counter}"
-        self.string_literals[fmt_id] = formato
-        self.string_counter += 1
+        fmt_id = self.nuevo_string_literal(nodo.formato)
         
         for var in nodo.variables:
             var_name = var.nombre
@@ -318,6 +535,10 @@ class GeneradorEnsamblador:
                 "    call scanf",
                 "    add rsp, 32"
             ])
+            # scanf necesita una direccion; despues se carga en el registro
+            if var_name in self.registros:
+                self.codigo.append(f"    mov {self.registros[var_name]}, [rbp - {var_offset}]")
+        return ()
     
     def _gen_ciclo_while(self, nodo):
         inicio_label = self.nueva_etiqueta()
@@ -327,15 +548,12 @@ class GeneradorEnsamblador:
         self.codigo.append(f"    jmp {condicion_label}") 
         
         self.codigo.append(f"{inicio_label}:")
-        for instr in nodo.cuerpo: 
-            self.generar(instr)
+        pasos = list(nodo.cuerpo)
         
-        self.codigo.append(f"{condicion_label}:")
-        self.generar(nodo.condicion)
-        self.codigo.append("    test rax, rax")
-        self.codigo.append(f"    jnz {inicio_label}") 
-        
-        self.codigo.append(f"{fin_label}:")
+        pasos.append(self.emitir(f"{condicion_label}:"))
+        pasos.append(nodo.condicion)
+        pasos.append(self.emitir("    test rax, rax", f"    jnz {inicio_label}", f"{fin_label}:"))
+        return pasos
         
     def _gen_ciclo_for(self, nodo):
         inicio_label = self.nueva_etiqueta()
@@ -343,46 +561,52 @@ class GeneradorEnsamblador:
         incremento_label = self.nueva_etiqueta()
         fin_label = self.nueva_etiqueta()
 
+        pasos = []
         if nodo.inicializacion:
-            self.generar(nodo.inicializacion)
+            pasos.append(nodo.inicializacion)
 
-        self.codigo.append(f"    jmp {condicion_label}")
+        pasos.append(self.emitir(f"    jmp {condicion_label}", f"{inicio_label}:"))
+        pasos.extend(nodo.cuerpo)
 
-        self.codigo.append(f"{inicio_label}:")
-        for instr in nodo.cuerpo:
-            self.generar(instr)
-            
-        self.codigo.append(f"{incremento_label}:")
+        pasos.append(self.emitir(f"{incremento_label}:"))
         if nodo.incremento:
-            if isinstance(nodo.incremento, NodoAsignacion):
-                self.generar(nodo.incremento)
-            else:
-                self.generar(nodo.incremento)
-
-        self.codigo.append(f"{condicion_label}:")
+            pasos.append(nodo.incremento)
+            
+        pasos.append(self.emitir(f"{condicion_label}:"))
         if nodo.condicion:
-            self.generar(nodo.condicion)
-            self.codigo.append("    test rax, rax")
-            self.codigo.append(f"    jnz {inicio_label}")
+            pasos.append(nodo.condicion)
+            pasos.append(self.emitir("    test rax, rax", f"    jnz {inicio_label}"))
         else:
-            self.codigo.append(f"    jmp {inicio_label}")
+            pasos.append(self.emitir(f"    jmp {inicio_label}"))
 
-        self.codigo.append(f"{fin_label}:")
+        pasos.append(self.emitir(f"{fin_label}:"))
+        return pasos
         
     def obtener_codigo(self):
-        extern_section = [
-            'section .text',
-            'default rel',
-            'extern printf',
-            'extern scanf',
-            'extern ExitProcess'
-        ]
-    
+        # El mismo orden en que escribe un EmisorEnsamblador: codigo y despues datos
         return '\n'.join(
-            self.data_section + 
+            SECCION_TEXTO + 
             [''] + 
-            extern_section + 
+            self.codigo + 
             [''] + 
-            self.codigo
+            self.data_section
         )
-    
\ No newline at end of file
+    
+    generadores = {
+        NodoFuncion: _gen_funcion,
+        NodoAsignacion: _gen_asignacion,
+        NodoOperacion: _gen_operacion,
+        NodoOperacionUnaria: _gen_operacion_unaria,
+        NodoIncremento: _gen_incremento,
+        NodoIdentificador: _gen_identificador,
+        NodoNumero: _gen_numero,
+        NodoFloat: _gen_numero,
+        NodoString: _gen_string,
+        NodoLlamadaFuncion: _gen_llamada_funcion,
+        NodoPrint: _gen_print,
+        NodoRetorno: _gen_retorno,
+        NodoIf: _gen_condicional,
+        NodoWhile: _gen_ciclo_while,
+        NodoFor: _gen_ciclo_for,
+        NodoScanf: _gen_scanf,
+    }
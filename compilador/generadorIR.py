@@ -0,0 +1,315 @@
+from generadorEnsamblador import GeneradorEnsamblador, INSTRUCCION_DIRECTA, SALTOS_COMPARACION
+from asignacion_registros import barrido_lineal
+from codigo_intermedio import *
+from seleccion import lineas_de_despacho
+
+# Traduccion del codigo intermedio a ensamblador x86-64 (NASM, Windows x64).
+# Como los operandos del codigo intermedio ya son valores simples, cada
+# instruccion se traduce sola, sin pila de temporales. Variables y
+# temporales se asignan a registros por barrido lineal sobre el orden de las
+# instrucciones, con intervalos que salen del analisis de variables vivas
+# sobre el grafo de flujo, asi que un valor solo ocupa su registro en todo un
+# ciclo si de verdad pasa de una vuelta a la siguiente.
+# rax, rcx y rdx quedan como registros de trabajo y r8/r9 para argumentos
+
+REGISTROS_IR = ("rbx", "rsi", "rdi", "r12", "r13", "r14", "r15")
+REGISTROS_ARGUMENTOS = ("rcx", "rdx", "r8", "r9")
+ASIGNAR_COMPARACION = {
+    '==': "sete",
+    '!=': "setne",
+    '<': "setl",
+    '>': "setg",
+    '<=': "setle",
+    '>=': "setge",
+}
+
+
+def vivas_por_bloque(funcion, locales):
+    # Analisis de variables vivas hacia atras sobre el grafo de flujo:
+    # etiqueta -> (vivas a la entrada, vivas a la salida)
+    usos, definiciones = {}, {}
+    for bloque in funcion.bloques:
+        usadas, definidas = set(), set()
+        for instruccion in bloque.instrucciones:
+            usadas.update(valor for valor in instruccion.usos() if type(valor) is str and valor in locales and valor not in definidas)
+            if instruccion.destino:
+                definidas.add(instruccion.destino)
+        usos[bloque.etiqueta], definiciones[bloque.etiqueta] = usadas, definidas
+    entrada = {bloque.etiqueta: set() for bloque in funcion.bloques}
+    salida = {bloque.etiqueta: set() for bloque in funcion.bloques}
+    cambio = True
+    while cambio:
+        cambio = False
+        for bloque in reversed(funcion.bloques):
+            etiqueta = bloque.etiqueta
+            salida[etiqueta] = set().union(*(entrada[sucesor] for sucesor in bloque.sucesores))
+            nueva = usos[etiqueta] | (salida[etiqueta] - definiciones[etiqueta])
+            if nueva != entrada[etiqueta]:
+                entrada[etiqueta] = nueva
+                cambio = True
+    return {etiqueta: (entrada[etiqueta], salida[etiqueta]) for etiqueta in entrada}
+
+
+def intervalos_ir(funcion):
+    # nombre -> [inicio, fin] para parametros, variables y temporales: desde
+    # la primera hasta la ultima posicion en la que aparece o esta vivo. Los
+    # parametros estan vivos desde la entrada
+    locales = set(funcion.parametros)
+    locales.update(instruccion.destino for instruccion in funcion.instrucciones() if instruccion.destino)
+    vivas = vivas_por_bloque(funcion, locales)
+    intervalos = {parametro: [0, 0] for parametro in funcion.parametros}
+
+    def extender(valor, posicion):
+        intervalo = intervalos.setdefault(valor, [posicion, posicion])
+        intervalo[0] = min(intervalo[0], posicion)
+        intervalo[1] = max(intervalo[1], posicion)
+
+    posicion = 0
+    for bloque in funcion.bloques:
+        entrada, salida = vivas[bloque.etiqueta]
+        for valor in entrada:
+            extender(valor, posicion)
+        for instruccion in bloque.instrucciones:
+            for valor in (*instruccion.usos(), instruccion.destino):
+                if type(valor) is str and valor in locales:
+                    extender(valor, posicion)
+            posicion += 1
+        for valor in salida:
+            extender(valor, posicion - 1)
+    return intervalos
+
+
+def _inmediato(valor):
+    return type(valor) is int and -2**31 <= valor < 2**31
+
+
+def _potencia_de_dos(valor):
+    return type(valor) is int and valor > 0 and valor & (valor - 1) == 0
+
+
+class GeneradorIR(GeneradorEnsamblador):
+    # Reutiliza de GeneradorEnsamblador generar() (una funcion a la vez,
+    # tambien en paralelo), la seccion de datos, los literales de texto, el
+    # punto de entrada y obtener_codigo()
+    def _generar_funcion(self, funcion):
+        self.current_function = funcion.nombre
+        nombre = self._nombre_asm()
+        self.etiquetas = {bloque.etiqueta: f"{nombre}.{bloque.etiqueta}" for bloque in funcion.bloques}
+        self._asignar_ubicaciones(funcion)
+
+        self.codigo.append(f"global {nombre}")
+        self.codigo.append(f"{nombre}:")
+        self.codigo.append("    push rbp")
+        self.codigo.append("    mov rbp, rsp")
+        self.codigo.append(f"    sub rsp, {self.espacio}")
+        for registro, desplazamiento in self.registros_guardados:
+            self.codigo.append(f"    mov [rbp - {desplazamiento}], {registro}")
+        for i, parametro in enumerate(funcion.parametros):
+            if i < 4:
+                self._guardar(parametro, REGISTROS_ARGUMENTOS[i])
+            elif self.ubicaciones[parametro] in REGISTROS_IR:
+                self.codigo.append(f"    mov {self.ubicaciones[parametro]}, [rbp + {48 + (i - 4) * 8}]")
+
+        for i, bloque in enumerate(funcion.bloques):
+            self.siguiente = funcion.bloques[i + 1].etiqueta if i + 1 < len(funcion.bloques) else None
+            self.codigo.append(f"{self.etiquetas[bloque.etiqueta]}:")
+            for instruccion in bloque.instrucciones:
+                self.traducciones[instruccion.operacion](self, instruccion)
+        self._gen_funcion_epilogo()
+
+    def _asignar_ubicaciones(self, funcion):
+        # Registro o posicion en la pila de cada valor de la funcion. Los
+        # parametros desde el quinto ya estan en la pila del llamador, despues
+        # de la direccion de retorno, el rbp guardado y el espacio de sombra
+        registros = barrido_lineal(intervalos_ir(funcion), REGISTROS_IR)
+        self.ubicaciones = dict(registros)
+        desplazamiento = 8
+        for i, parametro in enumerate(funcion.parametros[4:], 4):
+            if parametro not in self.ubicaciones:
+                self.ubicaciones[parametro] = f"[rbp + {48 + (i - 4) * 8}]"
+        locales = dict.fromkeys(funcion.parametros)
+        locales.update(dict.fromkeys(instruccion.destino for instruccion in funcion.instrucciones() if instruccion.destino))
+        for nombre in locales:
+            if nombre not in self.ubicaciones:
+                self.ubicaciones[nombre] = f"[rbp - {desplazamiento}]"
+                desplazamiento += 8
+        # scanf necesita una direccion aunque la variable viva en un registro
+        self.ranuras_scanf = {}
+        for instruccion in funcion.instrucciones():
+            if instruccion.operacion == "leer" and instruccion.destino not in self.ranuras_scanf:
+                if self.ubicaciones[instruccion.destino] in REGISTROS_IR:
+                    self.ranuras_scanf[instruccion.destino] = desplazamiento
+                    desplazamiento += 8
+                else:
+                    self.ranuras_scanf[instruccion.destino] = int(self.ubicaciones[instruccion.destino][7:-1])
+        self.registros_guardados = []
+        for registro in REGISTROS_IR:
+            if registro in registros.values():
+                self.registros_guardados.append((registro, desplazamiento))
+                desplazamiento += 8
+        self.espacio = (desplazamiento - 1 + 15) // 16 * 16
+
+    def _lugar(self, valor):
+        # Texto del operando: inmediato, registro, memoria o simbolo externo
+        if type(valor) is int:
+            return str(valor)
+        return self.ubicaciones.get(valor, valor)
+
+    def _cargar(self, registro, valor):
+        if type(valor) is Cadena:
+            self.codigo.append(f"    lea {registro}, [{self.nuevo_string_literal(valor.valor)}]")
+        elif self._lugar(valor) != registro:
+            self.codigo.append(f"    mov {registro}, {self._lugar(valor)}")
+
+    def _directo(self, valor, auxiliar="rcx"):
+        # Operando fuente de add, cmp, etc.: registro, memoria o inmediato de
+        # 32 bits; cualquier otro valor se carga antes en 'auxiliar'
+        if _inmediato(valor) or (type(valor) is str and valor in self.ubicaciones):
+            return self._lugar(valor)
+        self._cargar(auxiliar, valor)
+        return auxiliar
+
+    def _guardar(self, destino, registro):
+        if destino is not None and self.ubicaciones[destino] != registro:
+            self.codigo.append(f"    mov {self.ubicaciones[destino]}, {registro}")
+
+    def _registro_destino(self, destino, *otros):
+        # Se calcula directamente en el registro del destino salvo que pise
+        # un operando que todavia hace falta
+        ubicacion = self.ubicaciones.get(destino)
+        if ubicacion in REGISTROS_IR and all(self._lugar(otro) != ubicacion for otro in otros):
+            return ubicacion
+        return "rax"
+
+    def _comparar(self, a, b):
+        izquierda = self._lugar(a)
+        if izquierda not in REGISTROS_IR:
+            self._cargar("rax", a)
+            izquierda = "rax"
+        self.codigo.append(f"    cmp {izquierda}, {self._directo(b)}")
+
+    def _ir_copiar(self, instruccion):
+        registro = self._registro_destino(instruccion.destino)
+        self._cargar(registro, instruccion.operandos[0])
+        self._guardar(instruccion.destino, registro)
+
+    def _ir_binaria(self, instruccion):
+        operacion, destino = instruccion.operacion, instruccion.destino
+        a, b = instruccion.operandos
+        if operacion in COMPARACIONES:
+            self._comparar(a, b)
+            self.codigo.extend([f"    {ASIGNAR_COMPARACION[operacion]} al", "    movzx rax, al"])
+            self._guardar(destino, "rax")
+            return
+        if operacion in ("/", "%"):
+            self._dividir(operacion, a, b)
+            self._guardar(destino, "rdx" if operacion == "%" else "rax")
+            return
+        registro = self._registro_destino(destino, b) if self._lugar(a) != self._lugar(b) else self._registro_destino(destino)
+        self._cargar(registro, a)
+        if operacion == "*" and _potencia_de_dos(b):
+            if b > 1:
+                self.codigo.append(f"    shl {registro}, {b.bit_length() - 1}")
+        else:
+            self.codigo.append(f"    {INSTRUCCION_DIRECTA[operacion]} {registro}, {self._directo(b)}")
+        self._guardar(destino, registro)
+
+    def _dividir(self, operacion, a, b):
+        self._cargar("rax", a)
+        if operacion == "/" and _potencia_de_dos(b):
+            # Igual que en GeneradorEnsamblador: truncamiento hacia cero con sar
+            if b > 1:
+                desplazamiento = b.bit_length() - 1
+                self.codigo.extend([
+                    "    mov rcx, rax",
+                    "    sar rcx, 63",
+                    f"    shr rcx, {64 - desplazamiento}",
+                    "    add rax, rcx",
+                    f"    sar rax, {desplazamiento}",
+                ])
+            return
+        divisor = self._lugar(b)
+        if divisor not in REGISTROS_IR:
+            self._cargar("rcx", b)
+            divisor = "rcx"
+        self.codigo.extend(["    cqo", f"    idiv {divisor}"])
+
+    def _ir_unaria(self, instruccion):
+        self._cargar("rax", instruccion.operandos[0])
+        self.codigo.append("    neg rax")
+        self._guardar(instruccion.destino, "rax")
+
+    def _ir_llamar(self, instruccion):
+        funcion, *argumentos = instruccion.operandos
+        llamada = '_main_impl' if funcion == 'main' else funcion
+        en_pila = argumentos[4:]
+        relleno = (len(en_pila) % 2) * 8
+        if relleno:
+            self.codigo.append(f"    sub rsp, {relleno}")
+        for argumento in reversed(en_pila):
+            self._cargar("rax", argumento)
+            self.codigo.append("    push rax")
+        # Ningun valor vive en rcx, rdx, r8 o r9, asi que cargarlos no pisa nada
+        for registro, argumento in zip(REGISTROS_ARGUMENTOS, argumentos):
+            self._cargar(registro, argumento)
+        self.codigo.extend(["    sub rsp, 32", f"    call {llamada}", f"    add rsp, {32 + len(en_pila) * 8 + relleno}"])
+        self._guardar(instruccion.destino, "rax")
+
+    def _ir_imprimir(self, instruccion):
+        valor = instruccion.operandos[0]
+        self._cargar("rdx", valor)
+        formato = "fmt_str_s" if type(valor) is Cadena else "fmt_str_d"
+        self.codigo.extend([f"    lea rcx, [{formato}]", "    sub rsp, 32", "    call printf", "    add rsp, 32"])
+
+    def _ir_leer(self, instruccion):
+        fmt_id = self.nuevo_string_literal(instruccion.operandos[0])
+        ranura = self.ranuras_scanf[instruccion.destino]
+        self.codigo.extend([
+            f"    lea rdx, [rbp - {ranura}]",
+            f"    lea rcx, [{fmt_id}]",
+            "    sub rsp, 32",
+            "    call scanf",
+            "    add rsp, 32",
+        ])
+        if self.ubicaciones[instruccion.destino] in REGISTROS_IR:
+            self.codigo.append(f"    mov {self.ubicaciones[instruccion.destino]}, [rbp - {ranura}]")
+
+    def _ir_saltar(self, instruccion):
+        if instruccion.operandos[0] != self.siguiente:
+            self.codigo.append(f"    jmp {self.etiquetas[instruccion.operandos[0]]}")
+
+    def _ir_saltar_si(self, instruccion):
+        comparacion, a, b, si, no = instruccion.operandos
+        self._comparar(a, b)
+        if si == self.siguiente:
+            self.codigo.append(f"    {SALTOS_COMPARACION[COMPARACION_NEGADA[comparacion]]} {self.etiquetas[no]}")
+            return
+        self.codigo.append(f"    {SALTOS_COMPARACION[comparacion]} {self.etiquetas[si]}")
+        if no != self.siguiente:
+            self.codigo.append(f"    jmp {self.etiquetas[no]}")
+
+    def _ir_elegir(self, instruccion):
+        # El despacho modifica el registro, asi que trabaja sobre una copia en rax
+        defecto = self.etiquetas[instruccion.operandos[1]]
+        casos = [(valor, self.etiquetas[etiqueta]) for valor, etiqueta in instruccion.casos()]
+        self._cargar("rax", instruccion.operandos[0])
+        self.codigo.extend(lineas_de_despacho("rax", casos, defecto, self.nueva_etiqueta))
+
+    def _ir_retornar(self, instruccion):
+        if instruccion.operandos:
+            self._cargar("rax", instruccion.operandos[0])
+        if self.siguiente is not None:
+            self.codigo.append(f"    jmp {self._etiqueta_epilogo()}")
+
+    traducciones = {
+        "copiar": _ir_copiar,
+        "neg": _ir_unaria,
+        "llamar": _ir_llamar,
+        "imprimir": _ir_imprimir,
+        "leer": _ir_leer,
+        "saltar": _ir_saltar,
+        "saltar_si": _ir_saltar_si,
+        "elegir": _ir_elegir,
+        "retornar": _ir_retornar,
+    }
+    traducciones.update(dict.fromkeys(OPERACIONES_BINARIAS, _ir_binaria))
@@ -1,9 +1,207 @@
 from nodes import *
+import gzip
+import io
 import json
+import re
 
 
-def ast_a_json(ast):
-    return json.dumps(ast.to_dict(), indent=4)
+def ast_a_json(ast, compacto=False):
+    salida = io.StringIO()
+    escribir_ast(ast, salida, compacto)
+    return salida.getvalue()
+
+
+# Serializacion por flujo: el JSON se escribe mientras se recorre el AST, sin
+# construir antes el arbol de diccionarios de to_dict(). La salida es la misma
+# que json.dumps(ast.to_dict(), indent=4), o con separadores (",", ":") en
+# modo compacto
+
+class _Campo:
+    # Ocupa el lugar de un campo hijo en la plantilla que devuelve _dict(), asi
+    # las claves y su orden salen de la misma definicion que usa to_dict()
+    __slots__ = ("valor",)
+    
+    def __init__(self, valor):
+        self.valor = valor
+
+
+_codificar_string = json.encoder.encode_basestring_ascii
+
+# Cantidad de fragmentos que se acumulan antes de cada write()
+FRAGMENTOS_POR_ESCRITURA = 4096
+
+
+def _escalar(valor):
+    if type(valor) is str:
+        return _codificar_string(valor)
+    return json.dumps(valor)
+
+
+def escribir_ast(ast, archivo, compacto=False):
+    separador_clave = ":" if compacto else ": "
+    def salto(nivel):
+        return "" if compacto else "\n" + "    " * nivel
+    
+    fragmentos = []
+    pila = [(ast, 0)]
+    while pila:
+        actual = pila.pop()
+        if type(actual) is str:
+            fragmentos.append(actual)
+            if len(fragmentos) >= FRAGMENTOS_POR_ESCRITURA:
+                archivo.write("".join(fragmentos))
+                fragmentos.clear()
+            continue
+        
+        nodo, nivel = actual
+        if nodo is None:
+            fragmentos.append("null")
+            continue
+        plantilla = nodo._dict(*[_Campo(getattr(nodo, campo)) for campo in nodo.campos_hijos])
+        
+        # Se arma la secuencia de texto y nodos hijos de este nodo; los textos
+        # consecutivos se unen para apilar menos elementos
+        pasos = []
+        texto = ["{"]
+        for i, (clave, valor) in enumerate(plantilla.items()):
+            if i:
+                texto.append(",")
+            texto.append(salto(nivel + 1))
+            texto.append(_codificar_string(clave))
+            texto.append(separador_clave)
+            if type(valor) is not _Campo:
+                texto.append(_escalar(valor))
+            elif type(valor.valor) is not tuple:
+                pasos.append("".join(texto))
+                pasos.append((valor.valor, nivel + 1))
+                texto = []
+            elif not valor.valor:
+                texto.append("[]")
+            else:
+                texto.append("[")
+                for j, hijo in enumerate(valor.valor):
+                    if j:
+                        texto.append(",")
+                    texto.append(salto(nivel + 2))
+                    pasos.append("".join(texto))
+                    pasos.append((hijo, nivel + 2))
+                    texto = []
+                texto.append(salto(nivel + 1))
+                texto.append("]")
+        texto.append(salto(nivel))
+        texto.append("}")
+        pasos.append("".join(texto))
+        pila.extend(reversed(pasos))
+    archivo.write("".join(fragmentos))
+
+
+def _abrir(ruta, modo, comprimir):
+    if comprimir:
+        return gzip.open(ruta, modo + "t", encoding="utf-8")
+    return open(ruta, modo, encoding="utf-8")
+
+
+def guardar_ast(ast, ruta, compacto=True, comprimir=None):
+    # Por defecto se comprime si la ruta termina en .gz
+    if comprimir is None:
+        comprimir = ruta.endswith(".gz")
+    with _abrir(ruta, "w", comprimir) as archivo:
+        escribir_ast(ast, archivo, compacto)
+
+
+# Carga: cada objeto JSON se convierte en su nodo en cuanto se termina de leer
+# (object_hook va de las hojas hacia la raiz), sin pasar por to_dict(). Las
+# hojas repetidas se comparten con FabricaHojas igual que en el parser
+
+CONSTRUCTORES = {
+    "programa": lambda d, hojas: NodoPrograma(d["funciones"]),
+    "funcion": lambda d, hojas: NodoFuncion(d["retorno"], d["nombre"], d["parametros"], d["cuerpo"]),
+    "parametro": lambda d, hojas: NodoParametro(d["tipo_dato"], d["nombre"]),
+    "asignacion": lambda d, hojas: NodoAsignacion(d["tipo_dato"], d["nombre"], d["expresion"]),
+    "operacion": lambda d, hojas: NodoOperacion(d["izquierda"], d["operador"], d["derecha"]),
+    "retorno": lambda d, hojas: NodoRetorno(d["expresion"]),
+    "identificador": lambda d, hojas: hojas.identificador(d["nombre"]),
+    "numero": lambda d, hojas: hojas.numero(d["valor"]),
+    "float": lambda d, hojas: NodoFloat(d["valor"]),
+    "string": lambda d, hojas: hojas.string(d["valor"]),
+    "scanf": lambda d, hojas: NodoScanf(d["formato"], d["variables"]),
+    "operacion_unaria": lambda d, hojas: NodoOperacionUnaria(d["operador"], d["operando"]),
+    "if": lambda d, hojas: NodoIf(d["condicion"], d["cuerpo"], d["else"]),
+    "while": lambda d, hojas: NodoWhile(d["condicion"], d["cuerpo"]),
+    "for": lambda d, hojas: NodoFor(d["inicializacion"], d["condicion"], d["incremento"], d["cuerpo"]),
+    "incremento": lambda d, hojas: NodoIncremento(d["nombre"], d["operador"]),
+    "print": lambda d, hojas: NodoPrint(d["expresion"]),
+    "else": lambda d, hojas: NodoElse(d["cuerpo"]),
+    "llamada_funcion": lambda d, hojas: NodoLlamadaFuncion(d["nombre"], d["argumentos"]),
+}
+
+
+def json_a_ast(texto):
+    hojas = FabricaHojas()
+    def construir(d):
+        return CONSTRUCTORES[d["tipo"]](d, hojas)
+    try:
+        return json.loads(texto, object_hook=construir)
+    except RecursionError:
+        # El decodificador de json es recursivo; los arboles muy profundos se
+        # leen con el decodificador iterativo
+        return _decodificar_profundo(texto, construir)
+
+
+def leer_ast(archivo):
+    return json_a_ast(archivo.read())
+
+
+def cargar_ast(ruta):
+    # Detecta gzip por su numero magico, sin depender de la extension
+    with open(ruta, "rb") as archivo:
+        comprimido = archivo.read(2) == b"\x1f\x8b"
+    with _abrir(ruta, "r", comprimido) as archivo:
+        return leer_ast(archivo)
+
+
+_TOKEN_JSON = re.compile(r'\s*(?:("(?:[^"\\]|\\.)*")|(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)|(true|false|null)|([{}\[\],:]))')
+_LITERALES = {"true": True, "false": False, "null": None}
+_CLAVE = object()
+
+
+def _decodificar_profundo(texto, object_hook):
+    # Cada marco de la pila es [contenedor, clave]; la clave vale _CLAVE
+    # mientras el objeto espera el nombre de su siguiente campo
+    pila = []
+    raiz = None
+    for cadena, numero, literal, simbolo in _TOKEN_JSON.findall(texto):
+        if simbolo == "{":
+            pila.append([{}, _CLAVE])
+            continue
+        if simbolo == "[":
+            pila.append([[], None])
+            continue
+        if simbolo == ",":
+            if type(pila[-1][0]) is dict:
+                pila[-1][1] = _CLAVE
+            continue
+        if simbolo == ":":
+            continue
+        if simbolo:
+            contenedor = pila.pop()[0]
+            valor = object_hook(contenedor) if simbolo == "}" else contenedor
+        elif cadena:
+            valor = json.loads(cadena)
+        elif numero:
+            valor = float(numero) if "." in numero or "e" in numero or "E" in numero else int(numero)
+        else:
+            valor = _LITERALES[literal]
+        
+        if not pila:
+            raiz = valor
+        elif type(pila[-1][0]) is list:
+            pila[-1][0].append(valor)
+        elif pila[-1][1] is _CLAVE:
+            pila[-1][1] = valor
+        else:
+            pila[-1][0][pila[-1][1]] = valor
+    return raiz
 
 def imprimir_ast(nodo, nivel=0):
     prefijo = "  " * nivel
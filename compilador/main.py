@@ -18,7 +18,10 @@ from parsear import Parser
 import analisis_lexico
 import generate_ast_json
 from analisis_semantico import AnalizadorSemantico
-from generadorEnsamblador import GeneradorEnsamblador
+from codigo_intermedio import construir_ir
+from generadorIR import GeneradorIR
+from emisor import EmisorEnsamblador
+from optimizador import PipelineOptimizacion
 import subprocess
 import os
 
@@ -476,8 +479,10 @@ class FlowchartEditor(QMainWindow):
 
             # Analisis sintactico y contruccion del AST
             try:
-                parser = Parser(tokens)
+                parser = Parser(tokens, recuperar=True)
                 ast = parser.parsear()
+                if parser.errores:
+                    raise SyntaxError("\n".join(str(error) for error in parser.errores))
                 print("Analisis sintactico exitoso")
                 # Imprimir el AST (cuando este completo) en esta linea
                 analizador = AnalizadorSemantico()
@@ -540,11 +545,18 @@ class FlowchartEditor(QMainWindow):
             else:
                 print(f"No existe archivo: {ruta}")
             
-        generador = GeneradorEnsamblador()
-        generador.generar(ast)
+        optimizador = PipelineOptimizacion(contar_instrucciones=True)
+        ast = optimizador.optimizar(ast)
+        print(optimizador.reporte)
+        programa_ir = construir_ir(ast)
+        print(programa_ir)
+        # Cada funcion se escribe en el archivo en cuanto se termina de generar
+        generador = GeneradorIR()
         with open('salida.asm', 'w') as f:
-            f.write(generador.obtener_codigo())
+            emisor = EmisorEnsamblador(f, mirilla=True)
+            generador.generar(programa_ir, emisor)
             print(f"Archivo {archivo_salida}.asm generado correctamente")
+        print(emisor.reporte_mirilla)
         try:
             print("Ensamblado con NASM...")
             try:
@@ -0,0 +1,513 @@
+from collections import Counter
+from functools import lru_cache
+import re
+import time
+
+# Optimizacion de mirilla sobre el ensamblador ya generado (la lista codigo de
+# GeneradorEnsamblador o de GeneradorIR). Cada regla mira las lineas a partir
+# de una posicion y devuelve cuantas reemplaza y por cuales, o None si no
+# aplica. Una pasada recorre el codigo una vez probando las reglas en orden;
+# se repiten pasadas hasta que ninguna regla cambia nada.
+#
+# Las reglas que borran o mueven escrituras de registros consultan si el
+# registro esta vivo: se sigue el flujo desde esa linea (saltos incluidos)
+# hasta encontrar una lectura o una escritura. Si el recorrido es demasiado
+# largo o llega a algo que no se conoce, el registro se considera vivo
+
+REGISTROS = {
+    "rax", "rbx", "rcx", "rdx", "rsi", "rdi", "rbp", "rsp",
+    "r8", "r9", "r10", "r11", "r12", "r13", "r14", "r15",
+}
+SUBREGISTROS = {
+    "eax": "rax", "ax": "rax", "al": "rax",
+    "ebx": "rbx", "bx": "rbx", "bl": "rbx",
+    "ecx": "rcx", "cx": "rcx", "cl": "rcx",
+    "edx": "rdx", "dx": "rdx", "dl": "rdx",
+}
+
+# Convencion de Windows x64: argumentos en registros, registros que la llamada
+# preserva y volatiles que no son argumentos
+ARGUMENTOS = {"rcx", "rdx", "r8", "r9"}
+PRESERVADOS = {"rbx", "rsi", "rdi", "rbp", "rsp", "r12", "r13", "r14", "r15"}
+VOLATILES = {"rax", "r10", "r11"}
+
+SALTO_NEGADO = {
+    "je": "jne", "jne": "je",
+    "jl": "jge", "jge": "jl",
+    "jg": "jle", "jle": "jg",
+    "jz": "jnz", "jnz": "jz",
+    "ja": "jbe", "jbe": "ja",
+}
+
+ARITMETICA = {"add", "sub", "imul", "and", "or", "xor", "shl", "shr", "sar"}
+
+# Registros que las reglas pueden usar en lugar de la pila; ninguno de los dos
+# generadores guarda en ellos algo que dure mas alla de una expresion
+REGISTROS_AUXILIARES = ("r10", "r11")
+
+LIMITE_VIVOS = 200
+LIMITE_VENTANA = 32
+MAX_PASADAS = 20
+
+
+@lru_cache(maxsize=8192)
+def partes(linea):
+    # (operacion, operandos) de una instruccion; None para etiquetas,
+    # directivas y lineas vacias
+    if not linea.startswith("    "):
+        return None
+    operacion, _, resto = linea.strip().partition(" ")
+    return operacion, tuple(operando.strip() for operando in resto.split(",")) if resto else ()
+
+
+def etiqueta_de(linea):
+    if linea and not linea.startswith(" ") and linea.endswith(":"):
+        return linea[:-1]
+    return None
+
+
+@lru_cache(maxsize=8192)
+def registros_de(operando):
+    registros = set()
+    for palabra in re.findall(r"[a-z0-9]+", operando):
+        palabra = SUBREGISTROS.get(palabra, palabra)
+        if palabra in REGISTROS:
+            registros.add(palabra)
+    return frozenset(registros)
+
+
+def es_registro(operando):
+    return SUBREGISTROS.get(operando, operando) in REGISTROS
+
+
+def es_memoria(operando):
+    return operando.endswith("]")
+
+
+def inmediato_32(operando):
+    try:
+        valor = int(operando)
+    except ValueError:
+        return False
+    return -2**31 <= valor < 2**31
+
+
+@lru_cache(maxsize=8192)
+def efectos(operacion, operandos):
+    # (registros leidos, registros escritos) por una instruccion que no es un
+    # salto; None si la instruccion no se conoce
+    if operacion in ("mov", "movzx", "lea") and len(operandos) == 2:
+        destino, fuente = operandos
+        if es_registro(destino):
+            return registros_de(fuente), registros_de(destino)
+        return registros_de(fuente) | registros_de(destino), frozenset()
+    if operacion in ARITMETICA and len(operandos) == 2:
+        destino, fuente = operandos
+        if operacion == "xor" and destino == fuente:
+            return frozenset(), registros_de(destino)
+        escribe = registros_de(destino) if es_registro(destino) else frozenset()
+        return registros_de(destino) | registros_de(fuente), escribe
+    if operacion == "imul" and len(operandos) == 3:
+        destino, fuente, _ = operandos
+        return registros_de(fuente), registros_de(destino)
+    if operacion == "neg":
+        return registros_de(operandos[0]), registros_de(operandos[0]) if es_registro(operandos[0]) else frozenset()
+    if operacion in ("cmp", "test"):
+        return registros_de(operandos[0]) | registros_de(operandos[1]), frozenset()
+    if operacion.startswith("set"):
+        # Escribe solo el byte bajo; el resto del registro se conserva
+        return registros_de(operandos[0]), registros_de(operandos[0])
+    if operacion == "cqo":
+        return frozenset({"rax"}), frozenset({"rdx"})
+    if operacion == "idiv":
+        return frozenset({"rax", "rdx"}) | registros_de(operandos[0]), frozenset({"rax", "rdx"})
+    if operacion == "push":
+        return registros_de(operandos[0]) | {"rsp"}, frozenset({"rsp"})
+    if operacion == "pop":
+        return frozenset({"rsp"}), registros_de(operandos[0]) | {"rsp"}
+    if operacion == "call":
+        return frozenset(ARGUMENTOS | PRESERVADOS), frozenset(VOLATILES)
+    if operacion == "ret":
+        return frozenset(PRESERVADOS | {"rax"}), frozenset()
+    return None
+
+
+def es_salto(operacion):
+    return operacion == "jmp" or operacion in SALTO_NEGADO
+
+
+class ReporteMirilla:
+    def __init__(self, reglas):
+        # nombre de regla -> veces que se aplico
+        self.aplicaciones = Counter({nombre: 0 for nombre, _ in reglas})
+        self.instrucciones_antes = 0
+        self.instrucciones_despues = 0
+        self.pasadas = 0
+        self.tiempo = 0.0
+    
+    def sumar(self, otro):
+        # Acumula el reporte de otra parte del programa
+        self.aplicaciones.update(otro.aplicaciones)
+        self.instrucciones_antes += otro.instrucciones_antes
+        self.instrucciones_despues += otro.instrucciones_despues
+        self.pasadas += otro.pasadas
+        self.tiempo += otro.tiempo
+    
+    def __str__(self):
+        lineas = [f"Mirilla: {self.instrucciones_antes} -> {self.instrucciones_despues} instrucciones "
+                  f"({self.instrucciones_despues - self.instrucciones_antes:+d}) en {self.pasadas} pasadas, "
+                  f"{self.tiempo * 1000:.2f} ms"]
+        lineas.extend(f"  {nombre}: {veces}" for nombre, veces in self.aplicaciones.items())
+        return "\n".join(lineas)
+
+
+def contar_instrucciones(codigo):
+    return sum(1 for linea in codigo if linea.startswith("    "))
+
+
+class OptimizadorMirilla:
+    def __init__(self, reglas=None):
+        self.reglas = [(nombre, regla) for nombre, _, regla in self.REGLAS if reglas is None or nombre in reglas]
+        # operacion de la primera linea -> reglas que pueden empezar en ella;
+        # None agrupa las etiquetas
+        self.por_operacion = {}
+        for nombre, operaciones, regla in self.REGLAS:
+            if reglas is None or nombre in reglas:
+                for operacion in operaciones:
+                    self.por_operacion.setdefault(operacion, []).append((nombre, regla))
+        self.reporte = ReporteMirilla(self.reglas)
+        self.codigo = []
+        self.instrucciones = []
+        self.etiquetas = {}
+        self.referencias = Counter()
+    
+    def optimizar(self, codigo):
+        self.reporte = ReporteMirilla(self.reglas)
+        self.reporte.instrucciones_antes = contar_instrucciones(codigo)
+        inicio = time.perf_counter()
+        self.codigo = list(codigo)
+        while self.reporte.pasadas < MAX_PASADAS:
+            self.reporte.pasadas += 1
+            if not self._pasada():
+                break
+        self.reporte.tiempo = time.perf_counter() - inicio
+        self.reporte.instrucciones_despues = contar_instrucciones(self.codigo)
+        return self.codigo
+    
+    def _pasada(self):
+        # Las consultas de las reglas (etiquetas, referencias, registros
+        # vivos) se hacen sobre el codigo al empezar la pasada
+        codigo = self.codigo
+        # Con lugar de sobra al final para que las reglas miren unas lineas
+        # mas adelante sin revisar el largo
+        self.instrucciones = [partes(linea) for linea in codigo] + [None] * 3
+        self.etiquetas = {}
+        self.referencias = Counter()
+        for i, linea in enumerate(codigo):
+            instruccion = self.instrucciones[i]
+            if instruccion is not None:
+                if es_salto(instruccion[0]) or instruccion[0] in ("call", "dq"):
+                    self.referencias[instruccion[1][0]] += 1
+                elif instruccion[0] == "lea" and not registros_de(instruccion[1][1]):
+                    # lea r, [tabla]: la etiqueta se usa como dato
+                    self.referencias[instruccion[1][1][1:-1]] += 1
+            elif linea.startswith("global "):
+                self.referencias[linea[7:].strip()] += 1
+            elif etiqueta_de(linea) is not None:
+                self.etiquetas[linea[:-1]] = i
+        
+        nuevo = []
+        cambio = False
+        i = 0
+        while i < len(codigo):
+            instruccion = self.instrucciones[i]
+            for nombre, regla in self.por_operacion.get(instruccion and instruccion[0], ()):
+                resultado = regla(self, i)
+                if resultado is not None:
+                    cuantas, reemplazo = resultado
+                    nuevo.extend(reemplazo)
+                    i += cuantas
+                    self.reporte.aplicaciones[nombre] += 1
+                    cambio = True
+                    break
+            else:
+                nuevo.append(codigo[i])
+                i += 1
+        self.codigo = nuevo
+        return cambio
+    
+    def _instruccion(self, i):
+        return self.instrucciones[i]
+    
+    def _destino(self, etiqueta):
+        # Primera linea que no es etiqueta a partir de una etiqueta
+        i = self.etiquetas.get(etiqueta)
+        while i is not None and i < len(self.codigo) and self.instrucciones[i] is None:
+            i += 1
+        return i
+    
+    def vivo(self, inicio, registro):
+        # True si el valor que tiene el registro en la linea inicio puede
+        # leerse antes de ser reemplazado en algun camino
+        pendientes = [inicio]
+        vistos = set()
+        while pendientes:
+            i = pendientes.pop()
+            while i not in vistos:
+                if i >= len(self.codigo) or len(vistos) > LIMITE_VIVOS:
+                    return True
+                vistos.add(i)
+                instruccion = self.instrucciones[i]
+                if instruccion is None:
+                    i += 1
+                    continue
+                operacion, operandos = instruccion
+                if es_salto(operacion):
+                    destino = self.etiquetas.get(operandos[0])
+                    if destino is None:
+                        return True
+                    if operacion == "jmp":
+                        i = destino
+                        continue
+                    pendientes.append(destino)
+                    i += 1
+                    continue
+                resultado = efectos(operacion, operandos)
+                if resultado is None or registro in resultado[0]:
+                    return True
+                if registro in resultado[1] or operacion == "ret":
+                    break
+                i += 1
+        return False
+    
+    def _fusion_comparacion(self, i):
+        # cmp a, b / jCC V / mov rax, 0 / jmp F / V: / mov rax, 1 / F: /
+        # test rax, rax / jz L  ->  cmp a, b / jNCC L
+        # El 0/1 solo existia para volver a compararlo; hace falta que nadie
+        # mas salte a V ni a F y que rax no se lea despues
+        lineas = self.codigo[i:i + 9]
+        if len(lineas) < 9 or not lineas[0].startswith("    cmp "):
+            return None
+        salto = partes(lineas[1])
+        if salto is None or salto[0] not in SALTO_NEGADO:
+            return None
+        verdadero = salto[1][0]
+        fin = partes(lineas[3])
+        if (lineas[2] != "    mov rax, 0" or fin is None or fin[0] != "jmp"
+                or etiqueta_de(lineas[4]) != verdadero or lineas[5] != "    mov rax, 1"
+                or etiqueta_de(lineas[6]) != fin[1][0] or lineas[7] != "    test rax, rax"):
+            return None
+        final = partes(lineas[8])
+        if final is None or final[0] not in ("jz", "jnz"):
+            return None
+        if self.referencias[verdadero] != 1 or self.referencias[fin[1][0]] != 1:
+            return None
+        destino = final[1][0]
+        if destino not in self.etiquetas or self.vivo(i + 9, "rax") or self.vivo(self.etiquetas[destino], "rax"):
+            return None
+        operacion = salto[0] if final[0] == "jnz" else SALTO_NEGADO[salto[0]]
+        return 9, [lineas[0], f"    {operacion} {destino}"]
+    
+    def _guardar_recargar(self, i):
+        # mov x, r / mov r, x  ->  mov x, r (y al reves)
+        primera, segunda = self._instruccion(i), self._instruccion(i + 1)
+        if primera is None or segunda is None or primera[0] != "mov" or segunda[0] != "mov":
+            return None
+        if primera[1] == segunda[1][::-1] and primera[1][0] not in registros_de(primera[1][1]):
+            return 2, [self.codigo[i]]
+        return None
+    
+    def _mov_redundante(self, i):
+        # mov r, r
+        instruccion = self._instruccion(i)
+        if instruccion is not None and instruccion[0] == "mov" and instruccion[1][0] == instruccion[1][1]:
+            return 1, []
+        return None
+    
+    def _apilar_desapilar(self, i):
+        # push x / pop y  ->  mov y, x
+        primera, segunda = self._instruccion(i), self._instruccion(i + 1)
+        if primera is None or segunda is None or primera[0] != "push" or segunda[0] != "pop":
+            return None
+        origen, destino = primera[1][0], segunda[1][0]
+        if origen == destino:
+            return 2, []
+        if es_memoria(origen) and es_memoria(destino):
+            return None
+        return 2, [f"    mov {destino}, {origen}"]
+    
+    def _pila_a_registro(self, i):
+        # push r / ... / pop s, sin nada en el medio que use la pila, salte o
+        # sea una etiqueta: el valor se pasa por s directamente si el medio no
+        # lo usa, o por un registro auxiliar que no este vivo
+        primera = self._instruccion(i)
+        if primera is None or primera[0] != "push" or not es_registro(primera[1][0]) or primera[1][0] in ("rsp", "rbp"):
+            return None
+        usados = set()
+        for j in range(i + 1, min(i + 1 + LIMITE_VENTANA, len(self.codigo))):
+            instruccion = self.instrucciones[j]
+            if instruccion is None or es_salto(instruccion[0]):
+                return None
+            if instruccion[0] == "pop":
+                break
+            resultado = efectos(*instruccion)
+            if resultado is None or "rsp" in resultado[0] or "rsp" in resultado[1]:
+                return None
+            usados |= resultado[0] | resultado[1]
+        else:
+            return None
+        origen, destino = primera[1][0], instruccion[1][0]
+        if not es_registro(destino):
+            return None
+        medio = self.codigo[i + 1:j]
+        if destino not in usados:
+            return j - i + 1, [f"    mov {destino}, {origen}", *medio]
+        for auxiliar in REGISTROS_AUXILIARES:
+            if auxiliar not in usados and auxiliar not in (origen, destino) and not self.vivo(j + 1, auxiliar):
+                return j - i + 1, [f"    mov {auxiliar}, {origen}", *medio, f"    mov {destino}, {auxiliar}"]
+        return None
+    
+    def _copia_directa(self, i):
+        # mov r, x / mov s, r  ->  mov s, x  si r no se vuelve a leer
+        primera, segunda = self._instruccion(i), self._instruccion(i + 1)
+        if primera is None or segunda is None or primera[0] not in ("mov", "lea") or segunda[0] != "mov":
+            return None
+        registro, origen = primera[1]
+        destino, copia = segunda[1]
+        if copia != registro or registro not in REGISTROS or registro == destino or registro in registros_de(destino):
+            return None
+        if primera[0] == "lea" and not es_registro(destino):
+            return None
+        if es_memoria(destino):
+            if es_memoria(origen):
+                return None
+            if not es_registro(origen):
+                if not inmediato_32(origen):
+                    return None
+                destino = f"qword {destino}"
+        if self.vivo(i + 2, registro):
+            return None
+        return 2, [f"    {primera[0]} {destino}, {origen}"]
+    
+    def _comparacion_en_origen(self, i):
+        # mov r, x / cmp r, y  ->  cmp x, y  si r no se vuelve a leer
+        primera, segunda = self._instruccion(i), self._instruccion(i + 1)
+        if primera is None or segunda is None or primera[0] != "mov" or segunda[0] not in ("cmp", "test"):
+            return None
+        registro, origen = primera[1]
+        if segunda[1][0] != registro or registro not in REGISTROS or not (es_registro(origen) or es_memoria(origen)):
+            return None
+        otro = segunda[1][1]
+        if otro == registro:
+            otro = origen
+        if registro in registros_de(otro) or (es_memoria(origen) and es_memoria(otro)) or self.vivo(i + 2, registro):
+            return None
+        if es_memoria(origen) and not es_registro(otro):
+            origen = f"qword {origen}"
+        return 2, [f"    {segunda[0]} {origen}, {otro}"]
+    
+    def _operacion_en_el_lugar(self, i):
+        # mov r, x / op r, y / mov x, r  ->  op x, y  si r no se vuelve a leer
+        primera, segunda, tercera = self._instruccion(i), self._instruccion(i + 1), self._instruccion(i + 2)
+        if primera is None or segunda is None or tercera is None or primera[0] != "mov" or tercera[0] != "mov":
+            return None
+        registro, lugar = primera[1]
+        if (segunda[0] not in ARITMETICA or len(segunda[1]) != 2 or segunda[1][0] != registro
+                or tercera[1] != (lugar, registro) or registro not in REGISTROS):
+            return None
+        operando = segunda[1][1]
+        if registro in registros_de(operando) or registro in registros_de(lugar):
+            return None
+        if es_memoria(lugar):
+            if segunda[0] == "imul" or es_memoria(operando):
+                return None
+            if not es_registro(operando):
+                lugar = f"qword {lugar}"
+        elif not es_registro(lugar):
+            return None
+        if self.vivo(i + 3, registro):
+            return None
+        return 3, [f"    {segunda[0]} {lugar}, {operando}"]
+    
+    def _escritura_muerta(self, i):
+        # mov r, x cuyo valor nadie lee
+        instruccion = self._instruccion(i)
+        if instruccion is None or instruccion[0] not in ("mov", "lea", "movzx"):
+            return None
+        registro = instruccion[1][0]
+        if registro not in REGISTROS or registro in ("rsp", "rbp") or self.vivo(i + 1, registro):
+            return None
+        return 1, []
+    
+    def _salto_siguiente(self, i):
+        # jmp L / L:  ->  L:
+        instruccion = self._instruccion(i)
+        if instruccion is None or instruccion[0] != "jmp":
+            return None
+        j = i + 1
+        while j < len(self.codigo) and etiqueta_de(self.codigo[j]) is not None:
+            if etiqueta_de(self.codigo[j]) == instruccion[1][0]:
+                return 1, []
+            j += 1
+        return None
+    
+    def _salto_sobre_salto(self, i):
+        # jCC L1 / jmp L2 / L1:  ->  jNCC L2 / L1:
+        primera, segunda = self._instruccion(i), self._instruccion(i + 1)
+        if (primera is None or segunda is None or primera[0] not in SALTO_NEGADO or segunda[0] != "jmp"
+                or i + 2 >= len(self.codigo) or etiqueta_de(self.codigo[i + 2]) != primera[1][0]):
+            return None
+        return 2, [f"    {SALTO_NEGADO[primera[0]]} {segunda[1][0]}"]
+    
+    def _salto_encadenado(self, i):
+        # Un salto a una etiqueta donde solo hay otro jmp va directo al final
+        instruccion = self._instruccion(i)
+        if instruccion is None or not es_salto(instruccion[0]):
+            return None
+        destino = self._destino(instruccion[1][0])
+        siguiente = self._instruccion(destino) if destino is not None else None
+        if siguiente is None or siguiente[0] != "jmp" or siguiente[1][0] == instruccion[1][0]:
+            return None
+        return 1, [f"    {instruccion[0]} {siguiente[1][0]}"]
+    
+    def _codigo_inalcanzable(self, i):
+        # Lo que sigue a un jmp o ret hasta la proxima etiqueta no se ejecuta
+        instruccion = self._instruccion(i)
+        if instruccion is None or instruccion[0] not in ("jmp", "ret"):
+            return None
+        j = i + 1
+        while j < len(self.codigo) and self.instrucciones[j] is not None:
+            j += 1
+        if j == i + 1:
+            return None
+        return j - i, [self.codigo[i]]
+    
+    def _etiqueta_sin_uso(self, i):
+        etiqueta = etiqueta_de(self.codigo[i])
+        if etiqueta is not None and self.referencias[etiqueta] == 0:
+            return 1, []
+        return None
+    
+    SALTOS = ("jmp", *SALTO_NEGADO)
+    
+    REGLAS = (
+        ("fusion de comparacion y salto", ("cmp",), _fusion_comparacion),
+        ("guardar y recargar", ("mov",), _guardar_recargar),
+        ("mov redundante", ("mov",), _mov_redundante),
+        ("push y pop", ("push",), _apilar_desapilar),
+        ("pila a registro", ("push",), _pila_a_registro),
+        ("copia directa", ("mov", "lea"), _copia_directa),
+        ("comparacion en el origen", ("mov",), _comparacion_en_origen),
+        ("operacion en el lugar", ("mov",), _operacion_en_el_lugar),
+        ("escritura muerta", ("mov", "lea", "movzx"), _escritura_muerta),
+        ("salto a la siguiente linea", ("jmp",), _salto_siguiente),
+        ("salto sobre salto", tuple(SALTO_NEGADO), _salto_sobre_salto),
+        ("salto encadenado", SALTOS, _salto_encadenado),
+        ("codigo inalcanzable", ("jmp", "ret"), _codigo_inalcanzable),
+        ("etiqueta sin uso", (None,), _etiqueta_sin_uso),
+    )
+
+
+def optimizar_mirilla(codigo, reglas=None):
+    optimizador = OptimizadorMirilla(reglas)
+    return optimizador.optimizar(codigo), optimizador.reporte
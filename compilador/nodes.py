@@ -1,21 +1,75 @@
+# Los constructores asignan los slots directamente, sin pasar por el
+# __setattr__ de NodoAST que rechaza cualquier modificacion
+_asignar = object.__setattr__
+
+
+def _reconstruir(clase, valores):
+    return clase(*valores)
+
+
 class NodoAST:
+    # Nodos compactos: cada subclase declara su esquema en 'campos', que tambien
+    # es su __slots__, asi que ningun nodo lleva __dict__. Los campos se asignan
+    # una sola vez en el constructor; para modificar un nodo se usa reemplazar().
+    # 'campos_hijos' indica cuales de esos campos contienen nodos (o tuplas de
+    # nodos) y es lo que sigue Visitante para recorrer el arbol
+    __slots__ = ()
+    campos = ()
+    campos_hijos = ()
+    
+    def __setattr__(self, nombre, valor):
+        raise AttributeError(f"{type(self).__name__}.{nombre} es inmutable, usa reemplazar()")
+    
+    def __delattr__(self, nombre):
+        raise AttributeError(f"{type(self).__name__}.{nombre} es inmutable")
+    
+    def reemplazar(self, **cambios):
+        # Pasa por el constructor para recalcular los slots derivados
+        valores = [cambios.pop(campo) if campo in cambios else getattr(self, campo) for campo in self.campos]
+        if cambios:
+            raise TypeError(f"{type(self).__name__} no tiene los campos {', '.join(cambios)}")
+        return type(self)(*valores)
+    
+    def __reduce__(self):
+        # pickle y copy no pueden restaurar los slots con setattr
+        return (_reconstruir, (type(self), tuple(getattr(self, campo) for campo in self.campos)))
+    
+    def __repr__(self):
+        valores = ", ".join(f"{campo}={getattr(self, campo)!r}" for campo in self.campos)
+        return f"{type(self).__name__}({valores})"
+    
+    # to_dict() y traducir() recorren el arbol sin recursion; cada subclase
+    # solo define _dict() y _traducir(), que reciben ya calculado el
+    # resultado de cada uno de sus campos_hijos
     def to_dict(self):
-        raise NotImplementedError("Debe implementarse en las subclases")
+        return Pasada("_dict").recorrer(self)
+    
+    def traducir(self):
+        return Pasada("_traducir").recorrer(self)
     
     def optimizacion(self):
-        return self
+        # Las reglas estan en optimizador.py, que importa este modulo
+        from optimizador import optimizar_nodo
+        return optimizar_nodo(self)
     
-    def traducir(self):
+    def _dict(self, *hijos):
+        raise NotImplementedError("Debe implementarse en las subclases")
+    
+    def _traducir(self, *hijos):
         raise NotImplementedError("Metodo traducir() no implementado en este nodo")
     
 class NodoPrograma(NodoAST):
-    def __init__(self, funciones):
-        self.funciones = funciones
+    campos = ("funciones",)
+    campos_hijos = campos
+    __slots__ = campos
     
-    def to_dict(self):
+    def __init__(self, funciones):
+        _asignar(self, "funciones", tuple(funciones))
+        
+    def _dict(self, funciones):
         return {
             "tipo": "programa",
-            "funciones": [funcion.to_dict() for funcion in self.funciones]
+            "funciones": funciones
         }
         
     def tiene_main(self):
@@ -25,35 +79,42 @@ class NodoPrograma(NodoAST):
         return False
     
 class NodoFuncion(NodoAST):
+    campos = ("tipo", "nombre", "parametros", "cuerpo")
+    campos_hijos = ("parametros", "cuerpo")
+    __slots__ = campos
+    
     def __init__(self, tipo, nombre, parametros, cuerpo):
-        self.tipo = tipo
-        self.nombre = nombre
-        self.parametros = parametros
-        self.cuerpo = cuerpo
-        
-    def traducir(self):
-        params = ".".join(p.traducir() for p in self.parametros)
-        cuerpo = "\n    ".join(c.traducir() for c in self.cuerpo)
+        _asignar(self, "tipo", tipo)
+        _asignar(self, "nombre", nombre)
+        _asignar(self, "parametros", tuple(parametros))
+        _asignar(self, "cuerpo", tuple(cuerpo))
+        
+    def _traducir(self, parametros, cuerpo):
+        params = ".".join(parametros)
+        cuerpo = "\n    ".join(cuerpo)
         return f"def {self.nombre}({params}):\n    {cuerpo}"
     
-    def to_dict(self):
+    def _dict(self, parametros, cuerpo):
         return {
             "tipo": "funcion",
             "retorno": self.tipo,
             "nombre": self.nombre,
-            "parametros": [param.to_dict() for param in self.parametros],
-            "cuerpo": [instr.to_dict() for instr in self.cuerpo]
+            "parametros": parametros,
+            "cuerpo": cuerpo
             }
         
 class NodoParametro(NodoAST):
+    campos = ("tipo", "nombre")
+    __slots__ = campos
+    
     def __init__(self, tipo, nombre):
-        self.tipo = tipo
-        self.nombre = nombre
+        _asignar(self, "tipo", tipo)
+        _asignar(self, "nombre", nombre)
         
-    def traducir(self):
+    def _traducir(self):
         return self.nombre
     
-    def to_dict(self):
+    def _dict(self):
         return {
             "tipo": "parametro",
             "tipo_dato": self.tipo,
@@ -61,328 +122,257 @@ class NodoParametro(NodoAST):
         }
         
 class NodoAsignacion(NodoAST):
+    campos = ("tipo", "nombre", "expresion")
+    campos_hijos = ("expresion",)
+    __slots__ = campos
+    
     def __init__(self, tipo, nombre, expresion):
-        self.tipo = tipo
-        self.nombre = nombre
-        self.expresion = expresion
+        _asignar(self, "tipo", tipo)
+        _asignar(self, "nombre", nombre)
+        _asignar(self, "expresion", expresion)
         
-    def traducir(self):
-        return f"{self.nombre} = {self.expresion.traducir()}"
+    def _traducir(self, expresion):
+        return f"{self.nombre} = {expresion}"
     
-    def to_dict(self):
+    def _dict(self, expresion):
         return {
             "tipo": "asignacion",
             "tipo_dato": self.tipo,
             "nombre": self.nombre,
-            "expresion": self.expresion.to_dict()
+            "expresion": expresion
         }
         
 class NodoOperacion(NodoAST):
+    campos = ("izquierda", "operador", "derecha")
+    campos_hijos = ("izquierda", "derecha")
+    __slots__ = campos
+    
     def __init__(self, izquierda, operador, derecha):
-        self.izquierda = izquierda
-        self.operador = operador
-        self.derecha = derecha
+        _asignar(self, "izquierda", izquierda)
+        _asignar(self, "operador", operador)
+        _asignar(self, "derecha", derecha)
         
-    def to_dict(self):
+    def _dict(self, izquierda, derecha):
         return {
             "tipo": "operacion",
             "operador": self.operador,
-            "izquierda": self.izquierda.to_dict(),
-            "derecha": self.derecha.to_dict()
+            "izquierda": izquierda,
+            "derecha": derecha
         }
         
-    def traducir(self):
-        if self.operador == "+":
-            return f"({self.izquierda.traducir()} {self.operador} {self.derecha.traducir()})"
-        elif self.operador =="-":
-            return f"({self.izquierda.traducir()} {self.operador} {self.derecha.traducir()})"
-        elif self.operador == "*":
-            return f"({self.izquierda.traducir()} {self.operador} {self.derecha.traducir()})"
-        elif self.operador == "/":
-            return f"({self.izquierda.traducir()} {self.operador} {self.derecha.traducir()})"
-
-    def optimizacion(self):
-        izquierda = self.izquierda.optimizacion()
-        derecha = self.derecha.optimizacion()
-        
-        if isinstance(izquierda, (NodoNumero, NodoFloat)) and isinstance(derecha, (NodoNumero, NodoFloat)):
-            val_izq = float(izquierda.valor)
-            val_der = float(derecha.valor)
-            
-            try:
-                if self.operador == "+":
-                    resultado = val_izq + val_der
-                elif self.operador == "-":
-                    resultado = val_izq - val_der
-                elif self.operador == "*":
-                    resultado = val_izq * val_der
-                elif self.operador == "/":
-                    resultado = val_izq / val_der
-                
-                if isinstance(izquierda, NodoFloat) or isinstance(derecha, NodoFloat) or isinstance(resultado, float):
-                    return NodoFloat(resultado)
-                else:
-                    return NodoNumero(int(resultado))
-            except ZeroDivisionError:
-                raise ZeroDivisionError("División por cero")
-            
-        if isinstance(izquierda, NodoNumero) and isinstance(derecha, NodoNumero):
-            if self.operador == "+":
-                return NodoNumero(float(izquierda.valor) + float(derecha.valor))
-            elif self.operador == "-":
-                return NodoNumero(float(izquierda.valor) - float(derecha.valor))
-            elif self.operador == "*":
-                return NodoNumero(float(izquierda.valor) * float(derecha.valor))
-            elif self.operador == "/" and float(derecha.valor) != 0:
-                return NodoNumero(float(izquierda.valor) / float(derecha.valor))
-            
-        # Simplificacion algebraica
-        if self.operador == "*" and isinstance(derecha, NodoNumero) and float(derecha.valor) == 1:
-            return izquierda
-        if self.operador =="*" and isinstance(derecha, NodoNumero) and float(derecha.valor) == 0:
-            return NodoNumero(0)
-        if self.operador == "*" and isinstance(izquierda, NodoNumero) and float(izquierda.valor) == 1:
-            return derecha
-        if self.operador == "*" and isinstance(izquierda, NodoNumero) and float(izquierda.valor) == 0:
-            return NodoNumero(0)
-        if self.operador == "+" and isinstance(derecha, NodoNumero) and float(derecha.valor) == 0:
-            return izquierda
-        if self.operador == "+" and isinstance(izquierda, NodoNumero) and float(izquierda.valor) == 0:
-            return derecha
-        if self.operador == "-" and isinstance(derecha, NodoNumero) and float(derecha.valor) == 0:
-            return izquierda
-        if self.operador == "-" and isinstance(izquierda, NodoNumero) and float(izquierda.valor) == 0:
-            return NodoNumero(0) - derecha
-        if self.operador == "/" and isinstance(derecha, NodoNumero) and float(derecha.valor) == 1:
-            return izquierda
-        if self.operador == "/" and isinstance(izquierda, NodoNumero) and float(izquierda.valor) == 0:
-            return NodoNumero(0)
-        if self.operador == "/" and isinstance(izquierda, NodoNumero) and float(izquierda.valor) == 1:
-            return NodoNumero(1) / derecha
-        if self.operador == "/" and isinstance(derecha, NodoNumero) and float(derecha.valor) == 1:
-            return izquierda
-        if self.operador == "/" and isinstance(derecha, NodoNumero) and float(derecha.valor) == 0:
-            raise ZeroDivisionError("Division por cero")
-        
-        # Si no se puede optimizar más:
-        return NodoOperacion(izquierda, self.operador, derecha)  # Retornamos la misma operacion
+    def _traducir(self, izquierda, derecha):
+        if self.operador in ("+", "-", "*", "/"):
+            return f"({izquierda} {self.operador} {derecha})"
 
 class NodoRetorno(NodoAST):
+    campos = ("expresion",)
+    campos_hijos = campos
+    __slots__ = campos
+    
     def __init__(self, expresion):
-        self.expresion = expresion
+        _asignar(self, "expresion", expresion)
         
-    def traducir(self):
-        return f"return {self.expresion.traducir()}"
+    def _traducir(self, expresion):
+        return f"return {expresion}"
     
-    def to_dict(self):
+    def _dict(self, expresion):
         return {
             "tipo": "retorno",
-            "expresion": self.expresion.to_dict()
+            "expresion": expresion
         }
         
 class NodoIdentificador(NodoAST):
+    campos = ("nombre",)
+    __slots__ = campos
+    
     def __init__(self, nombre):
-        self.nombre = nombre
+        _asignar(self, "nombre", nombre)
         
-    def traducir(self):
+    def _traducir(self):
         return self.nombre
     
-    def optimizacion(self):
-        return self
-    
-    def to_dict(self):
+    def _dict(self):
         return {
             "tipo": "identificador",
             "nombre": self.nombre
         }
         
+def convertir_numero(valor):
+    if isinstance(valor, str):
+        return float(valor) if "." in valor else int(valor)
+    return valor
+
+
 class NodoNumero(NodoAST):
+    # 'numero' es el valor ya convertido (int o float); 'valor' conserva el
+    # texto original para to_dict() y traducir()
+    campos = ("valor",)
+    __slots__ = campos + ("numero",)
+    
     def __init__(self, valor):
-        self.valor = valor
+        _asignar(self, "valor", valor)
+        _asignar(self, "numero", convertir_numero(valor))
         
-    def traducir(self):
+    def _traducir(self):
         return str(self.valor)
     
-    def optimizacion(self):
-        return self
-    
-    def to_dict(self):
+    def _dict(self):
         return {
             "tipo": "numero",
             "valor": self.valor
         }
 
 class NodoFloat(NodoAST):
+    campos = ("valor",)
+    __slots__ = campos + ("numero",)
+    
     def __init__(self, valor):
-        self.valor = valor
+        _asignar(self, "valor", valor)
+        _asignar(self, "numero", float(valor))
         
-    def traducir(self):
+    def _traducir(self):
         return str(self.valor)
     
-    def optimizacion(self):
-        return self
-    
-    def to_dict(self):
+    def _dict(self):
         return{
             "tipo": "float",
             "valor": self.valor
         }
 
 class NodoString(NodoAST):
+    campos = ("valor",)
+    __slots__ = campos
+    
     def __init__(self, valor):
-        self.valor = valor
+        _asignar(self, "valor", valor)
         
-    def traducir(self):
+    def _traducir(self):
         return str(self.valor)
     
-    def optimizacion(self):
-        return self
-    
-    def to_dict(self):
+    def _dict(self):
         return {
             "tipo": "string",
             "valor": self.valor
         }
 
 class NodoScanf(NodoAST):
+    campos = ("formato", "variables")
+    campos_hijos = ("variables",)
+    __slots__ = campos
+    
     def __init__(self, formato, variables):
-        self.formato = formato
-        self.variables = variables 
-
-    def to_dict(self):
+        _asignar(self, "formato", formato)
+        _asignar(self, "variables", tuple(variables))
+        
+    def _dict(self, variables):
         return {
             "tipo": "scanf",
             "formato": self.formato,
-            "variables": [var.to_dict() for var in self.variables]
+            "variables": variables
         }
 
-    def traducir(self):
-        vars_str = ", ".join(["&" + var.traducir() for var in self.variables])
+    def _traducir(self, variables):
+        vars_str = ", ".join(["&" + var for var in variables])
         return f'scanf("{self.formato}", {vars_str})'
 
 class NodoOperacionUnaria(NodoAST):
+    campos = ("operador", "operando")
+    campos_hijos = ("operando",)
+    __slots__ = campos
+    
     def __init__(self, operador, operando):
-        self.operador = operador
-        self.operando = operando
-
-    def to_dict(self):
+        _asignar(self, "operador", operador)
+        _asignar(self, "operando", operando)
+        
+    def _dict(self, operando):
         return {
             "tipo": "operacion_unaria",
             "operador": self.operador,
-            "operando": self.operando.to_dict()
+            "operando": operando
         }
 
-    def traducir(self):
-        return f"{self.operador}{self.operando.traducir()}"
+    def _traducir(self, operando):
+        return f"{self.operador}{operando}"
     
 class NodoIf(NodoAST):
+    campos = ("condicion", "cuerpo", "cuerpo_else")
+    campos_hijos = campos
+    __slots__ = campos
+    
     def __init__(self, condicion, cuerpo, cuerpo_else=None):
-        self.condicion = condicion
-        self.cuerpo = cuerpo
-        self.cuerpo_else = cuerpo_else if cuerpo_else else []
-        
-    def traducir(self):
-        cuerpo = "\n    ".join(c.traducir() for c in self.cuerpo)
-        if self.cuerpo_else:
-            cuerpo_else = "\n    ".join(c.traducir() for c in self.cuerpo_else)
-            return f"if {self.condicion.traducir()}:\n    {cuerpo}\nelse:\n    {cuerpo_else}"
+        _asignar(self, "condicion", condicion)
+        _asignar(self, "cuerpo", tuple(cuerpo))
+        _asignar(self, "cuerpo_else", tuple(cuerpo_else) if cuerpo_else else ())
+        
+    def _traducir(self, condicion, cuerpo, cuerpo_else):
+        cuerpo = "\n    ".join(cuerpo)
+        if cuerpo_else:
+            cuerpo_else = "\n    ".join(cuerpo_else)
+            return f"if {condicion}:\n    {cuerpo}\nelse:\n    {cuerpo_else}"
         else:
-            return f"if {self.condicion.traducir()}:\n    {cuerpo}"
+            return f"if {condicion}:\n    {cuerpo}"
         
-    def optimizacion(self):
-        condicion = self.condicion.optimizacion()
-        
-        cuerpo = [inst.optimizacion() for inst in self.cuerpo if inst is not None]
-        cuerpo_else = [inst.optimizacion() for inst in self.cuerpo_else if inst is not None]
-        
-        if isinstance(condicion, NodoNumero):
-            if float(condicion.valor) != 0:
-                return cuerpo
-            else:
-                return cuerpo_else
-        
-        return NodoIf(condicion, cuerpo, cuerpo_else)
-    
-    def to_dict(self):
+    def _dict(self, condicion, cuerpo, cuerpo_else):
         return {
             "tipo": "if",
-            "condicion": self.condicion.to_dict(),
-            "cuerpo": [instr.to_dict() for instr in self.cuerpo],
-            "else": [instr.to_dict() for instr in self.cuerpo_else]
+            "condicion": condicion,
+            "cuerpo": cuerpo,
+            "else": cuerpo_else
         }
         
 class NodoWhile(NodoAST):
-    def __init__(self, condicion, cuerpo):
-        self.condicion = condicion
-        self.cuerpo = cuerpo
-        
-    def traducir(self):
-        cuerpo = "\n    ".join(c.traducir() for c in self.cuerpo)
-        return f"while {self.condicion.traducir()}:\n    {cuerpo}"
+    campos = ("condicion", "cuerpo")
+    campos_hijos = campos
+    __slots__ = campos
     
-    def optimizacion(self):
-        condicion = self.condicion.optimizacion()
+    def __init__(self, condicion, cuerpo):
+        _asignar(self, "condicion", condicion)
+        _asignar(self, "cuerpo", tuple(cuerpo))
         
-        cuerpo = [inst.optimizacion() for inst in self.cuerpo if inst is not None]
-        if isinstance(condicion, NodoNumero):
-            if float(condicion.valor) != 0:
-                return cuerpo
-            else:
-                return []
-            
-        return NodoWhile(condicion, cuerpo)
+    def _traducir(self, condicion, cuerpo):
+        cuerpo = "\n    ".join(cuerpo)
+        return f"while {condicion}:\n    {cuerpo}"
     
-    def to_dict(self):
+    def _dict(self, condicion, cuerpo):
         return {
             "tipo": "while",
-            "condicion": self.condicion.to_dict(),
-            "cuerpo": [instr.to_dict() for instr in self.cuerpo]
+            "condicion": condicion,
+            "cuerpo": cuerpo
         }
     
 class NodoFor(NodoAST):
+    campos = ("inicializacion", "condicion", "incremento", "cuerpo")
+    campos_hijos = campos
+    __slots__ = campos
+    
     def __init__(self, inicializacion, condicion, incremento, cuerpo):
-        self.inicializacion = inicializacion
-        self.condicion = condicion
-        self.incremento = incremento
-        self.cuerpo = cuerpo
-        
-    def traducir(self):
-        inicializacion = self.inicializacion.traducir()
-        condicion = self.condicion.traducir()
-        incremento = self.incremento.traducir()
+        _asignar(self, "inicializacion", inicializacion)
+        _asignar(self, "condicion", condicion)
+        _asignar(self, "incremento", incremento)
+        _asignar(self, "cuerpo", tuple(cuerpo))
         
-        cuerpo = "\n    ".join(c.traducir() for c in self.cuerpo)
+    def _traducir(self, inicializacion, condicion, incremento, cuerpo):
+        cuerpo = "\n    ".join(cuerpo)
         return f"for {inicializacion}; {condicion}; {incremento}:\n    {cuerpo}"
     
-    def optimizacion(self):
-        inicializacion = self.inicializacion.optimizacion()
-        condicion = self.condicion.optimizacion()
-        incremento = self.incremento.optimizacion()
-        
-        cuerpo = [inst.optimizacion() for inst in self.cuerpo if inst is not None]
-        if isinstance(condicion, NodoNumero):
-            if float(condicion.valor) != 0:
-                return cuerpo
-            else:
-                return []
-            
-        return NodoFor(inicializacion, condicion, incremento, cuerpo)
-    
-    def to_dict(self):
+    def _dict(self, inicializacion, condicion, incremento, cuerpo):
         return {
             "tipo": "for",
-            "inicializacion": self.inicializacion.to_dict(),
-            "condicion": self.condicion.to_dict(),
-            "incremento": self.incremento.to_dict(),
-            "cuerpo": [instr.to_dict() for instr in self.cuerpo]
+            "inicializacion": inicializacion,
+            "condicion": condicion,
+            "incremento": incremento,
+            "cuerpo": cuerpo
         }
         
 class NodoIncremento(NodoAST):
+    campos = ("nombre", "operador")
+    __slots__ = campos
+    
     def __init__(self, nombre, operador):
-        self.nombre = nombre
-        self.operador = operador
+        _asignar(self, "nombre", nombre)
+        _asignar(self, "operador", operador)
         
-    def to_dict(self):
+    def _dict(self):
         return {
             "tipo": "incremento",
             "nombre": self.nombre,
@@ -390,44 +380,235 @@ class NodoIncremento(NodoAST):
         }
         
 class NodoPrint(NodoAST):
+    campos = ("expresion",)
+    campos_hijos = campos
+    __slots__ = campos
+    
     def __init__(self, expresion):
-        self.expresion = expresion
+        _asignar(self, "expresion", expresion)
         
-    def traducir(self):
-        return f'print({self.expresion.traducir()})'
+    def _traducir(self, expresion):
+        return f'print({expresion})'
 
-    def to_dict(self):
+    def _dict(self, expresion):
         return {
             "tipo": "print",
-            "expresion": self.expresion.to_dict()
+            "expresion": expresion
         }
 
 class NodoElse(NodoAST):
+    campos = ("cuerpo",)
+    campos_hijos = campos
+    __slots__ = campos
+    
     def __init__(self, cuerpo):
-        self.cuerpo = cuerpo
-
-    def traducir(self):
-        cuerpo = "\n    ".join(c.traducir() for c in self.cuerpo)
+        _asignar(self, "cuerpo", tuple(cuerpo))
+        
+    def _traducir(self, cuerpo):
+        cuerpo = "\n    ".join(cuerpo)
         return f"else:\n    {cuerpo}"
-    def to_dict(self):
+    def _dict(self, cuerpo):
         return {
             "tipo": "else",
-            "cuerpo": [instr.to_dict() for instr in self.cuerpo]
+            "cuerpo": cuerpo
         }
         
 class NodoLlamadaFuncion(NodoAST):
+    campos = ("nombre", "argumentos")
+    campos_hijos = ("argumentos",)
+    __slots__ = campos
+    
     def __init__(self, nombre, argumentos):
-        self.nombre = nombre
-        self.argumentos = argumentos
+        _asignar(self, "nombre", nombre)
+        _asignar(self, "argumentos", tuple(argumentos))
         
-    def traducir(self):
-        argumentos = ", ".join(a.traducir() for a in self.argumentos)
+    def _traducir(self, argumentos):
+        argumentos = ", ".join(argumentos)
         return f"{self.nombre}({argumentos})"
     
-    def to_dict(self):
+    def _dict(self, argumentos):
         return {
             "tipo": "llamada_funcion",
             "nombre": self.nombre,
-            "argumentos": [arg.to_dict() for arg in self.argumentos]
+            "argumentos": argumentos
         }
-        
\ No newline at end of file
+        
+
+
+class FabricaHojas:
+    # Comparte los nodos hoja identicos de un programa. Como los nodos son
+    # inmutables, todas las apariciones de 'x' o de '5' pueden ser el mismo objeto
+    def __init__(self):
+        self.identificadores = {}
+        self.numeros = {}
+        self.strings = {}
+    
+    def identificador(self, nombre):
+        nodo = self.identificadores.get(nombre)
+        if nodo is None:
+            nodo = self.identificadores[nombre] = NodoIdentificador(nombre)
+        return nodo
+    
+    def numero(self, valor):
+        nodo = self.numeros.get(valor)
+        if nodo is None:
+            nodo = self.numeros[valor] = NodoNumero(valor)
+        return nodo
+    
+    def string(self, valor):
+        nodo = self.strings.get(valor)
+        if nodo is None:
+            nodo = self.strings[valor] = NodoString(valor)
+        return nodo
+
+
+def iterar_nodos(raiz):
+    # Todos los nodos bajo 'raiz' (incluida) en pre-orden, sin recursion
+    pendientes = [raiz]
+    while pendientes:
+        nodo = pendientes.pop()
+        if not isinstance(nodo, NodoAST):
+            continue
+        yield nodo
+        for campo in reversed(nodo.campos_hijos):
+            valor = getattr(nodo, campo)
+            if type(valor) is tuple:
+                pendientes.extend(reversed(valor))
+            else:
+                pendientes.append(valor)
+
+
+class Visitante:
+    # Recorrido del AST con una pila explicita, asi que la profundidad del arbol
+    # no esta limitada por la recursion de Python. Para cada nodo se llama a
+    # entrar(nodo) en pre-orden; si devuelve False no se visitan sus hijos. Al
+    # terminar con los hijos se llama a salir(nodo, hijos) en post-orden, con el
+    # resultado de cada campo de campos_hijos (una lista para las tuplas de
+    # nodos), o con None si no se descendio. Lo que devuelve salir() es lo que
+    # recibe el padre y recorrer() devuelve el resultado de la raiz.
+    #
+    # Si pasos(nodo) devuelve una secuencia, se recorre en su lugar: los nodos
+    # se visitan y las acciones (funciones sin argumentos) se ejecutan en ese
+    # orden, para intercalar trabajo entre los hijos. salir() recibe entonces la
+    # lista plana de resultados de esos nodos.
+    #
+    # Si 'metodo' tiene el nombre de un metodo de los nodos, en post-orden se
+    # llama directamente a nodo.<metodo>(*hijos) en lugar de salir()
+    metodo = None
+    
+    def entrar(self, nodo):
+        return True
+    
+    def salir(self, nodo, hijos):
+        return None
+    
+    def pasos(self, nodo):
+        return None
+    
+    def recorrer(self, raiz):
+        # Los ganchos que la subclase no redefine no se llaman en cada nodo
+        clase = type(self)
+        entrar = self.entrar if clase.entrar is not Visitante.entrar else None
+        pasos_propios = self.pasos if clase.pasos is not Visitante.pasos else None
+        salir = self.salir
+        metodo = self.metodo
+        if metodo is None and clase.salir is Visitante.salir:
+            self._ejecutar(raiz, entrar, pasos_propios)
+            return None
+        pila = [raiz]
+        resultados = []
+        sacar, apilar, extender = pila.pop, pila.append, resultados.append
+        while pila:
+            actual = sacar()
+            if isinstance(actual, NodoAST):
+                if entrar is not None and not entrar(actual):
+                    extender(salir(actual, None))
+                    continue
+                pasos = pasos_propios(actual) if pasos_propios is not None else None
+                forma = None
+                if pasos is None:
+                    campos = actual.campos_hijos
+                    if not campos:
+                        extender(getattr(actual, metodo)() if metodo else salir(actual, []))
+                        continue
+                    pasos = [getattr(actual, campo) for campo in campos]
+                    if _tiene_secuencias(actual, pasos):
+                        forma = [len(valor) if type(valor) is tuple else None for valor in pasos]
+                        pasos = _aplanar(pasos)
+                # Marca de salida: al sacarla, los resultados de los hijos estan
+                # en 'resultados' a partir de la altura guardada
+                apilar((actual, forma, len(resultados)))
+                pila.extend(reversed(pasos))
+            elif type(actual) is tuple:
+                nodo, forma, altura = actual
+                hijos = resultados[altura:]
+                del resultados[altura:]
+                if forma is not None:
+                    hijos = _agrupar(hijos, forma)
+                extender(getattr(nodo, metodo)(*hijos) if metodo else salir(nodo, hijos))
+            elif actual is None:
+                # Campos opcionales vacios, como el incremento de un for
+                extender(None)
+            else:
+                actual()
+        return resultados[0] if resultados else None
+    
+    def _ejecutar(self, raiz, entrar, pasos_propios):
+        # Recorrido sin post-orden, para los visitantes que solo producen efectos
+        # (como emitir codigo): no hace falta guardar marcas de salida ni resultados
+        pila = [raiz]
+        sacar = pila.pop
+        while pila:
+            actual = sacar()
+            if isinstance(actual, NodoAST):
+                if entrar is not None and not entrar(actual):
+                    continue
+                pasos = pasos_propios(actual) if pasos_propios is not None else None
+                if pasos is None:
+                    pasos = _aplanar([getattr(actual, campo) for campo in actual.campos_hijos])
+                if pasos:
+                    pila.extend(reversed(pasos))
+            elif actual is not None:
+                actual()
+
+
+# Para cada clase de nodo, si alguno de sus campos_hijos es una tupla de nodos
+_CLASES_CON_SECUENCIAS = {}
+
+
+def _tiene_secuencias(nodo, valores):
+    clase = type(nodo)
+    tiene = _CLASES_CON_SECUENCIAS.get(clase)
+    if tiene is None:
+        tiene = _CLASES_CON_SECUENCIAS[clase] = any(type(valor) is tuple for valor in valores)
+    return tiene
+
+
+def _aplanar(valores):
+    plano = []
+    for valor in valores:
+        if type(valor) is tuple:
+            plano.extend(valor)
+        else:
+            plano.append(valor)
+    return plano
+
+
+def _agrupar(resultados, forma):
+    # Vuelve a separar la lista plana de resultados por campo
+    agrupados = []
+    i = 0
+    for cantidad in forma:
+        if cantidad is None:
+            agrupados.append(resultados[i])
+            i += 1
+        else:
+            agrupados.append(resultados[i:i + cantidad])
+            i += cantidad
+    return agrupados
+
+
+class Pasada(Visitante):
+    # Aplica en post-orden el metodo 'metodo' de cada nodo con los resultados de sus hijos
+    def __init__(self, metodo):
+        self.metodo = metodo
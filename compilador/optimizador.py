@@ -0,0 +1,1301 @@
+from nodes import *
+from generadorEnsamblador import generar_funcion
+from generadorIR import GeneradorIR
+from codigo_intermedio import construir_ir
+from collections import Counter, deque
+import time
+
+# Optimizacion del AST. Cada pasada es un Reescritor que devuelve el mismo
+# objeto cuando no cambia nada; como los nodos son inmutables, comparar por
+# identidad alcanza para saber si una pasada hizo algo. PipelineOptimizacion
+# aplica las pasadas a cada funcion hasta llegar a un punto fijo
+
+
+def es_constante_entera(nodo):
+    return isinstance(nodo, NodoNumero) and type(nodo.numero) is int
+
+
+def es_pura(expresion):
+    # Sin llamadas a funciones una expresion no tiene efectos secundarios
+    return not any(isinstance(nodo, NodoLlamadaFuncion) for nodo in iterar_nodos(expresion))
+
+
+def contar_nodos(raiz):
+    return sum(1 for _ in iterar_nodos(raiz))
+
+
+def contar_instrucciones(funcion):
+    # Instrucciones (no etiquetas ni directivas) que genera la funcion sola,
+    # pasando por el codigo intermedio como main.py
+    funcion_ir, = construir_ir(funcion).funciones
+    codigo, _ = generar_funcion(GeneradorIR, funcion_ir, True)
+    return sum(1 for linea in codigo if linea.startswith("    "))
+
+
+def entero_64(valor):
+    # El codigo generado opera con registros de 64 bits, asi que el resultado
+    # plegado se ajusta igual que lo haria el procesador
+    valor &= (1 << 64) - 1
+    return valor - (1 << 64) if valor >= 1 << 63 else valor
+
+
+def constante(valor):
+    # Como las literales del parser, el valor se guarda como texto
+    return NodoNumero(str(entero_64(valor)))
+
+
+def _division(a, b):
+    # idiv trunca hacia cero, a diferencia de // en Python
+    cociente = abs(a) // abs(b)
+    return cociente if (a < 0) == (b < 0) else -cociente
+
+
+def _resto(a, b):
+    return a - b * _division(a, b)
+
+
+OPERACIONES_ENTERAS = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    "/": _division,
+    "%": _resto,
+    "==": lambda a, b: int(a == b),
+    "!=": lambda a, b: int(a != b),
+    "<": lambda a, b: int(a < b),
+    ">": lambda a, b: int(a > b),
+    "<=": lambda a, b: int(a <= b),
+    ">=": lambda a, b: int(a >= b),
+    # El generador implementa && y || con and/or de bits, que solo coinciden
+    # con la logica de C cuando los dos operandos valen 0 o 1
+    "&&": lambda a, b: a & b if a in (0, 1) and b in (0, 1) else None,
+    "||": lambda a, b: a | b if a in (0, 1) and b in (0, 1) else None,
+}
+
+COMPARACIONES_REFLEXIVAS = {"==": 1, "<=": 1, ">=": 1, "!=": 0, "<": 0, ">": 0}
+
+
+def _bloque(resultados):
+    # Aplana los resultados de una secuencia de sentencias: None elimina la
+    # sentencia y una lista o tupla la reemplaza por varias
+    bloque = []
+    for resultado in resultados:
+        if resultado is None:
+            continue
+        if isinstance(resultado, (list, tuple)):
+            bloque.extend(resultado)
+        else:
+            bloque.append(resultado)
+    return tuple(bloque)
+
+
+def _unico(resultado, original):
+    # Un campo de un solo nodo (como la inicializacion de un for) no puede
+    # recibir varias sentencias; en ese caso se deja el original
+    if isinstance(resultado, (list, tuple)):
+        if not resultado:
+            return None
+        return resultado[0] if len(resultado) == 1 else original
+    return resultado
+
+
+class Reescritor(Visitante):
+    # Transformacion de las hojas hacia la raiz. Despues de reconstruir un
+    # nodo con sus hijos ya reescritos se llama a reescribir_<Clase>(nodo),
+    # que devuelve el nodo (el mismo si no hay cambios), None para eliminar
+    # una sentencia o una lista de sentencias para ponerlas en su lugar
+    nombre = "reescritura"
+    
+    def aplicar(self, nodo, optimizador=None):
+        self.optimizador = optimizador
+        return self.recorrer(nodo)
+    
+    def salir(self, nodo, hijos):
+        if hijos is not None:
+            cambios = {}
+            for campo, resultado in zip(nodo.campos_hijos, hijos):
+                original = getattr(nodo, campo)
+                if type(original) is tuple:
+                    resultado = _bloque(resultado)
+                    if len(resultado) == len(original) and all(a is b for a, b in zip(resultado, original)):
+                        continue
+                else:
+                    resultado = _unico(resultado, original)
+                    if resultado is original:
+                        continue
+                cambios[campo] = resultado
+            if cambios:
+                nodo = nodo.reemplazar(**cambios)
+        regla = getattr(self, "reescribir_" + type(nodo).__name__, None)
+        if regla is None:
+            return nodo
+        return regla(nodo)
+
+
+class PlegadoConstantes(Reescritor):
+    nombre = "plegado de constantes"
+    
+    def reescribir_NodoOperacion(self, nodo):
+        if not (es_constante_entera(nodo.izquierda) and es_constante_entera(nodo.derecha)):
+            return nodo
+        operacion = OPERACIONES_ENTERAS.get(nodo.operador)
+        if operacion is None:
+            return nodo
+        if nodo.operador in ("/", "%") and nodo.derecha.numero == 0:
+            # La division por cero se deja para tiempo de ejecucion
+            return nodo
+        resultado = operacion(nodo.izquierda.numero, nodo.derecha.numero)
+        if resultado is None:
+            return nodo
+        return constante(resultado)
+    
+    def reescribir_NodoOperacionUnaria(self, nodo):
+        if not es_constante_entera(nodo.operando):
+            return nodo
+        valor = nodo.operando.numero
+        if nodo.operador == "-":
+            return constante(-valor)
+        if nodo.operador == "+":
+            return nodo.operando
+        if nodo.operador == "!":
+            return constante(int(valor == 0))
+        return nodo
+
+
+class SimplificacionAlgebraica(Reescritor):
+    nombre = "simplificacion algebraica"
+    
+    def reescribir_NodoOperacion(self, nodo):
+        izquierda, operador, derecha = nodo.izquierda, nodo.operador, nodo.derecha
+        
+        # Las constantes de + y * pasan a la derecha para que las reglas de
+        # abajo (y la reasociacion) solo tengan que mirar un lado
+        if operador in ("+", "*") and es_constante_entera(izquierda) and not es_constante_entera(derecha):
+            izquierda, derecha = derecha, izquierda
+            nodo = NodoOperacion(izquierda, operador, derecha)
+        
+        if es_constante_entera(derecha):
+            valor = derecha.numero
+            if valor == 0 and operador in ("+", "-"):
+                return izquierda
+            if valor == 1 and operador in ("*", "/"):
+                return izquierda
+            if valor == 0 and operador == "*" and es_pura(izquierda):
+                return derecha
+            
+            # (e + c1) + c2 => e + (c1 + c2), y lo mismo con - y *
+            if isinstance(izquierda, NodoOperacion) and es_constante_entera(izquierda.derecha):
+                interno = izquierda.derecha.numero
+                if operador in ("+", "-") and izquierda.operador in ("+", "-"):
+                    suma = (interno if izquierda.operador == "+" else -interno) + (valor if operador == "+" else -valor)
+                    return NodoOperacion(izquierda.izquierda, "+", constante(suma))
+                if operador == "*" and izquierda.operador == "*":
+                    return NodoOperacion(izquierda.izquierda, "*", constante(interno * valor))
+        
+        if isinstance(izquierda, NodoIdentificador) and isinstance(derecha, NodoIdentificador) and izquierda.nombre == derecha.nombre:
+            if operador == "-":
+                return constante(0)
+            if operador in COMPARACIONES_REFLEXIVAS:
+                return constante(COMPARACIONES_REFLEXIVAS[operador])
+        return nodo
+
+
+class EliminacionRamasMuertas(Reescritor):
+    nombre = "eliminacion de ramas muertas"
+    
+    def reescribir_NodoIf(self, nodo):
+        if es_constante_entera(nodo.condicion):
+            return list(nodo.cuerpo if nodo.condicion.numero != 0 else nodo.cuerpo_else)
+        if not nodo.cuerpo and not nodo.cuerpo_else and es_pura(nodo.condicion):
+            return None
+        return nodo
+    
+    def reescribir_NodoWhile(self, nodo):
+        # while (1) se conserva: es un ciclo infinito, no un bloque
+        if es_constante_entera(nodo.condicion) and nodo.condicion.numero == 0:
+            return None
+        return nodo
+    
+    def reescribir_NodoFor(self, nodo):
+        if es_constante_entera(nodo.condicion) and nodo.condicion.numero == 0:
+            return nodo.inicializacion
+        return nodo
+
+
+class _Sustitucion(Reescritor):
+    def __init__(self):
+        self.valores = {}
+    
+    def reescribir_NodoIdentificador(self, nodo):
+        return self.valores.get(nodo.nombre, nodo)
+
+
+def variables_asignadas(raiz):
+    nombres = set()
+    for nodo in iterar_nodos(raiz):
+        if isinstance(nodo, (NodoAsignacion, NodoIncremento)):
+            nombres.add(nodo.nombre)
+        elif isinstance(nodo, NodoScanf):
+            nombres.update(variable.nombre for variable in nodo.variables)
+    return nombres
+
+
+def _mismo_valor(a, b):
+    if isinstance(a, NodoIdentificador):
+        return isinstance(b, NodoIdentificador) and a.nombre == b.nombre
+    return type(a) is type(b) and a.numero == b.numero
+
+
+def _olvidar(valores, nombre):
+    # Asignar 'nombre' invalida su valor y las copias que apuntan a el
+    valores.pop(nombre, None)
+    for otro in [otro for otro, valor in valores.items() if isinstance(valor, NodoIdentificador) and valor.nombre == nombre]:
+        del valores[otro]
+
+
+def _sin(valores, nombres):
+    return {
+        nombre: valor for nombre, valor in valores.items()
+        if nombre not in nombres and not (isinstance(valor, NodoIdentificador) and valor.nombre in nombres)
+    }
+
+
+def _unir(a, b):
+    # None es codigo inalcanzable (despues de un return) y no restringe nada
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return {nombre: valor for nombre, valor in a.items() if nombre in b and _mismo_valor(valor, b[nombre])}
+
+
+class PropagacionConstantes:
+    # Propagacion de constantes y copias hacia adelante sobre el cuerpo de
+    # cada funcion. El estado en cada punto es un diccionario nombre ->
+    # NodoNumero/NodoFloat/NodoIdentificador con el valor que la variable
+    # tiene seguro por cualquier camino; None marca codigo inalcanzable.
+    # En un if se unen las salidas de las dos ramas; en while y for el estado
+    # de la cabecera descarta todo lo que el ciclo asigna, que es el punto fijo
+    # de la ecuacion del ciclo salvo reasignaciones al mismo valor
+    nombre = "propagacion de constantes"
+    
+    def __init__(self):
+        self.sustitucion = _Sustitucion()
+        self.plegado = PlegadoConstantes()
+    
+    def aplicar(self, funcion, optimizador=None):
+        cuerpo, _ = self._bloque(funcion.cuerpo, {})
+        if cuerpo is funcion.cuerpo:
+            return funcion
+        return funcion.reemplazar(cuerpo=cuerpo)
+    
+    def _bloque(self, sentencias, valores):
+        nuevas = []
+        for sentencia in sentencias:
+            if valores is not None:
+                sentencia, valores = self._sentencia(sentencia, valores)
+            nuevas.append(sentencia)
+        if all(nueva is vieja for nueva, vieja in zip(nuevas, sentencias)):
+            return sentencias, valores
+        return tuple(nuevas), valores
+    
+    def _expresion(self, expresion, valores):
+        if expresion is None or not valores:
+            return expresion
+        self.sustitucion.valores = valores
+        nueva = self.sustitucion.recorrer(expresion)
+        if nueva is not expresion:
+            # Se pliega enseguida para que la constante siga propagandose en
+            # la misma pasada
+            nueva = self.plegado.recorrer(nueva)
+        return nueva
+    
+    def _sentencia(self, sentencia, valores):
+        if isinstance(sentencia, NodoAsignacion):
+            expresion = self._expresion(sentencia.expresion, valores)
+            _olvidar(valores, sentencia.nombre)
+            if isinstance(expresion, (NodoNumero, NodoFloat)) or (isinstance(expresion, NodoIdentificador) and expresion.nombre != sentencia.nombre):
+                valores[sentencia.nombre] = expresion
+            return _con(sentencia, expresion=expresion), valores
+        
+        if isinstance(sentencia, (NodoPrint, NodoRetorno)):
+            sentencia = _con(sentencia, expresion=self._expresion(sentencia.expresion, valores))
+            return sentencia, None if isinstance(sentencia, NodoRetorno) else valores
+        
+        if isinstance(sentencia, NodoLlamadaFuncion):
+            # Una llamada no puede modificar las variables locales de quien llama
+            return self._expresion(sentencia, valores), valores
+        
+        if isinstance(sentencia, NodoIf):
+            condicion = self._expresion(sentencia.condicion, valores)
+            cuerpo, salida = self._bloque(sentencia.cuerpo, dict(valores))
+            cuerpo_else, salida_else = self._bloque(sentencia.cuerpo_else, dict(valores))
+            return _con(sentencia, condicion=condicion, cuerpo=cuerpo, cuerpo_else=cuerpo_else), _unir(salida, salida_else)
+        
+        if isinstance(sentencia, NodoWhile):
+            valores = _sin(valores, variables_asignadas(sentencia))
+            condicion = self._expresion(sentencia.condicion, valores)
+            cuerpo, _ = self._bloque(sentencia.cuerpo, dict(valores))
+            return _con(sentencia, condicion=condicion, cuerpo=cuerpo), valores
+        
+        if isinstance(sentencia, NodoFor):
+            inicializacion = sentencia.inicializacion
+            if inicializacion is not None:
+                inicializacion, valores = self._sentencia(inicializacion, valores)
+            valores = _sin(valores, variables_asignadas(sentencia))
+            condicion = self._expresion(sentencia.condicion, valores)
+            cuerpo, salida = self._bloque(sentencia.cuerpo, dict(valores))
+            incremento = sentencia.incremento
+            if incremento is not None and salida is not None:
+                incremento, _ = self._sentencia(incremento, salida)
+            return _con(sentencia, inicializacion=inicializacion, condicion=condicion, incremento=incremento, cuerpo=cuerpo), valores
+        
+        # Scanf, incrementos y cualquier otra sentencia: sin sustituir nada,
+        # solo se olvida lo que puedan asignar
+        return sentencia, _sin(valores, variables_asignadas(sentencia))
+
+
+def _con(nodo, **campos):
+    # reemplazar() solo si algun campo cambio, para conservar la identidad
+    cambios = {campo: valor for campo, valor in campos.items() if valor is not getattr(nodo, campo)}
+    return nodo.reemplazar(**cambios) if cambios else nodo
+
+
+def variables_usadas(raiz):
+    return {nodo.nombre for nodo in iterar_nodos(raiz) if isinstance(nodo, NodoIdentificador)}
+
+
+def termina(sentencia):
+    # Despues de estas sentencias no se ejecuta nada mas del mismo bloque. El
+    # lenguaje no tiene break, asi que de un ciclo con condicion siempre
+    # verdadera solo se sale con return
+    if isinstance(sentencia, NodoRetorno):
+        return True
+    if isinstance(sentencia, NodoIf):
+        return any(map(termina, sentencia.cuerpo)) and any(map(termina, sentencia.cuerpo_else))
+    if isinstance(sentencia, (NodoWhile, NodoFor)):
+        condicion = sentencia.condicion
+        return condicion is None or (es_constante_entera(condicion) and condicion.numero != 0)
+    return False
+
+
+class EliminacionCodigoMuerto:
+    # Recorre cada bloque de atras hacia adelante con el conjunto de variables
+    # vivas (que se leen mas adelante) y quita las asignaciones sin efectos
+    # secundarios a variables muertas, ademas del codigo que sigue a un return.
+    # En un ciclo se consideran vivas todas las variables que el ciclo lee, una
+    # sobreaproximacion del punto fijo que no requiere iterar. Una declaracion
+    # solo se quita si la variable no aparece en ningun otro lugar, porque el
+    # generador reserva su lugar en la pila al ver el tipo
+    nombre = "eliminacion de codigo muerto"
+    
+    def aplicar(self, funcion, optimizador=None):
+        while True:
+            self.referencias = Counter()
+            for nodo in iterar_nodos(funcion):
+                if isinstance(nodo, (NodoIdentificador, NodoAsignacion, NodoIncremento)):
+                    self.referencias[nodo.nombre] += 1
+            cuerpo, _ = self._bloque(funcion.cuerpo, set())
+            if cuerpo is funcion.cuerpo:
+                return funcion
+            funcion = funcion.reemplazar(cuerpo=cuerpo)
+    
+    def _bloque(self, sentencias, vivas):
+        alcanzables = sentencias
+        for i, sentencia in enumerate(sentencias):
+            if termina(sentencia):
+                alcanzables = sentencias[:i + 1]
+                break
+        nuevas = []
+        for sentencia in reversed(alcanzables):
+            sentencia, vivas = self._sentencia(sentencia, vivas)
+            if sentencia is not None:
+                nuevas.append(sentencia)
+        nuevas.reverse()
+        if len(nuevas) == len(sentencias) and all(nueva is vieja for nueva, vieja in zip(nuevas, sentencias)):
+            return sentencias, vivas
+        return tuple(nuevas), vivas
+    
+    def _sentencia(self, sentencia, vivas):
+        if isinstance(sentencia, NodoAsignacion):
+            return self._asignacion(sentencia, vivas)
+        
+        if isinstance(sentencia, NodoRetorno):
+            return sentencia, variables_usadas(sentencia.expresion)
+        
+        if isinstance(sentencia, NodoScanf):
+            return sentencia, vivas - {variable.nombre for variable in sentencia.variables}
+        
+        if isinstance(sentencia, NodoIf):
+            cuerpo, vivas_cuerpo = self._bloque(sentencia.cuerpo, vivas)
+            cuerpo_else, vivas_else = self._bloque(sentencia.cuerpo_else, vivas)
+            vivas = vivas_cuerpo | vivas_else | variables_usadas(sentencia.condicion)
+            return _con(sentencia, cuerpo=cuerpo, cuerpo_else=cuerpo_else), vivas
+        
+        if isinstance(sentencia, NodoWhile):
+            cabecera = vivas | variables_usadas(sentencia)
+            cuerpo, _ = self._bloque(sentencia.cuerpo, cabecera)
+            return _con(sentencia, cuerpo=cuerpo), cabecera
+        
+        if isinstance(sentencia, NodoFor):
+            # La inicializacion y el incremento se conservan: solo se quitan
+            # sentencias de los bloques
+            cabecera = vivas | variables_usadas(sentencia)
+            cuerpo, _ = self._bloque(sentencia.cuerpo, cabecera)
+            vivas = cabecera
+            if isinstance(sentencia.inicializacion, NodoAsignacion):
+                vivas = (vivas - {sentencia.inicializacion.nombre}) | variables_usadas(sentencia.inicializacion.expresion)
+            return _con(sentencia, cuerpo=cuerpo), vivas
+        
+        # Prints, llamadas y cualquier otra sentencia leen lo que usan
+        return sentencia, vivas | variables_usadas(sentencia)
+    
+    def _asignacion(self, sentencia, vivas):
+        if sentencia.nombre not in vivas:
+            expresion = sentencia.expresion
+            if es_pura(expresion):
+                if not sentencia.tipo or self.referencias[sentencia.nombre] == 1:
+                    return None, vivas
+            elif not sentencia.tipo and isinstance(expresion, NodoLlamadaFuncion):
+                # Se descarta el resultado pero la llamada se conserva
+                return expresion, vivas | variables_usadas(expresion)
+        return sentencia, (vivas - {sentencia.nombre}) | variables_usadas(sentencia.expresion)
+
+
+def nombres_de(funcion):
+    return {
+        nodo.nombre for nodo in iterar_nodos(funcion)
+        if isinstance(nodo, (NodoIdentificador, NodoAsignacion, NodoIncremento, NodoParametro))
+    }
+
+
+def nombre_libre(prefijo, usados):
+    i = 0
+    while f"{prefijo}{i}" in usados:
+        i += 1
+    nombre = f"{prefijo}{i}"
+    usados.add(nombre)
+    return nombre
+
+
+def clave(expresion):
+    # Identifica expresiones iguales por su estructura
+    return tuple(
+        (type(nodo),) + tuple(getattr(nodo, campo) for campo in nodo.campos if campo not in nodo.campos_hijos)
+        for nodo in iterar_nodos(expresion)
+    )
+
+
+def division_segura(nodo):
+    # Adelantar una division solo es seguro si no puede fallar por dividir entre cero
+    return nodo.operador not in ("/", "%") or (es_constante_entera(nodo.derecha) and nodo.derecha.numero != 0)
+
+
+class _Extraccion(Reescritor):
+    # Reemplaza por temporales las subexpresiones mas grandes que no dependen
+    # de 'asignadas'. 'invariantes' guarda los nodos mismos y no sus id(), que
+    # se podrian reutilizar si un nodo intermedio se libera
+    def __init__(self, asignadas, temporal):
+        self.asignadas = asignadas
+        self.temporal = temporal
+        self.invariantes = set()
+    
+    def salir(self, nodo, hijos):
+        nodo = super().salir(nodo, hijos)
+        if nodo in self.invariantes:
+            return nodo
+        cambios = {}
+        for campo in nodo.campos_hijos:
+            valor = getattr(nodo, campo)
+            if type(valor) is tuple:
+                nuevo = tuple(map(self.extraer, valor))
+                if any(a is not b for a, b in zip(nuevo, valor)):
+                    cambios[campo] = nuevo
+            elif valor is not None:
+                nuevo = self.extraer(valor)
+                if nuevo is not valor:
+                    cambios[campo] = nuevo
+        return nodo.reemplazar(**cambios) if cambios else nodo
+    
+    def extraer(self, nodo):
+        if isinstance(nodo, NodoOperacion) and nodo in self.invariantes:
+            return self.temporal(nodo)
+        return nodo
+    
+    def reescribir_NodoIdentificador(self, nodo):
+        if nodo.nombre not in self.asignadas:
+            self.invariantes.add(nodo)
+        return nodo
+    
+    def reescribir_NodoNumero(self, nodo):
+        self.invariantes.add(nodo)
+        return nodo
+    
+    reescribir_NodoFloat = reescribir_NodoNumero
+    
+    def reescribir_NodoOperacion(self, nodo):
+        if nodo.izquierda in self.invariantes and nodo.derecha in self.invariantes and division_segura(nodo):
+            self.invariantes.add(nodo)
+        return nodo
+
+
+class _TransformacionCiclos:
+    # Base de las pasadas que transforman cada ciclo de una funcion. Los ciclos
+    # internos se procesan antes que los externos; transformar_ciclo() devuelve
+    # el ciclo (el mismo si no cambia) o una lista de sentencias que lo reemplaza
+    def aplicar(self, funcion, optimizador=None):
+        self.usados = nombres_de(funcion)
+        cuerpo = self._bloque(funcion.cuerpo)
+        if cuerpo is funcion.cuerpo:
+            return funcion
+        return funcion.reemplazar(cuerpo=cuerpo)
+    
+    def _bloque(self, sentencias):
+        nuevas = []
+        for sentencia in sentencias:
+            resultado = self._sentencia(sentencia)
+            if isinstance(resultado, list):
+                nuevas.extend(resultado)
+            else:
+                nuevas.append(resultado)
+        if len(nuevas) == len(sentencias) and all(nueva is vieja for nueva, vieja in zip(nuevas, sentencias)):
+            return sentencias
+        return tuple(nuevas)
+    
+    def _sentencia(self, sentencia):
+        if isinstance(sentencia, NodoIf):
+            return _con(sentencia, cuerpo=self._bloque(sentencia.cuerpo), cuerpo_else=self._bloque(sentencia.cuerpo_else))
+        if isinstance(sentencia, (NodoWhile, NodoFor)):
+            ciclo = _con(sentencia, cuerpo=self._bloque(sentencia.cuerpo))
+            return self.transformar_ciclo(ciclo)
+        return sentencia
+    
+
+class MovimientoInvariantes(_TransformacionCiclos):
+    # Saca de los ciclos las operaciones que no dependen de ninguna variable
+    # asignada dentro del ciclo y las calcula una sola vez en un temporal antes
+    # de entrar (el preencabezado). Como los ciclos internos se procesan
+    # primero, una expresion invariante para varios niveles sube hasta el mas
+    # externo
+    nombre = "movimiento de invariantes"
+    
+    def transformar_ciclo(self, ciclo):
+        temporales = {}
+        preencabezado = []
+        
+        def temporal(expresion):
+            k = clave(expresion)
+            if k not in temporales:
+                nombre = nombre_libre("_inv", self.usados)
+                temporales[k] = NodoIdentificador(nombre)
+                preencabezado.append(NodoAsignacion("int", nombre, expresion))
+            return temporales[k]
+        
+        extraccion = _Extraccion(variables_asignadas(ciclo), temporal)
+        cambios = {"cuerpo": tuple(extraccion.recorrer(sentencia) for sentencia in ciclo.cuerpo)}
+        if ciclo.condicion is not None:
+            cambios["condicion"] = extraccion.extraer(extraccion.recorrer(ciclo.condicion))
+        if isinstance(ciclo, NodoFor) and ciclo.incremento is not None:
+            cambios["incremento"] = extraccion.recorrer(ciclo.incremento)
+        if not preencabezado:
+            return ciclo
+        return preencabezado + [ciclo.reemplazar(**cambios)]
+
+
+# Operadores en los que el orden de los operandos no cambia el resultado
+# (&& y || son and y or bit a bit en el generador)
+CONMUTATIVOS = {"+", "*", "==", "!=", "&&", "||"}
+
+
+class _Valores:
+    # Estado de EliminacionSubexpresiones en un punto del cuerpo: numero de
+    # valor de cada variable y, para cada numero de valor ya calculado por
+    # cualquier camino, el ordinal de la operacion que lo calculo
+    __slots__ = ("numeros", "disponibles")
+    
+    def __init__(self, numeros, disponibles):
+        self.numeros = numeros
+        self.disponibles = disponibles
+    
+    def copia(self):
+        return _Valores(dict(self.numeros), dict(self.disponibles))
+
+
+class EliminacionSubexpresiones:
+    # Eliminacion de subexpresiones comunes por numeracion de valores. Cada
+    # variable tiene un numero de valor que cambia cuando se le asigna, y una
+    # operacion tiene el numero que corresponde a su operador y los numeros de
+    # sus operandos, asi que a + b y x + b son la misma si x es copia de a.
+    # Los calculos disponibles se recorren como en PropagacionConstantes: en
+    # un if se quedan los que calculan las dos ramas y un ciclo empieza con un
+    # numero nuevo para todo lo que asigna.
+    #
+    # Un primer recorrido solo anota que operaciones (por su ordinal en el
+    # recorrido) se vuelven a calcular mas adelante; el segundo, identico,
+    # guarda esas en un temporal declarado justo antes de la sentencia y
+    # reemplaza las repeticiones. Si la operacion es toda la expresion de una
+    # asignacion y la variable conserva el valor, se reutiliza la variable.
+    # Las condiciones e incrementos de los ciclos solo reutilizan valores:
+    # no hay donde declarar un temporal que se recalcule en cada vuelta
+    nombre = "eliminacion de subexpresiones comunes"
+    
+    def aplicar(self, funcion, optimizador=None):
+        self.reutilizadas = set()
+        self.con_temporal = set()
+        self.reescribir = False
+        self._recorrer(funcion)
+        if not self.reutilizadas:
+            return funcion
+        self.usados = nombres_de(funcion)
+        self.reescribir = True
+        cuerpo = self._recorrer(funcion)
+        return funcion.reemplazar(cuerpo=cuerpo)
+    
+    def _recorrer(self, funcion):
+        self.expresiones = {}
+        self.siguiente = 0
+        self.ordinal = 0
+        # ordinal de una operacion que es toda la expresion de una asignacion -> variable
+        self.raices = {}
+        # ordinal -> temporal que guarda el valor (solo en el segundo recorrido)
+        self.temporales = {}
+        numeros = {parametro.nombre: self._nuevo_numero() for parametro in funcion.parametros}
+        cuerpo, _ = self._bloque(funcion.cuerpo, _Valores(numeros, {}))
+        return cuerpo
+    
+    def _nuevo_numero(self):
+        self.siguiente += 1
+        return self.siguiente
+    
+    def _numero(self, clave_valor):
+        numero = self.expresiones.get(clave_valor)
+        if numero is None:
+            numero = self.expresiones[clave_valor] = self._nuevo_numero()
+        return numero
+    
+    def _variable(self, nombre, valores):
+        numero = valores.numeros.get(nombre)
+        if numero is None:
+            numero = valores.numeros[nombre] = self._nuevo_numero()
+        return numero
+    
+    def _unir(self, a, b):
+        if a is None:
+            return b
+        if b is None:
+            return a
+        numeros = {
+            nombre: numero if b.numeros[nombre] == numero else self._nuevo_numero()
+            for nombre, numero in a.numeros.items() if nombre in b.numeros
+        }
+        disponibles = {numero: ordinal for numero, ordinal in a.disponibles.items() if b.disponibles.get(numero) == ordinal}
+        return _Valores(numeros, disponibles)
+    
+    def _cabecera(self, ciclo, valores):
+        valores = valores.copia()
+        for nombre in sorted(variables_asignadas(ciclo)):
+            valores.numeros[nombre] = self._nuevo_numero()
+        return valores
+    
+    def _bloque(self, sentencias, valores):
+        nuevas = []
+        for sentencia in sentencias:
+            if valores is not None:
+                previas = []
+                sentencia, valores = self._sentencia(sentencia, valores, previas)
+                nuevas.extend(previas)
+            nuevas.append(sentencia)
+        if len(nuevas) == len(sentencias) and all(nueva is vieja for nueva, vieja in zip(nuevas, sentencias)):
+            return sentencias, valores
+        return tuple(nuevas), valores
+    
+    def _sentencia(self, sentencia, valores, previas):
+        if isinstance(sentencia, NodoAsignacion):
+            expresion, numero = self._expresion(sentencia.expresion, valores, previas, sentencia.nombre)
+            valores.numeros[sentencia.nombre] = numero
+            return _con(sentencia, expresion=expresion), valores
+        
+        if isinstance(sentencia, (NodoPrint, NodoRetorno)):
+            expresion, _ = self._expresion(sentencia.expresion, valores, previas)
+            return _con(sentencia, expresion=expresion), None if isinstance(sentencia, NodoRetorno) else valores
+        
+        if isinstance(sentencia, NodoLlamadaFuncion):
+            return self._expresion(sentencia, valores, previas)[0], valores
+        
+        if isinstance(sentencia, NodoIf):
+            condicion, _ = self._expresion(sentencia.condicion, valores, previas)
+            cuerpo, salida = self._bloque(sentencia.cuerpo, valores.copia())
+            cuerpo_else, salida_else = self._bloque(sentencia.cuerpo_else, valores.copia())
+            return _con(sentencia, condicion=condicion, cuerpo=cuerpo, cuerpo_else=cuerpo_else), self._unir(salida, salida_else)
+        
+        if isinstance(sentencia, NodoWhile):
+            valores = self._cabecera(sentencia, valores)
+            condicion, _ = self._expresion(sentencia.condicion, valores, None)
+            cuerpo, _ = self._bloque(sentencia.cuerpo, valores.copia())
+            return _con(sentencia, condicion=condicion, cuerpo=cuerpo), valores
+        
+        if isinstance(sentencia, NodoFor):
+            inicializacion = sentencia.inicializacion
+            if inicializacion is not None:
+                inicializacion, valores = self._sentencia(inicializacion, valores, previas)
+            valores = self._cabecera(sentencia, valores)
+            condicion, _ = self._expresion(sentencia.condicion, valores, None)
+            cuerpo, salida = self._bloque(sentencia.cuerpo, valores.copia())
+            incremento = sentencia.incremento
+            if isinstance(incremento, NodoAsignacion) and salida is not None:
+                expresion, _ = self._expresion(incremento.expresion, salida, None)
+                incremento = _con(incremento, expresion=expresion)
+            return _con(sentencia, inicializacion=inicializacion, condicion=condicion, incremento=incremento, cuerpo=cuerpo), valores
+        
+        # Scanf, incrementos y cualquier otra sentencia: lo que asignan toma
+        # un valor desconocido
+        for nombre in sorted(variables_asignadas(sentencia)):
+            valores.numeros[nombre] = self._nuevo_numero()
+        return sentencia, valores
+    
+    def _expresion(self, expresion, valores, previas, asignada=None):
+        # Devuelve la expresion reescrita y su numero de valor. 'previas'
+        # recibe las declaraciones de temporales que van antes de la
+        # sentencia; None si en este lugar no se pueden declarar. Recorre
+        # en post-orden con una pila para no depender de la profundidad
+        if expresion is None:
+            return None, None
+        # Adelantar una division que puede fallar cambiaria lo que se imprime
+        # antes del error si la sentencia tambien llama a una funcion
+        con_llamadas = previas is not None and any(isinstance(nodo, NodoLlamadaFuncion) for nodo in iterar_nodos(expresion))
+        resultados = []
+        pendientes = [(expresion, False)]
+        while pendientes:
+            nodo, listo = pendientes.pop()
+            if isinstance(nodo, NodoOperacion):
+                hijos = (nodo.izquierda, nodo.derecha)
+            elif isinstance(nodo, NodoOperacionUnaria):
+                hijos = (nodo.operando,)
+            elif isinstance(nodo, NodoLlamadaFuncion):
+                hijos = nodo.argumentos
+            else:
+                hijos = ()
+            if hijos and not listo:
+                pendientes.append((nodo, True))
+                pendientes.extend((hijo, False) for hijo in reversed(hijos))
+                continue
+            
+            operandos = ()
+            if hijos:
+                operandos = resultados[-len(hijos):]
+                del resultados[-len(hijos):]
+            if isinstance(nodo, NodoIdentificador):
+                resultados.append((nodo, self._variable(nodo.nombre, valores)))
+            elif isinstance(nodo, (NodoNumero, NodoFloat)):
+                resultados.append((nodo, self._numero((type(nodo), nodo.numero))))
+            elif isinstance(nodo, NodoOperacionUnaria):
+                (operando, numero), = operandos
+                resultados.append((_con(nodo, operando=operando), self._numero((nodo.operador, numero))))
+            elif isinstance(nodo, NodoLlamadaFuncion):
+                argumentos = tuple(argumento for argumento, _ in operandos)
+                if all(nuevo is viejo for nuevo, viejo in zip(argumentos, nodo.argumentos)):
+                    argumentos = nodo.argumentos
+                resultados.append((_con(nodo, argumentos=argumentos), self._nuevo_numero()))
+            elif isinstance(nodo, NodoOperacion):
+                resultados.append(self._operacion(nodo, operandos, valores, previas, con_llamadas, asignada if nodo is expresion else None))
+            else:
+                resultados.append((nodo, self._nuevo_numero()))
+        return resultados[0]
+    
+    def _operacion(self, nodo, operandos, valores, previas, con_llamadas, asignada):
+        (izquierda, numero_izquierda), (derecha, numero_derecha) = operandos
+        if nodo.operador in CONMUTATIVOS and numero_derecha < numero_izquierda:
+            numero_izquierda, numero_derecha = numero_derecha, numero_izquierda
+        numero = self._numero((nodo.operador, numero_izquierda, numero_derecha))
+        nuevo = _con(nodo, izquierda=izquierda, derecha=derecha)
+        ordinal = self.ordinal
+        self.ordinal += 1
+        
+        anterior = valores.disponibles.get(numero)
+        if anterior is not None:
+            variable = self.raices.get(anterior)
+            if not self.reescribir:
+                self.reutilizadas.add(anterior)
+                if variable is None or valores.numeros.get(variable) != numero:
+                    self.con_temporal.add(anterior)
+                return nuevo, numero
+            return NodoIdentificador(self.temporales.get(anterior, variable)), numero
+        
+        if previas is None or (con_llamadas and not division_segura(nodo)):
+            return nuevo, numero
+        valores.disponibles[numero] = ordinal
+        if asignada is not None:
+            self.raices[ordinal] = asignada
+        if self.reescribir and ordinal in self.reutilizadas and (asignada is None or ordinal in self.con_temporal):
+            temporal = nombre_libre("_cse", self.usados)
+            self.temporales[ordinal] = temporal
+            previas.append(NodoAsignacion("int", temporal, nuevo))
+            return NodoIdentificador(temporal), numero
+        return nuevo, numero
+
+
+def es_potencia_de_dos(valor):
+    return valor > 0 and valor & (valor - 1) == 0
+
+
+def paso_induccion(ciclo):
+    # Paso de la variable de induccion de un for cuyo incremento tiene la forma
+    # que construye Parser.incremento: i = i + c o i = i - c
+    incremento = ciclo.incremento
+    if not isinstance(incremento, NodoAsignacion) or not isinstance(incremento.expresion, NodoOperacion):
+        return None
+    expresion = incremento.expresion
+    if not (isinstance(expresion.izquierda, NodoIdentificador) and expresion.izquierda.nombre == incremento.nombre):
+        return None
+    if expresion.operador not in ("+", "-") or not es_constante_entera(expresion.derecha):
+        return None
+    return expresion.derecha.numero if expresion.operador == "+" else -expresion.derecha.numero
+
+
+class _Reduccion(Reescritor):
+    def __init__(self, factor_de, derivadas):
+        self.factor_de = factor_de
+        self.derivadas = derivadas
+    
+    def reescribir_NodoOperacion(self, nodo):
+        factor = self.factor_de(nodo)
+        if factor is None:
+            return nodo
+        return self.derivadas.get(clave(factor), nodo)
+
+
+class ReduccionFuerza(_TransformacionCiclos):
+    # En un for con variable de induccion i (paso s), cada producto i * k con k
+    # constante o invariante se reemplaza por una variable derivada t que se
+    # inicializa en i * k antes del ciclo y aumenta k * s al final del cuerpo
+    # (el lenguaje no tiene continue, asi que el final del cuerpo siempre
+    # precede al incremento). Solo se aplica si lo que se ahorra en las
+    # multiplicaciones supera el costo de actualizar t en cada iteracion; las
+    # potencias de dos las resuelve el generador con desplazamientos
+    nombre = "reduccion de fuerza"
+    
+    # Ciclos estimados: una multiplicacion por constante (imul inmediato), una
+    # por variable (carga, push/pop e imul) y la actualizacion t = t + c
+    AHORRO_CONSTANTE = 3
+    AHORRO_VARIABLE = 7
+    AHORRO_POTENCIA_DE_DOS = 1
+    COSTO_ACTUALIZACION = 3
+    
+    def transformar_ciclo(self, ciclo):
+        if not isinstance(ciclo, NodoFor):
+            return ciclo
+        paso = paso_induccion(ciclo)
+        if paso is None:
+            return ciclo
+        induccion = ciclo.incremento.nombre
+        asignadas = set()
+        for sentencia in ciclo.cuerpo:
+            asignadas |= variables_asignadas(sentencia)
+        if induccion in asignadas:
+            return ciclo
+        
+        def factor_de(nodo):
+            if not isinstance(nodo, NodoOperacion) or nodo.operador != "*":
+                return None
+            for variable, factor in ((nodo.izquierda, nodo.derecha), (nodo.derecha, nodo.izquierda)):
+                if isinstance(variable, NodoIdentificador) and variable.nombre == induccion:
+                    if es_constante_entera(factor) and factor.numero != 0:
+                        return factor
+                    if isinstance(factor, NodoIdentificador) and factor.nombre not in asignadas and factor.nombre != induccion:
+                        return factor
+            return None
+        
+        ahorros = {}
+        factores = {}
+        partes = list(ciclo.cuerpo) + ([ciclo.condicion] if ciclo.condicion is not None else [])
+        for parte in partes:
+            for nodo in iterar_nodos(parte):
+                factor = factor_de(nodo)
+                if factor is not None:
+                    k = clave(factor)
+                    factores[k] = factor
+                    ahorros[k] = ahorros.get(k, 0) + self._ahorro(factor)
+        elegidos = [k for k in factores if ahorros[k] > self.COSTO_ACTUALIZACION]
+        if not elegidos:
+            return ciclo
+        
+        derivadas = {k: NodoIdentificador(nombre_libre("_ind", self.usados)) for k in elegidos}
+        reduccion = _Reduccion(factor_de, derivadas)
+        cuerpo = [reduccion.recorrer(sentencia) for sentencia in ciclo.cuerpo]
+        declaraciones = []
+        for k in elegidos:
+            derivada, factor = derivadas[k], factores[k]
+            declaraciones.append(NodoAsignacion("int", derivada.nombre, NodoOperacion(NodoIdentificador(induccion), "*", factor)))
+            cuerpo.append(NodoAsignacion(None, derivada.nombre, NodoOperacion(derivada, "+", self._aumento(factor, paso))))
+        condicion = reduccion.recorrer(ciclo.condicion) if ciclo.condicion is not None else None
+        
+        # La inicializacion sale del for para que las derivadas se calculen
+        # con el valor inicial de i
+        antes = [ciclo.inicializacion] if ciclo.inicializacion is not None else []
+        return antes + declaraciones + [ciclo.reemplazar(inicializacion=None, condicion=condicion, cuerpo=cuerpo)]
+    
+    def _ahorro(self, factor):
+        if isinstance(factor, NodoIdentificador):
+            return self.AHORRO_VARIABLE
+        if es_potencia_de_dos(factor.numero):
+            return self.AHORRO_POTENCIA_DE_DOS
+        return self.AHORRO_CONSTANTE
+    
+    def _aumento(self, factor, paso):
+        if isinstance(factor, NodoNumero):
+            return constante(factor.numero * paso)
+        if paso == 1:
+            return factor
+        return NodoOperacion(factor, "*", constante(paso))
+
+
+class GrafoLlamadas:
+    # Grafo de llamadas del programa. 'orden' numera las funciones de modo que
+    # las llamadas queden antes que quien las llama (salvo en los ciclos del
+    # grafo) y 'recursivas' son las que pueden volver a llamarse a si mismas,
+    # es decir las que estan en una componente fuertemente conexa con mas de
+    # una funcion o se llaman directamente
+    def __init__(self, programa):
+        self.llamadas = {
+            funcion.nombre: {nodo.nombre for nodo in iterar_nodos(funcion) if isinstance(nodo, NodoLlamadaFuncion)}
+            for funcion in programa.funciones
+        }
+        postorden = self._postorden(self.llamadas)
+        self.orden = {nombre: i for i, nombre in enumerate(postorden)}
+        
+        # Kosaraju: en el grafo invertido, cada recorrido desde la funcion que
+        # termino ultima y sin visitar encuentra una componente completa
+        llamadores = {nombre: set() for nombre in self.llamadas}
+        for nombre, llamadas in self.llamadas.items():
+            for llamada in llamadas:
+                if llamada in llamadores:
+                    llamadores[llamada].add(nombre)
+        self.recursivas = set()
+        visitadas = set()
+        for raiz in reversed(postorden):
+            if raiz in visitadas:
+                continue
+            visitadas.add(raiz)
+            componente = [raiz]
+            pila = [raiz]
+            while pila:
+                for otra in llamadores[pila.pop()]:
+                    if otra not in visitadas:
+                        visitadas.add(otra)
+                        componente.append(otra)
+                        pila.append(otra)
+            if len(componente) > 1 or raiz in self.llamadas[raiz]:
+                self.recursivas.update(componente)
+    
+    @staticmethod
+    def _postorden(grafo):
+        postorden = []
+        visitadas = set()
+        for raiz in grafo:
+            if raiz in visitadas:
+                continue
+            visitadas.add(raiz)
+            pila = [(raiz, iter(grafo[raiz]))]
+            while pila:
+                nombre, pendientes = pila[-1]
+                for siguiente in pendientes:
+                    if siguiente in grafo and siguiente not in visitadas:
+                        visitadas.add(siguiente)
+                        pila.append((siguiente, iter(grafo[siguiente])))
+                        break
+                else:
+                    pila.pop()
+                    postorden.append(nombre)
+        return postorden
+
+
+def tiene_entrada_salida(raiz):
+    return any(isinstance(nodo, (NodoPrint, NodoScanf)) for nodo in iterar_nodos(raiz))
+
+
+class _Renombrado(Reescritor):
+    def __init__(self, nombres):
+        self.nombres = nombres
+    
+    def reescribir_NodoIdentificador(self, nodo):
+        if nodo.nombre in self.nombres:
+            return nodo.reemplazar(nombre=self.nombres[nodo.nombre])
+        return nodo
+    
+    reescribir_NodoAsignacion = reescribir_NodoIdentificador
+    reescribir_NodoIncremento = reescribir_NodoIdentificador
+
+
+class _Expansion(Reescritor):
+    # Reemplaza las llamadas expandibles de una expresion por el valor de
+    # retorno de la funcion; sus demas sentencias quedan en 'previas' y se
+    # ejecutan antes de la sentencia que contiene la expresion. Eso adelanta
+    # la llamada respecto de las que se evaluaban antes que ella, asi que una
+    # funcion con entrada/salida (o con argumentos que llaman a otras) solo se
+    # expande si antes no queda ninguna llamada sin expandir
+    def __init__(self, expansion):
+        self.expansion = expansion
+        self.previas = []
+        self.pendientes = 0
+    
+    def reescribir_NodoLlamadaFuncion(self, nodo):
+        funcion = self.expansion.candidatas.get(nodo.nombre)
+        llamadas_en_argumentos = sum(
+            1 for argumento in nodo.argumentos for hijo in iterar_nodos(argumento) if isinstance(hijo, NodoLlamadaFuncion)
+        )
+        anteriores = self.pendientes - llamadas_en_argumentos
+        if funcion is None or len(funcion.parametros) != len(nodo.argumentos) or (
+            anteriores and (llamadas_en_argumentos or tiene_entrada_salida(funcion))
+        ):
+            self.pendientes += 1
+            return nodo
+        self.pendientes = anteriores
+        return self.expansion.copiar(funcion, nodo.argumentos, self.previas)
+
+
+class ExpansionEnLinea:
+    # Expande en el lugar de la llamada las funciones hoja (sin llamadas)
+    # pequenas que terminan en un unico return, evitando el prologo, el
+    # espacio de sombra y el call. Los parametros pasan a ser declaraciones
+    # inicializadas con los argumentos y los nombres de la funcion se
+    # renombran para no chocar con los del llamador; la propagacion de
+    # constantes y el codigo muerto limpian despues lo que sobre.
+    # Necesita el pipeline para conocer las demas funciones: este las procesa
+    # en el orden del grafo de llamadas, asi que una funcion que solo llama a
+    # funciones expandibles se convierte en hoja y se puede expandir a su vez,
+    # y las funciones recursivas nunca se expanden
+    nombre = "expansion en linea"
+    LIMITE_NODOS = 40
+    
+    def __init__(self):
+        # Funcion -> si se puede expandir; las funciones son inmutables y el
+        # pipeline las vuelve a consultar en cada ejecucion de la pasada
+        self.expandibles = {}
+    
+    def aplicar(self, funcion, optimizador=None):
+        if optimizador is None or es_pura(funcion):
+            return funcion
+        llamadas = {nodo.nombre for nodo in iterar_nodos(funcion) if isinstance(nodo, NodoLlamadaFuncion)}
+        self.candidatas = {
+            nombre: optimizador.funciones[nombre] for nombre in llamadas
+            if nombre in optimizador.funciones and nombre != funcion.nombre
+            and self._expandible(optimizador.funciones[nombre], optimizador.grafo)
+        }
+        if not self.candidatas:
+            return funcion
+        self.usados = nombres_de(funcion)
+        cuerpo = self._bloque(funcion.cuerpo)
+        if cuerpo is funcion.cuerpo:
+            return funcion
+        return funcion.reemplazar(cuerpo=cuerpo)
+    
+    def _expandible(self, funcion, grafo):
+        if funcion not in self.expandibles:
+            self.expandibles[funcion] = self._es_expandible(funcion, grafo)
+        return self.expandibles[funcion]
+    
+    def _es_expandible(self, funcion, grafo):
+        if funcion.nombre == "main" or funcion.nombre in grafo.recursivas or not funcion.cuerpo:
+            return False
+        *previas, final = funcion.cuerpo
+        return (
+            isinstance(final, NodoRetorno) and final.expresion is not None
+            and es_pura(funcion) and contar_nodos(funcion) <= self.LIMITE_NODOS
+            and not any(isinstance(nodo, NodoRetorno) for sentencia in previas for nodo in iterar_nodos(sentencia))
+        )
+    
+    def copiar(self, funcion, argumentos, previas):
+        nombres = {}
+        for parametro, argumento in zip(funcion.parametros, argumentos):
+            nombres[parametro.nombre] = nombre_libre(f"_{funcion.nombre}_{parametro.nombre}", self.usados)
+            previas.append(NodoAsignacion(parametro.tipo, nombres[parametro.nombre], argumento))
+        for nombre in sorted(variables_asignadas(funcion) - set(nombres)):
+            nombres[nombre] = nombre_libre(f"_{funcion.nombre}_{nombre}", self.usados)
+        renombrado = _Renombrado(nombres)
+        previas.extend(renombrado.recorrer(sentencia) for sentencia in funcion.cuerpo[:-1])
+        return renombrado.recorrer(funcion.cuerpo[-1].expresion)
+    
+    def _expandir(self, expresion, previas):
+        expansion = _Expansion(self)
+        nueva = expansion.recorrer(expresion)
+        previas.extend(expansion.previas)
+        return nueva
+    
+    def _bloque(self, sentencias):
+        nuevas = []
+        for sentencia in sentencias:
+            previas = []
+            nueva = self._sentencia(sentencia, previas)
+            nuevas.extend(previas)
+            if nueva is not None:
+                nuevas.append(nueva)
+        if len(nuevas) == len(sentencias) and all(nueva is vieja for nueva, vieja in zip(nuevas, sentencias)):
+            return sentencias
+        return tuple(nuevas)
+    
+    def _sentencia(self, sentencia, previas):
+        if isinstance(sentencia, NodoIf):
+            return _con(
+                sentencia, condicion=self._expandir(sentencia.condicion, previas),
+                cuerpo=self._bloque(sentencia.cuerpo), cuerpo_else=self._bloque(sentencia.cuerpo_else),
+            )
+        if isinstance(sentencia, NodoWhile):
+            # La condicion se evalua en cada vuelta y no se puede adelantar
+            return _con(sentencia, cuerpo=self._bloque(sentencia.cuerpo))
+        if isinstance(sentencia, NodoFor):
+            inicializacion = sentencia.inicializacion
+            if inicializacion is not None:
+                inicializacion = self._sentencia(inicializacion, previas)
+            return _con(sentencia, inicializacion=inicializacion, cuerpo=self._bloque(sentencia.cuerpo))
+        if isinstance(sentencia, (NodoAsignacion, NodoPrint, NodoRetorno)) and sentencia.expresion is not None:
+            return _con(sentencia, expresion=self._expandir(sentencia.expresion, previas))
+        if isinstance(sentencia, NodoLlamadaFuncion):
+            nueva = self._expandir(sentencia, previas)
+            # Si la llamada sigue ahi (quiza con argumentos expandidos) se
+            # conserva; si se expandio, el valor de retorno de una funcion
+            # hoja no tiene efectos
+            return nueva if isinstance(nueva, NodoLlamadaFuncion) else None
+        return sentencia
+
+
+PASADAS = (
+    ExpansionEnLinea, PropagacionConstantes, PlegadoConstantes, SimplificacionAlgebraica, EliminacionRamasMuertas,
+    EliminacionCodigoMuerto, ReduccionFuerza, MovimientoInvariantes, EliminacionSubexpresiones,
+)
+
+
+class EstadisticaPasada:
+    __slots__ = ("nombre", "tiempo", "ejecuciones", "cambios", "nodos_eliminados")
+    
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.tiempo = 0.0
+        self.ejecuciones = 0
+        self.cambios = 0
+        self.nodos_eliminados = 0
+    
+    def __str__(self):
+        return (f"{self.nombre}: {self.cambios} cambios en {self.ejecuciones} ejecuciones, "
+                f"{self.nodos_eliminados} nodos eliminados, {self.tiempo * 1000:.2f} ms")
+
+
+class ReporteOptimizacion:
+    def __init__(self, pasadas):
+        self.pasadas = [EstadisticaPasada(pasada.nombre) for pasada in pasadas]
+        self.nodos_antes = 0
+        self.nodos_despues = 0
+        # nombre de funcion -> (nodos antes, nodos despues)
+        self.por_funcion = {}
+        # nombre de funcion -> (instrucciones antes, instrucciones despues),
+        # solo si el pipeline se creo con contar_instrucciones=True
+        self.instrucciones = {}
+        # nombre de funcion -> pasadas que seguian pendientes al llegar a
+        # max_ejecuciones; el resultado es correcto pero no esta en punto fijo
+        self.sin_converger = {}
+    
+    def __str__(self):
+        lineas = [f"Optimizacion: {self.nodos_antes} -> {self.nodos_despues} nodos ({self.nodos_despues - self.nodos_antes:+d})"]
+        lineas.extend(f"  {estadistica}" for estadistica in self.pasadas)
+        for nombre, (antes, despues) in self.instrucciones.items():
+            lineas.append(f"  {nombre}: {antes} -> {despues} instrucciones ({antes - despues} ahorradas)")
+        for nombre, pendientes in self.sin_converger.items():
+            lineas.append(f"  aviso: {nombre} no llego a punto fijo; quedaban pendientes {', '.join(pendientes)}")
+        return "\n".join(lineas)
+
+
+class PipelineOptimizacion:
+    # Dos listas de trabajo: una de funciones y, dentro de cada funcion, una de
+    # pasadas. Cuando una pasada cambia la funcion, las demas vuelven a la cola
+    # porque el cambio puede haberles dejado algo nuevo que simplificar; se
+    # asume que cada pasada ya deja su propio resultado en punto fijo
+    def __init__(self, pasadas=None, max_ejecuciones=100, contar_instrucciones=False):
+        self.pasadas = [pasada() for pasada in (pasadas or PASADAS)]
+        self.max_ejecuciones = max_ejecuciones
+        self.contar_instrucciones = contar_instrucciones
+        self.reporte = ReporteOptimizacion(self.pasadas)
+        self.funciones = {}
+        self.grafo = None
+    
+    def optimizar(self, programa):
+        self.reporte = ReporteOptimizacion(self.pasadas)
+        funciones = list(programa.funciones)
+        self.funciones = {funcion.nombre: funcion for funcion in funciones}
+        # Las funciones llamadas se optimizan antes que quien las llama, asi la
+        # expansion en linea ya encuentra sus versiones optimizadas
+        self.grafo = GrafoLlamadas(programa)
+        pendientes = deque(sorted(range(len(funciones)), key=lambda i: self.grafo.orden[funciones[i].nombre]))
+        while pendientes:
+            i = pendientes.popleft()
+            original = funciones[i]
+            antes = contar_nodos(original)
+            funciones[i] = self._optimizar_funcion(original, antes)
+            self.funciones[original.nombre] = funciones[i]
+            despues = contar_nodos(funciones[i])
+            antes_total, _ = self.reporte.por_funcion.get(original.nombre, (antes, None))
+            self.reporte.por_funcion[original.nombre] = (antes_total, despues)
+        
+        self.reporte.nodos_antes = sum(antes for antes, _ in self.reporte.por_funcion.values()) + 1
+        self.reporte.nodos_despues = sum(despues for _, despues in self.reporte.por_funcion.values()) + 1
+        if self.contar_instrucciones:
+            for original, optimizada in zip(programa.funciones, funciones):
+                antes = contar_instrucciones(original)
+                despues = antes if optimizada is original else contar_instrucciones(optimizada)
+                self.reporte.instrucciones[original.nombre] = (antes, despues)
+        if all(nueva is vieja for nueva, vieja in zip(funciones, programa.funciones)):
+            return programa
+        return NodoPrograma(funciones)
+    
+    def _optimizar_funcion(self, funcion, nodos):
+        pendientes = deque(range(len(self.pasadas)))
+        en_cola = set(pendientes)
+        ejecuciones = 0
+        while pendientes and ejecuciones < self.max_ejecuciones:
+            i = pendientes.popleft()
+            en_cola.discard(i)
+            pasada, estadistica = self.pasadas[i], self.reporte.pasadas[i]
+            inicio = time.perf_counter()
+            nueva = pasada.aplicar(funcion, self)
+            estadistica.tiempo += time.perf_counter() - inicio
+            estadistica.ejecuciones += 1
+            ejecuciones += 1
+            if nueva is funcion:
+                continue
+            estadistica.cambios += 1
+            nodos_nuevos = contar_nodos(nueva)
+            estadistica.nodos_eliminados += nodos - nodos_nuevos
+            funcion, nodos = nueva, nodos_nuevos
+            for j in range(len(self.pasadas)):
+                if j != i and j not in en_cola:
+                    pendientes.append(j)
+                    en_cola.add(j)
+        if pendientes:
+            self.reporte.sin_converger[funcion.nombre] = [self.pasadas[i].nombre for i in pendientes]
+        else:
+            self.reporte.sin_converger.pop(funcion.nombre, None)
+        return funcion
+
+
+def optimizar_programa(programa, pasadas=None):
+    pipeline = PipelineOptimizacion(pasadas)
+    return pipeline.optimizar(programa), pipeline.reporte
+
+
+def optimizar_nodo(nodo, pasadas=None):
+    # Aplica las pasadas a un nodo suelto (una expresion o una sentencia) hasta
+    # que ninguna cambie nada. Una sentencia puede quedar como lista o None.
+    # Las pasadas que analizan el flujo de una funcion completa solo se
+    # aplican si el nodo es una funcion
+    if pasadas is None:
+        pasadas = PASADAS if isinstance(nodo, NodoFuncion) else [pasada for pasada in PASADAS if issubclass(pasada, Reescritor)]
+    pasadas = [pasada() for pasada in pasadas]
+    cambio = True
+    while cambio and isinstance(nodo, NodoAST):
+        cambio = False
+        for pasada in pasadas:
+            nuevo = pasada.aplicar(nodo)
+            if nuevo is not nodo:
+                nodo = nuevo
+                cambio = True
+                if not isinstance(nodo, NodoAST):
+                    break
+    return nodo
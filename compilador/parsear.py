@@ -1,70 +1,204 @@
+from collections import namedtuple
+
 from nodes import *
+from analisis_lexico import BufferTokens, TIPOS, TIPO_ID, FIN
+
+KEYWORD = TIPO_ID["KEYWORD"]
+IDENTIFIER = TIPO_ID["IDENTIFIER"]
+NUMBER = TIPO_ID["NUMBER"]
+OPERATOR = TIPO_ID["OPERATOR"]
+STRING = TIPO_ID["STRING"]
+DELIMITER = TIPO_ID["DELIMITER"]
+
+# Precedencia de los operadores binarios (mayor valor = mas fuerte), como en C.
+# Todos son asociativos por la izquierda
+PRECEDENCIA = {
+    "||": 1,
+    "&&": 2,
+    "==": 3, "!=": 3,
+    "<": 4, ">": 4, "<=": 4, ">=": 4,
+    "+": 5, "-": 5,
+    "*": 6, "/": 6,
+}
+OPERADORES_UNARIOS = ("&", "*", "-", "+", "!")
+
+
+class Diagnostico(namedtuple("Diagnostico", ["mensaje", "linea", "columna", "offset"])):
+    __slots__ = ()
+    
+    def __str__(self):
+        return f"linea {self.linea}, columna {self.columna}: {self.mensaje}"
 
 
 class Parser:
-    def __init__(self, tokens):
-        self.tokens = tokens
-        self.pos = 0
+    def __init__(self, tokens, bloque=4096, recuperar=False):
+        # Acepta un BufferTokens, una lista de tokens o un flujo (por ejemplo
+        # analisis_lexico.identificar_archivo); los flujos se cargan por bloques.
+        # Con recuperar=True los errores sintacticos se acumulan en self.errores
+        # y el analisis continua despues de sincronizar en ';' o '}'
+        self.recuperar = recuperar
+        self.errores = []
+        self.hojas = FabricaHojas()
+        if isinstance(tokens, BufferTokens):
+            self.buffer = tokens
+        elif isinstance(tokens, (list, tuple)):
+            self.buffer = BufferTokens(tokens)
+        else:
+            self.buffer = BufferTokens(tokens, bloque)
+        self.tipos = self.buffer.tipos
+        self.ids = self.buffer.ids
+        self.valores = self.buffer.valores
+        self.n = len(self.tipos)
+        self.i = -1
+        self.tipo = FIN
+        self.valor = None
+        self._situar(0)
+    
+    @property
+    def pos(self):
+        return self.buffer.base + self.i
+    
+    def _situar(self, i):
+        # Deja el token i como actual. El buffer termina con un token FIN, asi que
+        # tipos[i] siempre es valido; 'limite' marca cuando el lookahead alcanza
+        # el final del bloque cargado y hay que recargar
+        if i + 1 >= self.n and not self.buffer.agotado:
+            i -= self.buffer.recargar(i)
+            self.n = len(self.tipos)
+        self.limite = self.n - 1 if not self.buffer.agotado else self.n
+        self.i = i
+        self.tipo = self.tipos[i]
+        self.valor = self.valores[self.ids[i]]
         
     def obtener_token_actual(self):
-        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+        return self.buffer.token(self.i) if self.tipo != FIN else None
+    
+    def valor_siguiente(self):
+        i = self.i + 1
+        return self.valores[self.ids[i]] if i < self.n else None
+    
+    def avanzar(self):
+        valor = self.valor
+        i = self.i + 1
+        if i >= self.limite:
+            self._situar(i)
+        else:
+            self.i = i
+            self.tipo = self.tipos[i]
+            self.valor = self.valores[self.ids[i]]
+        return valor
     
     def coincidir(self, tipo_esperado, valor_esperado=None):
-        token_actual = self.obtener_token_actual()
-        if token_actual:
-            if token_actual[0] != tipo_esperado:
-                raise SyntaxError(f"Error sintactico: Se esperaba {tipo_esperado}, pero se encontro {token_actual}")
-            if valor_esperado is not None and token_actual[1] != valor_esperado:
-                raise SyntaxError(f"Error Sintactico: se esperaba {tipo_esperado} '{valor_esperado}' pero se encontro {token_actual}")
-            self.pos += 1
-            return token_actual
+        if self.tipo != tipo_esperado or (valor_esperado is not None and self.valor != valor_esperado):
+            self.error_esperado(tipo_esperado, valor_esperado)
+        # Igual que avanzar(), sin la llamada extra en el camino caliente
+        valor = self.valor
+        i = self.i + 1
+        if i >= self.limite:
+            self._situar(i)
         else:
-            raise SyntaxError(f"Error sintactico: Se esperaba {tipo_esperado}, pero no hay más tokens")
+            self.i = i
+            self.tipo = self.tipos[i]
+            self.valor = self.valores[self.ids[i]]
+        return valor
+    
+    def error_esperado(self, tipo_esperado, valor_esperado=None):
+        if self.tipo == FIN:
+            raise SyntaxError(f"Error sintactico: Se esperaba {TIPOS[tipo_esperado]}, pero no hay más tokens")
+        if self.tipo != tipo_esperado:
+            raise SyntaxError(f"Error sintactico: Se esperaba {TIPOS[tipo_esperado]}, pero se encontro {self.obtener_token_actual()}")
+        raise SyntaxError(f"Error Sintactico: se esperaba {TIPOS[tipo_esperado]} '{valor_esperado}' pero se encontro {self.obtener_token_actual()}")
         
     def parsear(self):
         funciones = []
         
-        while self.pos < len(self.tokens):
-            funciones.append(self.funcion())
+        while self.tipo != FIN:
+            try:
+                funciones.append(self.funcion())
+            except SyntaxError as error:
+                if not self.recuperar:
+                    raise
+                self.registrar_error(error)
+                self.sincronizar_funcion()
         programa = NodoPrograma(funciones)
         
         if not programa.tiene_main:
             raise SyntaxError("Error Sintactico: Se esperaba una función main")
         return programa
     
+    def registrar_error(self, error):
+        # La posicion es la del token donde se detecto el error; al final de la
+        # entrada se usa la del ultimo token
+        i = self.i if self.tipo != FIN or self.i == 0 else self.i - 1
+        buffer = self.buffer
+        self.errores.append(Diagnostico(str(error), buffer.lineas[i], buffer.columnas[i], buffer.offsets[i]))
+    
+    def sincronizar(self):
+        # Modo panico a nivel de instruccion: descarta tokens hasta consumir un ';'
+        # o un bloque '{ ... }' completo, o hasta un '}' que cierra el bloque actual
+        profundidad = 0
+        while self.tipo != FIN:
+            valor = self.valor
+            if valor == "}":
+                if profundidad == 0:
+                    return
+                profundidad -= 1
+                self.avanzar()
+                if profundidad == 0:
+                    return
+                continue
+            self.avanzar()
+            if valor == "{":
+                profundidad += 1
+            elif valor == ";" and profundidad == 0:
+                return
+    
+    def sincronizar_funcion(self):
+        # Descarta el resto de la funcion: hasta el '}' que cierra el primer bloque
+        # abierto despues del error (o un '}' sobrante)
+        profundidad = 0
+        while self.tipo != FIN:
+            valor = self.avanzar()
+            if valor == "{":
+                profundidad += 1
+            elif valor == "}":
+                profundidad -= 1
+                if profundidad <= 0:
+                    return
+    
     def funcion(self):
-        tipo_token = self.coincidir("KEYWORD")
-        tipo = tipo_token[1].lower()
-        nombre_token = self.coincidir("IDENTIFIER")
-        nombre = nombre_token[1]
+        tipo = self.coincidir(KEYWORD).lower()
+        nombre = self.coincidir(IDENTIFIER)
         
-        self.coincidir("DELIMITER", "(")
+        self.coincidir(DELIMITER, "(")
         parametros = self.parametros()
-        self.coincidir("DELIMITER", ")")
-        self.coincidir("DELIMITER", "{")
+        self.coincidir(DELIMITER, ")")
+        self.coincidir(DELIMITER, "{")
         
         cuerpo = self.cuerpo()
         
-        self.coincidir("DELIMITER", "}")
+        try:
+            self.coincidir(DELIMITER, "}")
+        except SyntaxError as error:
+            # Falta el '}' final: se conserva la funcion parcial
+            if not self.recuperar:
+                raise
+            self.registrar_error(error)
         return NodoFuncion(tipo, nombre, parametros, cuerpo)
     
     def parametros(self):
         parametros = []
         
-        if self.obtener_token_actual() and self.obtener_token_actual()[1] != ")":
-            tipo_token = self.coincidir("KEYWORD")
-            tipo = tipo_token[1].lower()
-            nombre_token = self.coincidir("IDENTIFIER")
-            nombre = nombre_token[1]
+        if self.tipo != FIN and self.valor != ")":
+            tipo = self.coincidir(KEYWORD).lower()
+            nombre = self.coincidir(IDENTIFIER)
             
             parametros.append(NodoParametro(tipo, nombre))
             
-            while self.obtener_token_actual() and self.obtener_token_actual()[1] == ",":
-                self.coincidir("DELIMITER")
-                tipo_token = self.coincidir("KEYWORD")
-                tipo = tipo_token[1].lower()
-                nombre_token = self.coincidir("IDENTIFIER")
-                nombre = nombre_token[1]
+            while self.valor == ",":
+                self.coincidir(DELIMITER)
+                tipo = self.coincidir(KEYWORD).lower()
+                nombre = self.coincidir(IDENTIFIER)
                 
                 parametros.append(NodoParametro(tipo, nombre))
                 
@@ -72,297 +206,315 @@ class Parser:
     
     def cuerpo(self):
         instrucciones = []
-        while self.obtener_token_actual() and self.obtener_token_actual()[1] != "}":
-            if self.obtener_token_actual()[1] == "return":
-                instrucciones.append(self.declaracion())
-            elif self.obtener_token_actual()[1] == "while":
-                instrucciones.append(self.ciclo_while())
-            elif self.obtener_token_actual()[1] == "if":
-                instrucciones.append(self.condicional_if())
-            elif self.obtener_token_actual()[1] == "else":
-                instrucciones.append(self.condicional_else())
-            elif self.obtener_token_actual()[1] == "for":
-                instrucciones.append(self.ciclo_for())
-            elif self.obtener_token_actual()[1] == "print":
-                instrucciones.append(self.imprimir())
-            elif self.obtener_token_actual()[1] == "scanf":
-                instrucciones.append(self.leer_entrada())
-                self.coincidir("DELIMITER", ";")
-            elif self.obtener_token_actual()[0] == "IDENTIFIER":
-                siguiente = self.tokens[self.pos + 1] if self.pos + 1 < len(self.tokens) else None
-                if siguiente and siguiente[1] == "(":
-                    instrucciones.append(self.llamada_funcion())
-                    self.coincidir("DELIMITER", ";")
-                elif siguiente and siguiente[0] == "OPERATOR" and siguiente[1] in ("++", "--"):
-                    instruccion = self.incremento()
-                    instrucciones.append(instruccion)
-                    self.coincidir("DELIMITER", ";")
-                else:
-                    nombre = self.coincidir("IDENTIFIER")[1]
-                    self.coincidir("OPERATOR", "=")
-                    expresion = self.expresion()
-                    self.coincidir("DELIMITER", ";")
-                    instrucciones.append(NodoAsignacion(None, nombre, expresion))
-            elif self.obtener_token_actual()[0] == "KEYWORD":
-                tipo_token = self.coincidir("KEYWORD")
-                tipo = tipo_token[1]
-                nombre_token = self.coincidir("IDENTIFIER")
-                nombre = nombre_token[1]
-                
-                if self.obtener_token_actual() and self.obtener_token_actual()[1] == "=":
-                    self.coincidir("OPERATOR", "=")
-                    expresion = self.expresion()
-                    self.coincidir("DELIMITER", ";")
-                    instrucciones.append(NodoAsignacion(tipo, nombre, expresion))
-                else:
-                    self.coincidir("DELIMITER", ";")
-                    instrucciones.append(NodoAsignacion(tipo, nombre, NodoNumero(0)))  # Valor por defecto
-            else:
-                raise SyntaxError(f"Error sintactico: instruccion inesperada {self.obtener_token_actual()}")
-
+        despacho = self.despacho_cuerpo
+        despacho_tipo = self.despacho_cuerpo_tipo
+        while True:
+            valor = self.valor
+            if valor == "}" or valor is None:
+                break
+            try:
+                manejador = despacho.get(valor) or despacho_tipo.get(self.tipo)
+                if manejador is None:
+                    raise SyntaxError(f"Error sintactico: instruccion inesperada {self.obtener_token_actual()}")
+                instrucciones.append(manejador(self))
+            except SyntaxError as error:
+                if not self.recuperar:
+                    raise
+                self.registrar_error(error)
+                self.sincronizar()
+        
         return instrucciones
     
+    def sentencia_scanf(self):
+        instruccion = self.leer_entrada()
+        self.coincidir(DELIMITER, ";")
+        return instruccion
+    
+    def sentencia_identificador(self):
+        siguiente = self.valor_siguiente()
+        if siguiente == "(":
+            instruccion = self.llamada_funcion()
+        elif siguiente in ("++", "--"):
+            instruccion = self.incremento()
+        else:
+            nombre = self.coincidir(IDENTIFIER)
+            self.coincidir(OPERATOR, "=")
+            expresion = self.expresion()
+            instruccion = NodoAsignacion(None, nombre, expresion)
+        self.coincidir(DELIMITER, ";")
+        return instruccion
+    
+    def declaracion_variable(self):
+        tipo = self.coincidir(KEYWORD)
+        nombre = self.coincidir(IDENTIFIER)
+                
+        if self.valor == "=":
+            self.coincidir(OPERATOR, "=")
+            expresion = self.expresion()
+            self.coincidir(DELIMITER, ";")
+            return NodoAsignacion(tipo, nombre, expresion)
+        else:
+            self.coincidir(DELIMITER, ";")
+            # Valor por defecto, del mismo tipo que la variable
+            return NodoAsignacion(tipo, nombre, self.hojas.numero("0.0" if tipo == "float" else 0))
+    
     def leer_entrada(self):
-        self.coincidir("KEYWORD", "scanf")
-        self.coincidir("DELIMITER", "(")
-        formato = self.coincidir("STRING")[1] 
-        self.coincidir("DELIMITER", ",")
+        self.coincidir(KEYWORD, "scanf")
+        self.coincidir(DELIMITER, "(")
+        formato = self.coincidir(STRING)
+        self.coincidir(DELIMITER, ",")
         variables = []
-        while self.obtener_token_actual()[1] != ")":
-            self.coincidir("OPERATOR", "&")
-            var_name = self.coincidir("IDENTIFIER")[1]
-            variables.append(NodoIdentificador(var_name))
-            if self.obtener_token_actual()[1] == ",":
-                self.coincidir("DELIMITER", ",")
-        self.coincidir("DELIMITER", ")")
+        while self.valor != ")":
+            self.coincidir(OPERATOR, "&")
+            var_name = self.coincidir(IDENTIFIER)
+            variables.append(self.hojas.identificador(var_name))
+            if self.valor == ",":
+                self.coincidir(DELIMITER, ",")
+        self.coincidir(DELIMITER, ")")
         return NodoScanf(formato, variables)
     
     def llamada_funcion(self):
-        nombre_token = self.coincidir("IDENTIFIER")
-        nombre = nombre_token[1]
-        self.coincidir("DELIMITER", "(")
+        nombre = self.coincidir(IDENTIFIER)
+        self.coincidir(DELIMITER, "(")
         argumentos =[]
         
-        if self.obtener_token_actual() and self.obtener_token_actual()[1] != ")":
+        if self.tipo != FIN and self.valor != ")":
             argumentos.append(self.expresion())
             
-            while self.obtener_token_actual() and self.obtener_token_actual()[1] == ",":
-                self.coincidir("DELIMITER", ",")
+            while self.valor == ",":
+                self.coincidir(DELIMITER, ",")
                 argumentos.append(self.expresion())
                 
-        self.coincidir("DELIMITER", ")")
+        self.coincidir(DELIMITER, ")")
         
         return NodoLlamadaFuncion(nombre, argumentos)
         
     def asignacion(self):
-        tipo_token = self.coincidir("KEYWORD")
-        tipo = tipo_token[1]
-        nombre_token = self.coincidir("IDENTIFIER")
-        nombre = nombre_token[1]
-        self.coincidir("OPERATOR")
+        tipo = self.coincidir(KEYWORD)
+        nombre = self.coincidir(IDENTIFIER)
+        self.coincidir(OPERATOR)
         expresion = self.expresion()
-        self.coincidir("DELIMITER")
+        self.coincidir(DELIMITER)
         
         return NodoAsignacion(tipo, nombre, expresion)
     
     def declaracion(self):
-        self.coincidir("KEYWORD")
+        self.coincidir(KEYWORD)
         expresion = self.expresion()
-        self.coincidir("DELIMITER")
+        self.coincidir(DELIMITER)
         return NodoRetorno(expresion)
     
-    def expresion(self):
-        izquierda = self.termino()
-        while self.obtener_token_actual() and self.obtener_token_actual()[1] in ('+', '-', '==', '!=', '<', '>', '<=', '>=', '&&', '||'):
-            operador_token = self.coincidir("OPERATOR")
-            operador = operador_token[1]
-            derecha = self.termino()
-            izquierda = NodoOperacion(izquierda, operador, derecha)
-        
-        return izquierda
-    
-    def termino(self):
+    def expresion(self, precedencia_minima=1):
+        # Precedence climbing: cada operador binario se consume en este ciclo y solo
+        # se vuelve a llamar para el lado derecho con una precedencia mayor, asi la
+        # profundidad de recursion depende del numero de niveles, no de terminos
         izquierda = self.factor()
-        
-        while self.obtener_token_actual() and self.obtener_token_actual()[1] in ('*', '/'):
-            operador_token = self.coincidir('OPERATOR')
-            operador = operador_token[1]
-            derecha = self.factor()
+        precedencias = PRECEDENCIA
+        while True:
+            precedencia = precedencias.get(self.valor)
+            if precedencia is None or precedencia < precedencia_minima:
+                return izquierda
+            operador = self.avanzar()
+            derecha = self.expresion(precedencia + 1)
             izquierda = NodoOperacion(izquierda, operador, derecha)
-            
-        return izquierda
         
     def factor(self):
-        token_actual = self.obtener_token_actual()
-        
-        if token_actual[0] == "OPERATOR" and token_actual[1] in ('&', '*', '-', '+'):
-            operador = self.coincidir("OPERATOR")[1]
-            operando = self.factor()
-            return NodoOperacionUnaria(operador, operando)
+        if self.tipo == OPERATOR and self.valor in OPERADORES_UNARIOS:
+            operadores = []
+            while self.tipo == OPERATOR and self.valor in OPERADORES_UNARIOS:
+                operadores.append(self.avanzar())
+            operando = self.primario()
+            for operador in reversed(operadores):
+                operando = NodoOperacionUnaria(operador, operando)
+            return operando
+        return self.primario()
+    
+    def primario(self):
+        tipo = self.tipo
         
-        if token_actual[0] == "NUMBER":
-            token = self.coincidir("NUMBER")
-            return NodoNumero(token[1])
-        elif token_actual[0] == "IDENTIFIER":
-            siguiente = self.tokens[self.pos + 1] if self.pos + 1 < len(self.tokens) else None
-            if siguiente and siguiente[1] == "(":
+        if tipo == NUMBER:
+            return self.hojas.numero(self.avanzar())
+        elif tipo == IDENTIFIER:
+            if self.valor_siguiente() == "(":
                 return self.llamada_funcion()
             else:
-                token = self.coincidir("IDENTIFIER")
-                return NodoIdentificador(token[1])
-        elif token_actual[1] == "(":
-            self.coincidir("DELIMITER", "(")
+                return self.hojas.identificador(self.avanzar())
+        elif self.valor == "(":
+            self.coincidir(DELIMITER, "(")
             expresion = self.expresion()
-            self.coincidir("DELIMITER", ")")
+            self.coincidir(DELIMITER, ")")
             return expresion
         else:
-            raise SyntaxError(f"Error sintactico en factor: token inesperado {token_actual}")
+            raise SyntaxError(f"Error sintactico en factor: token inesperado {self.obtener_token_actual()}")
         
     def incremento(self):
-        nombre_token = self.coincidir("IDENTIFIER")
-        nombre = nombre_token[1]
-        operador_token = self.coincidir("OPERATOR")
-        operador = operador_token[1]
+        nombre = self.coincidir(IDENTIFIER)
+        operador = self.coincidir(OPERATOR)
         
         if operador == "++":
-            expresion = NodoOperacion(NodoIdentificador(nombre), '+', NodoNumero(1))
+            expresion = NodoOperacion(self.hojas.identificador(nombre), '+', self.hojas.numero(1))
         elif operador == "--":
-            expresion = NodoOperacion(NodoIdentificador(nombre), '-', NodoNumero(1))
+            expresion = NodoOperacion(self.hojas.identificador(nombre), '-', self.hojas.numero(1))
         else:
             raise SyntaxError(f"Operador de incremento inválido: {operador}")
         
         return NodoAsignacion(None, nombre, expresion)
     
     def instruccion_unica(self):
-        token_actual = self.obtener_token_actual()
-        if not token_actual:
+        if self.tipo == FIN:
             raise SyntaxError("Error sintactico: se esperaba una instruccion")
         
-        if token_actual[0] == "KEYWORD":
-            if token_actual[1] == "return":
-                return self.declaracion()
-            elif token_actual[1] == "while":
-                return self.ciclo_while()
-            elif token_actual[1] == "if":
-                return self.condicional_if()
-            elif token_actual[1] == "else":
-                return self.condicional_else()
-            elif token_actual[1] == "for":
-                return self.ciclo_for()
-            elif token_actual[1] == "print":
-                return self.imprimir()
-            else:
-                return self.asignacion()
-        elif token_actual[0] == "IDENTIFIER":
-            siguiente = self.tokens[self.pos + 1] if self.pos + 1 < len(self.tokens) else None
-            if siguiente and siguiente[1] == "(":
-                instruccion = self.llamada_funcion()
-                self.coincidir("DELIMITER")
-                return instruccion
-            else:
-                return self.asignacion()
+        manejador = self.despacho_unica.get(self.valor) or self.despacho_unica_tipo.get(self.tipo)
+        if manejador is None:
+            raise SyntaxError(f"Error sintactico: instruccion inesperada {self.obtener_token_actual()}")
+        return manejador(self)
+    
+    def instruccion_identificador(self):
+        if self.valor_siguiente() == "(":
+            instruccion = self.llamada_funcion()
+            self.coincidir(DELIMITER)
+            return instruccion
         else:
-            raise SyntaxError(f"Error sintactico: instruccion inesperada {token_actual}")
+            return self.asignacion()
             
     
     def ciclo_while(self):
-        self.coincidir("KEYWORD")
-        self.coincidir("DELIMITER")
+        self.coincidir(KEYWORD)
+        self.coincidir(DELIMITER)
         condicion = self.expresion()
-        self.coincidir("DELIMITER")
+        self.coincidir(DELIMITER)
         
         cuerpo = []
-        if self.obtener_token_actual() and self.obtener_token_actual()[1] == "{":
-            self.coincidir("DELIMITER")
+        if self.valor == "{":
+            self.coincidir(DELIMITER)
             cuerpo = self.cuerpo()
-            self.coincidir("DELIMITER")
+            self.coincidir(DELIMITER)
         else:
             cuerpo.append(self.instruccion_unica())
         
         return NodoWhile(condicion, cuerpo)
     
     def ciclo_for(self):
-        self.coincidir("KEYWORD")
-        self.coincidir("DELIMITER")
+        self.coincidir(KEYWORD)
+        self.coincidir(DELIMITER)
         
-        if self.obtener_token_actual()[0] == "KEYWORD":
+        if self.tipo == KEYWORD:
             inicializacion = self.asignacion()
         else:
-            nombre_token = self.coincidir("IDENTIFIER")
-            nombre = nombre_token[1]
-            self.coincidir("OPERATOR")
+            nombre = self.coincidir(IDENTIFIER)
+            self.coincidir(OPERATOR)
             expresion = self.expresion()
-            self.coincidir("DELIMITER")
+            self.coincidir(DELIMITER)
             inicializacion = NodoAsignacion(None, nombre, expresion)
             
         condicion = self.expresion()
-        self.coincidir("DELIMITER")
+        self.coincidir(DELIMITER)
         
         incremento = self.incremento()
-        self.coincidir("DELIMITER")
+        self.coincidir(DELIMITER)
         
         cuerpo = []
-        if self.obtener_token_actual() and self.obtener_token_actual()[1] == "{":
-            self.coincidir("DELIMITER")
+        if self.valor == "{":
+            self.coincidir(DELIMITER)
             cuerpo = self.cuerpo()
-            self.coincidir("DELIMITER")
+            self.coincidir(DELIMITER)
         else:
             cuerpo.append(self.instruccion_unica())
             
         return NodoFor(inicializacion, condicion, incremento, cuerpo)
     
     def condicional_if(self):
-        self.coincidir("KEYWORD")
-        self.coincidir("DELIMITER")
+        self.coincidir(KEYWORD)
+        self.coincidir(DELIMITER)
         condicion = self.expresion()
-        self.coincidir("DELIMITER")
+        self.coincidir(DELIMITER)
         
         cuerpo = []
-        if self.obtener_token_actual() and self.obtener_token_actual()[1] == "{":
-            self.coincidir("DELIMITER")
+        if self.valor == "{":
+            self.coincidir(DELIMITER)
             cuerpo = self.cuerpo()
-            self.coincidir("DELIMITER")
+            self.coincidir(DELIMITER)
         else:
             cuerpo.append(self.instruccion_unica())
             
         cuerpo_else = []
-        if self.obtener_token_actual() and self.obtener_token_actual()[1] == "else":
-            self.coincidir("KEYWORD")
-            if self.obtener_token_actual() and self.obtener_token_actual()[1] == "{":
-                self.coincidir("DELIMITER")
+        if self.valor == "else":
+            self.coincidir(KEYWORD)
+            if self.valor == "{":
+                self.coincidir(DELIMITER)
                 cuerpo_else = self.cuerpo()
-                self.coincidir("DELIMITER")
+                self.coincidir(DELIMITER)
             else:
                 cuerpo_else.append(self.instruccion_unica())
                 
         return NodoIf(condicion, cuerpo, cuerpo_else)
     
     def condicional_else(self):
-        self.coincidir("KEYWORD")
+        self.coincidir(KEYWORD)
         
         cuerpo = []
-        if self.obtener_token_actual() and self.obtener_token_actual()[1] == "{":
-            self.coincidir("DELIMITER")
+        if self.valor == "{":
+            self.coincidir(DELIMITER)
             cuerpo = self.cuerpo()
-            self.coincidir("DELIMITER")
+            self.coincidir(DELIMITER)
         else:
             cuerpo.append(self.instruccion_unica())
             
         return NodoElse(cuerpo)
     
     def imprimir(self):
-        self.coincidir("KEYWORD")
-        self.coincidir("DELIMITER", "(")
+        self.coincidir(KEYWORD)
+        self.coincidir(DELIMITER, "(")
         
-        token_actual = self.obtener_token_actual()
-        if token_actual[0] == "STRING":
-            token = self.coincidir("STRING")
-            expresion = NodoString(token[1])
+        if self.tipo == STRING:
+            expresion = self.hojas.string(self.coincidir(STRING))
         else:
             expresion = self.expresion()
 
-        self.coincidir("DELIMITER", ")")
-        self.coincidir("DELIMITER", ";")
+        self.coincidir(DELIMITER, ")")
+        self.coincidir(DELIMITER, ";")
         
         return NodoPrint(expresion)
-    
\ No newline at end of file
+    
+    
+    # Tablas de despacho: palabra clave -> metodo, y tipo de token -> metodo cuando
+    # el valor no es una palabra clave con manejador propio. Se construyen una vez
+    # al definir la clase y se invocan como manejador(self)
+    despacho_cuerpo = {
+        "return": declaracion,
+        "while": ciclo_while,
+        "if": condicional_if,
+        "else": condicional_else,
+        "for": ciclo_for,
+        "print": imprimir,
+        "scanf": sentencia_scanf,
+    }
+    despacho_cuerpo_tipo = {
+        IDENTIFIER: sentencia_identificador,
+        KEYWORD: declaracion_variable,
+    }
+    despacho_unica = {
+        "return": declaracion,
+        "while": ciclo_while,
+        "if": condicional_if,
+        "else": condicional_else,
+        "for": ciclo_for,
+        "print": imprimir,
+    }
+    despacho_unica_tipo = {
+        IDENTIFIER: instruccion_identificador,
+        KEYWORD: asignacion,
+    }
+
+
+def parsear_texto(fuente):
+    # AST de un programa completo; el primer error sintactico se lanza
+    return Parser(BufferTokens.desde_texto(fuente)).parsear()
+
+
+def validar(fuente):
+    # Analiza un programa completo en modo de recuperacion y devuelve el AST
+    # parcial junto con todos los errores sintacticos encontrados
+    parser = Parser(BufferTokens.desde_texto(fuente), recuperar=True)
+    programa = parser.parsear()
+    return programa, parser.errores
@@ -0,0 +1,120 @@
+from nodes import *
+
+# Seleccion multiple. Una cadena if (x == c1) ... else if (x == c2) ... sobre
+# la misma variable y con constantes enteras se despacha de una vez en lugar
+# de comparar caso por caso: con una tabla de saltos si los valores son
+# densos, o con un arbol de busqueda binaria si estan dispersos. Los dos
+# generadores detectan la cadena con cadena_de_casos() y emiten el despacho
+# con lineas_de_despacho()
+
+MINIMO_CASOS = 4
+# Proporcion minima de casos sobre el rango de valores para usar tabla, y
+# cuantos casos se comparan uno a uno en las hojas del arbol
+DENSIDAD_TABLA = 0.4
+MAXIMO_LINEAL = 3
+
+
+class CadenaCasos:
+    __slots__ = ("variable", "casos", "defecto")
+    
+    def __init__(self, variable, casos, defecto):
+        # variable: el NodoIdentificador comparado; casos: (valor, cuerpo) en
+        # el orden del programa sin valores repetidos; defecto: el ultimo else
+        self.variable = variable
+        self.casos = casos
+        self.defecto = defecto
+
+
+def _caso(condicion):
+    # (identificador, valor) si la condicion es x == c o c == x
+    if not isinstance(condicion, NodoOperacion) or condicion.operador != "==":
+        return None
+    for variable, constante in ((condicion.izquierda, condicion.derecha), (condicion.derecha, condicion.izquierda)):
+        if (isinstance(variable, NodoIdentificador) and isinstance(constante, NodoNumero)
+                and type(constante.numero) is int and -2**31 <= constante.numero < 2**31):
+            return variable, constante.numero
+    return None
+
+
+def cadena_de_casos(nodo):
+    # CadenaCasos para un NodoIf que empieza una cadena de al menos
+    # MINIMO_CASOS comparaciones; None si no lo es
+    variable = None
+    casos = []
+    vistos = set()
+    actual = nodo
+    while True:
+        caso = _caso(actual.condicion)
+        if caso is None or (variable is not None and caso[0].nombre != variable.nombre):
+            defecto = (actual,)
+            break
+        if variable is None:
+            variable = caso[0]
+        # Un valor repetido nunca llega a su segundo caso
+        if caso[1] not in vistos:
+            vistos.add(caso[1])
+            casos.append((caso[1], actual.cuerpo))
+        resto = actual.cuerpo_else
+        if len(resto) == 1 and isinstance(resto[0], NodoIf):
+            actual = resto[0]
+        else:
+            defecto = resto
+            break
+    if len(casos) < MINIMO_CASOS:
+        return None
+    return CadenaCasos(variable, casos, defecto)
+
+
+def es_densa(valores):
+    rango = max(valores) - min(valores) + 1
+    return len(valores) >= DENSIDAD_TABLA * rango
+
+
+def lineas_de_despacho(registro, casos, defecto, nueva_etiqueta, auxiliar="rcx"):
+    # Lineas que saltan a la etiqueta del caso cuyo valor tiene 'registro', o
+    # a 'defecto'. 'casos' es una lista de (valor, etiqueta); el registro se
+    # puede modificar y 'auxiliar' se usa para la direccion de la tabla
+    casos = sorted(casos)
+    if es_densa([valor for valor, _ in casos]):
+        return _tabla(registro, casos, defecto, nueva_etiqueta(), auxiliar)
+    lineas = []
+    _arbol(registro, casos, defecto, nueva_etiqueta, lineas)
+    return lineas
+
+
+def _tabla(registro, casos, defecto, tabla, auxiliar):
+    # Se resta el minimo y una sola comparacion sin signo descarta tanto lo
+    # que queda por debajo como lo que queda por encima del rango. La tabla
+    # va en el codigo, despues del salto, para que la etiqueta y sus destinos
+    # queden juntos
+    minimo, maximo = casos[0][0], casos[-1][0]
+    por_valor = dict(casos)
+    lineas = []
+    if minimo < 0 and -minimo < 2**31:
+        lineas.append(f"    add {registro}, {-minimo}")
+    elif minimo != 0:
+        lineas.append(f"    sub {registro}, {minimo}")
+    lineas.extend([
+        f"    cmp {registro}, {maximo - minimo}",
+        f"    ja {defecto}",
+        f"    lea {auxiliar}, [{tabla}]",
+        f"    jmp [{auxiliar} + {registro}*8]",
+        f"{tabla}:",
+    ])
+    lineas.extend(f"    dq {por_valor.get(valor, defecto)}" for valor in range(minimo, maximo + 1))
+    return lineas
+
+
+def _arbol(registro, casos, defecto, nueva_etiqueta, lineas):
+    if len(casos) <= MAXIMO_LINEAL:
+        for valor, etiqueta in casos:
+            lineas.extend([f"    cmp {registro}, {valor}", f"    je {etiqueta}"])
+        lineas.append(f"    jmp {defecto}")
+        return
+    medio = len(casos) // 2
+    valor, etiqueta = casos[medio]
+    menores = nueva_etiqueta()
+    lineas.extend([f"    cmp {registro}, {valor}", f"    je {etiqueta}", f"    jl {menores}"])
+    _arbol(registro, casos[medio + 1:], defecto, nueva_etiqueta, lineas)
+    lineas.append(f"{menores}:")
+    _arbol(registro, casos[:medio], defecto, nueva_etiqueta, lineas)
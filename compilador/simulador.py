@@ -0,0 +1,160 @@
+# Simulador del ensamblador generado. No hay NASM ni Windows para ejecutar el
+# programa de verdad, asi que se interpreta el subconjunto de x86-64 que
+# emiten GeneradorEnsamblador y GeneradorIR. Lo usan los benchmarks, que miden
+# el tiempo de ejecucion en instrucciones ejecutadas, y las pruebas, que
+# comparan la salida impresa
+
+REGISTROS = ("rax", "rbx", "rcx", "rdx", "rsi", "rdi", "rsp", "rbp", "r8", "r9", "r10", "r11", "r12", "r13", "r14", "r15")
+FORMATOS = {"fmt_str_d": "%d", "fmt_str_s": "%s", "fmt_newline": "\n", "fmt_scanf_int": "%d", "fmt_scanf_str": "%s"}
+SALTOS = {
+    "je": lambda a, b: a == b, "jz": lambda a, b: a == b,
+    "jne": lambda a, b: a != b, "jnz": lambda a, b: a != b,
+    "jl": lambda a, b: a < b, "jg": lambda a, b: a > b,
+    "jle": lambda a, b: a <= b, "jge": lambda a, b: a >= b,
+    "ja": lambda a, b: a % (1 << 64) > b % (1 << 64), "jbe": lambda a, b: a % (1 << 64) <= b % (1 << 64),
+    "jmp": lambda a, b: True,
+}
+ARITMETICA = {
+    "add": lambda a, b: a + b, "sub": lambda a, b: a - b, "imul": lambda a, b: a * b,
+    "and": lambda a, b: a & b, "or": lambda a, b: a | b, "xor": lambda a, b: a ^ b,
+    "shl": lambda a, b: a << b, "sar": lambda a, b: a >> b,
+    "shr": lambda a, b: (a & ((1 << 64) - 1)) >> b,
+}
+# setcc lee las banderas como el salto condicional equivalente
+ASIGNACIONES = {"sete": "je", "setne": "jne", "setl": "jl", "setg": "jg", "setle": "jle", "setge": "jge"}
+# Latencias aproximadas para estimar ciclos; el resto de las instrucciones cuenta 1,
+# mas ACCESO_MEMORIA por cada lectura de memoria (un acierto en L1)
+LATENCIAS = {"imul": 3, "idiv": 40}
+ACCESO_MEMORIA = 3
+
+
+def _a_64(valor):
+    valor &= (1 << 64) - 1
+    return valor - (1 << 64) if valor >= 1 << 63 else valor
+
+
+def simular(generador, entrada=(), limite=100_000_000):
+    # Devuelve (salida impresa, instrucciones ejecutadas, ciclos estimados)
+    etiquetas = {}
+    programa = []
+    for linea in generador.codigo:
+        texto = linea.strip()
+        if not texto or texto.split()[0] in ("global", "section", "extern", "default"):
+            continue
+        if texto.endswith(":"):
+            etiquetas[texto[:-1]] = len(programa)
+            continue
+        operacion, _, resto = texto.partition(" ")
+        # El tamano explicito (mov qword [x], 5) no cambia nada en el simulador
+        programa.append((operacion, [operando.strip().removeprefix("qword ") for operando in resto.split(",")] if resto else []))
+    textos = dict(FORMATOS, **generador.cadenas.por_id)
+    
+    ciclos = 0
+    registros = dict.fromkeys(REGISTROS, 0)
+    registros["rsp"] = 1 << 20
+    memoria = {}
+    entrada = iter(entrada)
+    salida = []
+    banderas = (0, 0)
+    
+    def direccion(operando):
+        interior = operando[1:-1].replace(" ", "")
+        for signo in ("-", "+"):
+            base, separador, desplazamiento = interior.partition(signo)
+            if separador and base in registros:
+                return registros[base] + (int(desplazamiento) if signo == "+" else -int(desplazamiento))
+        return interior
+    
+    def leer(operando):
+        nonlocal ciclos
+        if operando in registros:
+            return registros[operando]
+        if operando.startswith("["):
+            ciclos += ACCESO_MEMORIA
+            return memoria.get(direccion(operando), 0)
+        return int(operando)
+    
+    def escribir(operando, valor):
+        if operando in registros:
+            registros[operando] = valor
+        else:
+            memoria[direccion(operando)] = valor
+    
+    def apilar(valor):
+        registros["rsp"] -= 8
+        memoria[registros["rsp"]] = valor
+    
+    def desapilar():
+        nonlocal ciclos
+        ciclos += ACCESO_MEMORIA
+        valor = memoria.get(registros["rsp"], 0)
+        registros["rsp"] += 8
+        return valor
+    
+    ip = etiquetas["main"]
+    ejecutadas = 0
+    while ejecutadas < limite:
+        operacion, operandos = programa[ip]
+        ip += 1
+        ejecutadas += 1
+        ciclos += LATENCIAS.get(operacion, 1)
+        if operacion == "mov":
+            escribir(operandos[0], leer(operandos[1]))
+        elif operacion == "xor" and operandos[0] == operandos[1]:
+            # Puede limpiar un registro que tenia una direccion
+            escribir(operandos[0], 0)
+        elif operacion in ARITMETICA:
+            # imul tiene tambien la forma de tres operandos: destino, fuente, inmediato
+            fuentes = operandos[1:] if len(operandos) == 3 else operandos
+            escribir(operandos[0], _a_64(ARITMETICA[operacion](leer(fuentes[0]), leer(fuentes[1]))))
+        elif operacion == "neg":
+            escribir(operandos[0], _a_64(-leer(operandos[0])))
+        elif operacion in ASIGNACIONES:
+            # Solo se usa con al, seguido de movzx rax, al
+            registros["rax"] = int(SALTOS[ASIGNACIONES[operacion]](*banderas))
+        elif operacion == "movzx":
+            pass
+        elif operacion == "push":
+            apilar(leer(operandos[0]))
+        elif operacion == "pop":
+            escribir(operandos[0], desapilar())
+        elif operacion == "cmp":
+            banderas = (leer(operandos[0]), leer(operandos[1]))
+        elif operacion == "test":
+            banderas = (leer(operandos[0]) & leer(operandos[1]), 0)
+        elif operacion == "jmp" and operandos[0].startswith("["):
+            # Tabla de saltos: jmp [tabla + indice*8], con la direccion de la
+            # tabla en el registro base y una linea dq por entrada
+            base, _, indice = operandos[0][1:-1].replace(" ", "").partition("+")
+            ciclos += ACCESO_MEMORIA
+            ip = etiquetas[programa[etiquetas[registros[base]] + registros[indice.removesuffix("*8")]][1][0]]
+        elif operacion in SALTOS:
+            if SALTOS[operacion](*banderas):
+                ip = etiquetas[operandos[0]]
+        elif operacion == "lea":
+            escribir(operandos[0], direccion(operandos[1]))
+        elif operacion == "cqo":
+            registros["rdx"] = -1 if registros["rax"] < 0 else 0
+        elif operacion == "idiv":
+            divisor = leer(operandos[0])
+            cociente = abs(registros["rax"]) // abs(divisor)
+            if (registros["rax"] < 0) != (divisor < 0):
+                cociente = -cociente
+            registros["rax"], registros["rdx"] = cociente, registros["rax"] - cociente * divisor
+        elif operacion == "call":
+            destino = operandos[0]
+            if destino == "printf":
+                formato = textos[registros["rcx"]]
+                salida.append(formato.replace("%d", str(registros["rdx"])).replace("%s", str(textos.get(registros["rdx"], ""))))
+            elif destino == "scanf":
+                memoria[registros["rdx"]] = int(next(entrada))
+            elif destino == "ExitProcess":
+                break
+            else:
+                apilar(ip)
+                ip = etiquetas[destino]
+        elif operacion == "ret":
+            ip = desapilar()
+        else:
+            raise ValueError(f"Instruccion no soportada por el simulador: {operacion}")
+    return "".join(salida), ejecutadas, ciclos
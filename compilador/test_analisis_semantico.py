@@ -0,0 +1,54 @@
+# Analisis semantico de programas completos
+import unittest
+
+from analisis_semantico import AnalizadorSemantico
+from parsear import parsear_texto
+
+
+def analizar(fuente):
+    AnalizadorSemantico().analizar(parsear_texto(fuente))
+
+
+class PruebaProgramasValidos(unittest.TestCase):
+    def test_programas(self):
+        programas = {
+            "dos for con la misma variable": (
+                "int main() { int s = 0; for (int i = 0; i < 3; i++) { s = s + i; } "
+                "for (int i = 0; i < 3; i++) { s = s + i; } return 0; }"
+            ),
+            "la misma variable en if y else": (
+                "int main() { int x = 1; if (x > 0) { int t = 1; print(t); } else { int t = 2; print(t); } return 0; }"
+            ),
+            "la misma variable en dos while": (
+                "int main() { int x = 1; while (x < 3) { int t = x; x = x + t; } "
+                "while (x < 9) { int t = x; x = x + t; } return 0; }"
+            ),
+            "float sin valor inicial": "int main() { float y; return 0; }",
+            "llamada a una funcion definida despues": "int main() { print(g(1)); return 0; } int g(int a) { return a; }",
+            "recursion": "int f(int n) { if (n < 1) { return 0; } return f(n - 1); } int main() { print(f(3)); return 0; }",
+        }
+        for nombre, fuente in programas.items():
+            with self.subTest(nombre):
+                analizar(fuente)
+
+
+class PruebaProgramasInvalidos(unittest.TestCase):
+    def test_programas(self):
+        programas = {
+            "variable repetida en el mismo ambito": ("int main() { int x = 1; int x = 2; return 0; }", "'x' ya ha sido declarada"),
+            "variable fuera de su if": ("int main() { if (1) { int t = 1; } print(t); return 0; }", "'t' no a sido declarada"),
+            "variable fuera de su for": (
+                "int main() { for (int i = 0; i < 3; i++) { print(i); } print(i); return 0; }",
+                "'i' no a sido declarada",
+            ),
+            "funcion repetida": ("int main() { return 0; } int main() { return 0; }", "'main' ya a sido declarada"),
+            "funcion que no existe": ("int main() { print(g(1)); return 0; }", "'g' no declarada"),
+        }
+        for nombre, (fuente, mensaje) in programas.items():
+            with self.subTest(nombre):
+                with self.assertRaisesRegex(Exception, mensaje):
+                    analizar(fuente)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+# Ida y vuelta del AST binario contra to_dict()
+import os
+import tempfile
+import unittest
+
+import ast_binario
+from parsear import parsear_texto
+
+PROGRAMAS = {
+    "vacio": "int main() { return 0; }",
+    "expresiones": "int main() { int x = 3; int y = -x * (x + 2) / 4 - 7; print(y == 1 && x < 2 || !y); return y; }",
+    "control": (
+        "int f(int a, int b) { if (a > b) { return a; } else if (a == b) { print(a); } else { a = b; } return a; } "
+        "int main() { int s = 0; for (int i = 0; i < 10; i++) { s = s + f(i, 4); } while (s > 3) { s = s - 2; } print(s); return 0; }"
+    ),
+    "cadenas": 'int main() { int n = 0; scanf("%d", &n); print("hola\\n"); print("hola\\n"); print(n); return 0; }',
+    "argumentos": "int g(int a, int b, int c, int d, int e, int f) { return a + b + c + d + e + f; } int main() { print(g(1, 2, 3, 4, 5, 6)); return 0; }",
+}
+
+
+class PruebaAstBinario(unittest.TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.directorio.name, "ast.astb")
+    
+    def tearDown(self):
+        self.directorio.cleanup()
+    
+    def test_programa_completo(self):
+        for nombre, fuente in PROGRAMAS.items():
+            with self.subTest(nombre):
+                programa = parsear_texto(fuente)
+                ast_binario.guardar_ast_binario(programa, self.ruta)
+                self.assertEqual(ast_binario.cargar_ast_binario(self.ruta).to_dict(), programa.to_dict())
+    
+    def test_funcion_sola(self):
+        for nombre, fuente in PROGRAMAS.items():
+            programa = parsear_texto(fuente)
+            ast_binario.guardar_ast_binario(programa, self.ruta)
+            with ast_binario.abrir_ast_binario(self.ruta) as archivo:
+                self.assertEqual(archivo.nombres_funciones(), [funcion.nombre for funcion in programa.funciones])
+                for funcion in programa.funciones:
+                    with self.subTest(nombre, funcion=funcion.nombre):
+                        self.assertEqual(archivo.funcion(funcion.nombre).to_dict(), funcion.to_dict())
+    
+    def test_funcion_que_no_existe(self):
+        ast_binario.guardar_ast_binario(parsear_texto(PROGRAMAS["control"]), self.ruta)
+        with ast_binario.abrir_ast_binario(self.ruta) as archivo:
+            with self.assertRaises(KeyError):
+                archivo.funcion("g")
+    
+    def test_archivo_que_no_es_ast(self):
+        with open(self.ruta, "wb") as archivo:
+            archivo.write(b"no es un ast binario, solo texto")
+        with self.assertRaises(ValueError):
+            ast_binario.cargar_ast_binario(self.ruta)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+# Tabla de cadenas literales y sus lineas db
+import unittest
+
+from cadenas import TablaCadenas, bytes_de, identificador, operandos_db
+
+
+class PruebaEscapes(unittest.TestCase):
+    def test_bytes_de(self):
+        self.assertEqual(bytes_de('a\\nb\\t\\"c\\"\\\\'), b'a\nb\t"c"\\')
+        # Una barra que no empieza un escape conocido queda como esta
+        self.assertEqual(bytes_de("\\q"), b"\\q")
+        self.assertEqual(bytes_de("año"), "año".encode("utf-8"))
+    
+    def test_operandos_db(self):
+        self.assertEqual(operandos_db(b"hola\0"), '"hola", 0')
+        self.assertEqual(operandos_db(b'di "si"\n\0'), '"di ", 34, "si", 34, 10, 0')
+        self.assertEqual(operandos_db("ñ!".encode("utf-8")), '195, 177, "!"')
+        self.assertEqual(operandos_db(b""), "")
+
+
+class PruebaTabla(unittest.TestCase):
+    def test_identificadores(self):
+        tabla = TablaCadenas()
+        hola = tabla.agregar("hola")
+        self.assertEqual(hola, identificador("hola"))
+        self.assertEqual(tabla.agregar("hola"), hola)
+        # Mismos bytes escritos de dos formas
+        self.assertEqual(tabla.agregar("a\\tb"), tabla.agregar("a\tb"))
+        self.assertEqual(len(tabla), 2)
+        self.assertTrue(TablaCadenas("texto").agregar("hola").startswith("texto_"))
+    
+    def test_lineas_con_escapes(self):
+        tabla = TablaCadenas()
+        str_id = tabla.agregar('Valor: \\"%d\\"\\n')
+        self.assertEqual(tabla.lineas(), [f'{str_id} db "Valor: ", 34, "%d", 34, 10, 0'])
+    
+    def test_sufijos(self):
+        # Una cadena que es el final de otra es una etiqueta dentro de ella
+        tabla = TablaCadenas()
+        mundo = tabla.agregar("mundo\\n")
+        saludo = tabla.agregar("Hola mundo\\n")
+        salto = tabla.agregar("\\n")
+        otra = tabla.agregar("otra")
+        self.assertEqual(tabla.lineas(), [
+            f'{saludo} db "Hola "',
+            f'{mundo} db "mundo"',
+            f"{salto} db 10, 0",
+            f'{otra} db "otra", 0',
+        ])
+    
+    def test_unir(self):
+        primera, segunda = TablaCadenas(), TablaCadenas()
+        comun = primera.agregar("comun")
+        primera.agregar("solo en la primera")
+        self.assertEqual(segunda.agregar("comun"), comun)
+        segunda.agregar("solo en la segunda")
+        primera.unir(segunda)
+        self.assertEqual(len(primera), 3)
+        self.assertEqual(primera.agregar("solo en la segunda"), segunda.agregar("solo en la segunda"))
+        self.assertEqual(sum(linea.startswith(comun) for linea in primera.lineas()), 1)
+    
+    def test_choque_de_identificadores(self):
+        primera, segunda = TablaCadenas(), TablaCadenas()
+        str_id = primera.agregar("uno")
+        segunda.por_id[str_id] = "dos"
+        with self.assertRaisesRegex(Exception, "tienen el mismo identificador"):
+            primera.unir(segunda)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+# Codigo intermedio y su traduccion con GeneradorIR
+import unittest
+
+from codigo_intermedio import construir_ir
+from generadorIR import GeneradorIR
+from parsear import parsear_texto
+from simulador import simular
+
+
+def ejecutar(fuente, entrada=()):
+    generador = GeneradorIR()
+    generador.generar(construir_ir(parsear_texto(fuente)))
+    return simular(generador, entrada)[0]
+
+
+class PruebaOperacionesUnarias(unittest.TestCase):
+    def test_negacion_logica(self):
+        fuente = "int main() { int x = 5; int y = 0; print(!x); print(!y); print(!(x - 5)); return 0; }"
+        self.assertEqual(ejecutar(fuente), "011")
+    
+    def test_menos_y_mas(self):
+        self.assertEqual(ejecutar("int main() { int x = 5; print(-x + 8); print(+x); return 0; }"), "35")
+    
+    def test_direcciones_no_soportadas(self):
+        for operador in ("&", "*"):
+            with self.subTest(operador):
+                with self.assertRaisesRegex(Exception, f"Operador unario '\\{operador}' no soportado"):
+                    construir_ir(parsear_texto(f"int main() {{ int x = 5; int y = {operador}x; return 0; }}"))
+
+
+class PruebaEtiquetas(unittest.TestCase):
+    def test_funcion_con_nombre_de_bloque(self):
+        # Las etiquetas de bloque de foo no pueden chocar con una funcion foo_B1
+        fuente = (
+            "int foo(int a) { if (a > 1) { return 3; } return 2; } "
+            "int foo_B1(int a) { if (a > 1) { return 4; } return 3; } "
+            "int main() { print(foo(5)); print(foo_B1(0)); print(foo_B1(9)); return 0; }"
+        )
+        self.assertEqual(ejecutar(fuente), "334")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+# Generador directo del AST a ensamblador
+import unittest
+
+from generadorEnsamblador import GeneradorEnsamblador
+from nodes import *
+from parsear import parsear_texto
+from simulador import simular
+
+
+def ejecutar(programa, entrada=()):
+    # Salida con y sin asignacion de registros; las dos tienen que coincidir
+    salidas = []
+    for asignar_registros in (True, False):
+        generador = GeneradorEnsamblador(asignar_registros)
+        generador.generar(programa)
+        salidas.append(simular(generador, entrada)[0])
+    return salidas
+
+
+class PruebaOperacionesUnarias(unittest.TestCase):
+    def test_menos_y_negacion_logica(self):
+        programa = parsear_texto('int main() { int x = 0; scanf("%d", &x); print(!x); print(-x); print(!(x - 5)); print(+x); return 0; }')
+        self.assertEqual(ejecutar(programa, [5]), ["0-515"] * 2)
+    
+    def test_direcciones_no_soportadas(self):
+        programa = parsear_texto("int main() { int x = 5; int y = *x; return 0; }")
+        with self.assertRaisesRegex(Exception, "Operador unario '\\*' no soportado"):
+            GeneradorEnsamblador().generar(programa)
+
+
+class PruebaParametros(unittest.TestCase):
+    def test_parametros_en_pila(self):
+        # Del quinto parametro en adelante llegan por la pila
+        programa = parsear_texto(
+            "int g(int a, int b, int c, int d, int e, int f) { return a * 100000 + b * 10000 + c * 1000 + d * 100 + e * 10 + f; } "
+            "int main() { print(g(1, 2, 3, 4, 5, 6)); return 0; }"
+        )
+        self.assertEqual(ejecutar(programa), ["123456"] * 2)
+
+
+class PruebaNodos(unittest.TestCase):
+    def test_incremento(self):
+        # El parser no produce NodoIncremento, pero puede venir de un AST en JSON
+        cuerpo = [
+            NodoAsignacion("int", "x", NodoNumero("4")),
+            NodoIncremento("x", "++"),
+            NodoIncremento("x", "++"),
+            NodoIncremento("x", "--"),
+            NodoPrint(NodoIdentificador("x")),
+            NodoRetorno(NodoNumero("0")),
+        ]
+        self.assertEqual(ejecutar(NodoPrograma([NodoFuncion("int", "main", [], cuerpo)])), ["5"] * 2)
+    
+    def test_nodo_desconocido(self):
+        programa = NodoPrograma([NodoFuncion("int", "main", [], [NodoElse([])])])
+        with self.assertRaisesRegex(Exception, "no sabe traducir NodoElse"):
+            GeneradorEnsamblador().generar(programa)
+
+
+if __name__ == "__main__":
+    unittest.main()
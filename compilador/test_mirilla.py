@@ -0,0 +1,154 @@
+# Reglas del optimizador de mirilla, cada una por separado
+import unittest
+
+from codigo_intermedio import construir_ir
+from generadorEnsamblador import GeneradorEnsamblador
+from generadorIR import GeneradorIR
+from mirilla import OptimizadorMirilla, contar_instrucciones, optimizar_mirilla
+from parsear import parsear_texto
+from simulador import simular
+
+
+def aplicar(regla, codigo):
+    # Codigo optimizado con una sola regla y cuantas veces se aplico
+    optimizado, reporte = optimizar_mirilla(codigo, {regla})
+    return optimizado, reporte.aplicaciones[regla]
+
+
+class PruebaReglas(unittest.TestCase):
+    def test_se_aplican(self):
+        casos = {
+            "mov redundante": (
+                ["f:", "    mov rax, rax", "    ret"],
+                ["f:", "    ret"],
+            ),
+            "guardar y recargar": (
+                ["    mov [rbp - 8], rax", "    mov rax, [rbp - 8]", "    ret"],
+                ["    mov [rbp - 8], rax", "    ret"],
+            ),
+            "push y pop": (
+                ["    push rax", "    pop rcx", "    ret"],
+                ["    mov rcx, rax", "    ret"],
+            ),
+            "copia directa": (
+                ["    mov rax, 5", "    mov [rbp - 8], rax", "    mov rax, 0", "    ret"],
+                ["    mov qword [rbp - 8], 5", "    mov rax, 0", "    ret"],
+            ),
+            "comparacion en el origen": (
+                ["    mov rax, [rbp - 8]", "    cmp rax, 3", "    mov rax, 0", "    ret"],
+                ["    cmp qword [rbp - 8], 3", "    mov rax, 0", "    ret"],
+            ),
+            "operacion en el lugar": (
+                ["    mov rax, [rbp - 8]", "    add rax, 1", "    mov [rbp - 8], rax", "    mov rax, 0", "    ret"],
+                ["    add qword [rbp - 8], 1", "    mov rax, 0", "    ret"],
+            ),
+            "escritura muerta": (
+                ["    mov rcx, 5", "    mov rax, 0", "    ret"],
+                ["    mov rax, 0", "    ret"],
+            ),
+            "salto a la siguiente linea": (
+                ["    jmp f.1", "f.1:", "    ret"],
+                ["f.1:", "    ret"],
+            ),
+            "salto sobre salto": (
+                ["    cmp rax, 0", "    je f.1", "    jmp f.2", "f.1:", "    mov rax, 1", "f.2:", "    ret"],
+                ["    cmp rax, 0", "    jne f.2", "f.1:", "    mov rax, 1", "f.2:", "    ret"],
+            ),
+            "salto encadenado": (
+                ["    cmp rax, 0", "    je f.1", "    ret", "f.1:", "    jmp f.2", "f.2:", "    mov rax, 1", "    ret"],
+                ["    cmp rax, 0", "    je f.2", "    ret", "f.1:", "    jmp f.2", "f.2:", "    mov rax, 1", "    ret"],
+            ),
+            "codigo inalcanzable": (
+                ["    ret", "    mov rax, 1", "    add rax, 2", "f.1:", "    ret"],
+                ["    ret", "f.1:", "    ret"],
+            ),
+            "etiqueta sin uso": (
+                ["global f", "f:", "    jmp f.2", "f.1:", "f.2:", "    ret"],
+                ["global f", "f:", "    jmp f.2", "f.2:", "    ret"],
+            ),
+            "fusion de comparacion y salto": (
+                [
+                    "    cmp rax, rbx", "    jl f.1", "    mov rax, 0", "    jmp f.2", "f.1:", "    mov rax, 1", "f.2:",
+                    "    test rax, rax", "    jz f.3", "    mov rax, 7", "f.3:", "    mov rax, 0", "    ret",
+                ],
+                ["    cmp rax, rbx", "    jge f.3", "    mov rax, 7", "f.3:", "    mov rax, 0", "    ret"],
+            ),
+        }
+        for regla, (codigo, esperado) in casos.items():
+            with self.subTest(regla):
+                self.assertEqual(aplicar(regla, codigo), (esperado, 1))
+    
+    def test_pila_a_registro(self):
+        # Si el medio no usa el destino del pop el valor va directo a el
+        codigo = ["    push rax", "    mov rax, [rbp - 8]", "    pop rcx", "    add rax, rcx", "    ret"]
+        self.assertEqual(
+            aplicar("pila a registro", codigo),
+            (["    mov rcx, rax", "    mov rax, [rbp - 8]", "    add rax, rcx", "    ret"], 1),
+        )
+        # Si lo usa, pasa por un registro auxiliar
+        codigo = ["    push rax", "    mov rcx, [rbp - 8]", "    mov rax, rcx", "    pop rcx", "    add rax, rcx", "    ret"]
+        self.assertEqual(
+            aplicar("pila a registro", codigo),
+            (["    mov r10, rax", "    mov rcx, [rbp - 8]", "    mov rax, rcx", "    mov rcx, r10", "    add rax, rcx", "    ret"], 1),
+        )
+    
+    def test_no_se_aplican(self):
+        casos = [
+            # rax se lee en el ret
+            ("copia directa", ["    mov rax, 5", "    mov [rbp - 8], rax", "    ret"]),
+            # rcx se lee despues del salto
+            ("escritura muerta", ["    mov rcx, 5", "    jmp f.1", "f.1:", "    mov rax, rcx", "    ret"]),
+            # rcx es argumento de la llamada
+            ("escritura muerta", ["    mov rcx, 5", "    call g", "    ret"]),
+            # No hay imul con destino en memoria
+            ("operacion en el lugar", ["    mov rax, [rbp - 8]", "    imul rax, 3", "    mov [rbp - 8], rax", "    mov rax, 0", "    ret"]),
+            ("push y pop", ["    push qword [rbp - 8]", "    pop qword [rbp - 16]", "    ret"]),
+            # La llamada del medio usa la pila
+            ("pila a registro", ["    push rax", "    call g", "    pop rcx", "    ret"]),
+            # Otro salto llega a f.1
+            ("fusion de comparacion y salto", [
+                "    jmp f.1", "    cmp rax, rbx", "    jl f.1", "    mov rax, 0", "    jmp f.2", "f.1:", "    mov rax, 1", "f.2:",
+                "    test rax, rax", "    jz f.3", "f.3:", "    mov rax, 0", "    ret",
+            ]),
+            # Las etiquetas de una tabla de saltos se usan como datos
+            ("etiqueta sin uso", ["global f", "f:", "    lea rcx, [f.t]", "    jmp [rcx + rax*8]", "f.t:", "    dq f.1", "f.1:", "    ret"]),
+        ]
+        for regla, codigo in casos:
+            with self.subTest(regla, codigo=codigo):
+                self.assertEqual(aplicar(regla, codigo), (codigo, 0))
+    
+    def test_vivo(self):
+        # Sin reglas, optimizar solo prepara las consultas sobre el codigo
+        optimizador = OptimizadorMirilla(set())
+        optimizador.optimizar(["    cmp rax, 0", "    je f.1", "    mov rdx, 1", "    ret", "f.1:", "    mov rax, rcx", "    ret"])
+        # rcx se lee en una de las dos ramas; rdx en ninguna
+        self.assertTrue(optimizador.vivo(0, "rcx"))
+        self.assertFalse(optimizador.vivo(0, "rdx"))
+
+
+class PruebaProgramas(unittest.TestCase):
+    def test_misma_salida_con_menos_instrucciones(self):
+        programa = parsear_texto(
+            "int suma(int n) { int s = 0; for (int i = 0; i < n; i++) { if (i * 2 > n) { s = s + i; } } return s; } "
+            "int main() { int x = 0; scanf(\"%d\", &x); print(suma(x)); print(x * 2 - 1); return 0; }"
+        )
+        generador_ir = GeneradorIR()
+        generador_ir.generar(construir_ir(programa))
+        directo = GeneradorEnsamblador(False)
+        directo.generar(programa)
+        sin_mirilla = contar_instrucciones(directo.codigo)
+        for generador in (directo, generador_ir):
+            with self.subTest(type(generador).__name__):
+                salida, ejecutadas, _ = simular(generador, [20])
+                instrucciones = contar_instrucciones(generador.codigo)
+                generador.codigo, reporte = optimizar_mirilla(generador.codigo)
+                self.assertEqual(simular(generador, [20])[0], salida)
+                self.assertLessEqual(simular(generador, [20])[1], ejecutadas)
+                self.assertEqual(reporte.instrucciones_antes, instrucciones)
+                self.assertEqual(reporte.instrucciones_despues, contar_instrucciones(generador.codigo))
+        # El generador directo sin registros deja mucho que limpiar
+        self.assertLess(contar_instrucciones(directo.codigo), sin_mirilla)
+
+
+if __name__ == "__main__":
+    unittest.main()
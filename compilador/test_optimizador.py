@@ -0,0 +1,63 @@
+# Casos del optimizador que deben seguir funcionando
+import unittest
+
+from generadorEnsamblador import GeneradorEnsamblador
+from nodes import NodoLlamadaFuncion
+from optimizador import EliminacionSubexpresiones, PipelineOptimizacion, optimizar_programa
+from parsear import parsear_texto
+from simulador import simular
+
+PROGRAMA = (
+    "int doble(int a) { return a * 2; } "
+    "int main() { int x = 3 + 4; int y = x * 1; if (0) { print(y); } print(doble(y) + 0); return 0; }"
+)
+
+
+def ejecutar(programa, entrada=()):
+    generador = GeneradorEnsamblador()
+    generador.generar(programa)
+    return simular(generador, entrada)[0]
+
+
+class PruebaPipeline(unittest.TestCase):
+    def test_aviso_sin_punto_fijo(self):
+        pipeline = PipelineOptimizacion(max_ejecuciones=1)
+        pipeline.optimizar(parsear_texto(PROGRAMA))
+        self.assertIn("main", pipeline.reporte.sin_converger)
+        self.assertIn("no llego a punto fijo", str(pipeline.reporte))
+    
+    def test_sin_aviso_al_converger(self):
+        pipeline = PipelineOptimizacion()
+        pipeline.optimizar(parsear_texto(PROGRAMA))
+        self.assertEqual(pipeline.reporte.sin_converger, {})
+        self.assertNotIn("aviso", str(pipeline.reporte))
+    
+    def test_contar_instrucciones(self):
+        pipeline = PipelineOptimizacion(contar_instrucciones=True)
+        pipeline.optimizar(parsear_texto(PROGRAMA))
+        self.assertEqual(set(pipeline.reporte.instrucciones), {"doble", "main"})
+        antes, despues = pipeline.reporte.instrucciones["main"]
+        self.assertLess(despues, antes)
+
+
+class PruebaExpansionEnLinea(unittest.TestCase):
+    def test_llamada_con_argumento_expandido(self):
+        # show no se expande (imprime), pero id dentro de su argumento si; la
+        # llamada a show tiene que quedar
+        programa = parsear_texto("int id(int a) { return a; } int show(int x) { print(x); } int main() { show(id(5)); return 0; }")
+        optimizado, _ = optimizar_programa(programa)
+        main = optimizado.funciones[-1]
+        self.assertTrue(any(isinstance(sentencia, NodoLlamadaFuncion) and sentencia.nombre == "show" for sentencia in main.cuerpo))
+        self.assertEqual(ejecutar(optimizado), "5")
+
+
+class PruebaEliminacionSubexpresiones(unittest.TestCase):
+    def test_llamada_sin_argumentos(self):
+        # Sin la expansion en linea antes, la llamada a f llega entera a la pasada
+        programa = parsear_texto("int f() { print(7); return 2; } int main() { print(f()); print(f() + 1); return 0; }")
+        optimizado = PipelineOptimizacion([EliminacionSubexpresiones]).optimizar(programa)
+        self.assertEqual(ejecutar(optimizado), "7273")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+# Despacho de la seleccion multiple: tabla de saltos o arbol de busqueda
+import itertools
+import unittest
+from types import SimpleNamespace
+
+from cadenas import TablaCadenas
+from parsear import parsear_texto
+from seleccion import cadena_de_casos, lineas_de_despacho
+from simulador import simular
+
+
+def despacho(valores):
+    etiquetas = (f"despacho.{n}" for n in itertools.count())
+    return lineas_de_despacho("rax", [(valor, f"caso.{valor}") for valor in valores], "caso.defecto", lambda: next(etiquetas))
+
+
+def destino(lineas, valores, valor):
+    # Valor que imprime el caso al que salta el despacho; None para el defecto
+    codigo = ["main:", f"    mov rax, {valor}", *lineas]
+    for caso in valores:
+        codigo.extend([f"caso.{caso}:", f"    mov rdx, {caso}", "    jmp imprimir"])
+    codigo.extend([
+        "caso.defecto:", "    lea rcx, [fmt_newline]", "    call printf", "    call ExitProcess",
+        "imprimir:", "    lea rcx, [fmt_str_d]", "    call printf", "    call ExitProcess",
+    ])
+    salida = simular(SimpleNamespace(codigo=codigo, cadenas=TablaCadenas()))[0]
+    return None if salida == "\n" else int(salida)
+
+
+class PruebaDespacho(unittest.TestCase):
+    def comprobar(self, valores):
+        # Cada caso, sus vecinos y los dos lados del rango
+        lineas = despacho(valores)
+        probados = {vecino for valor in valores for vecino in (valor - 1, valor, valor + 1)}
+        for valor in sorted(probados | {min(valores) - 3, max(valores) + 3}):
+            with self.subTest(valor=valor):
+                self.assertEqual(destino(lineas, valores, valor), valor if valor in valores else None)
+        return lineas
+    
+    def test_tabla(self):
+        for valores in ([0, 1, 2, 3], [3, 1, 4, 6, 5], [-2, -1, 1, 2], [10, 12, 13, 15]):
+            with self.subTest(valores=valores):
+                lineas = self.comprobar(valores)
+                self.assertIn("    jmp [rcx + rax*8]", lineas)
+                self.assertEqual(sum(linea.startswith("    dq ") for linea in lineas), max(valores) - min(valores) + 1)
+    
+    def test_tabla_con_huecos(self):
+        # Los valores que faltan en el rango van al defecto
+        lineas = despacho([1, 2, 5, 6])
+        self.assertEqual(lineas, [
+            "    sub rax, 1",
+            "    cmp rax, 5",
+            "    ja caso.defecto",
+            "    lea rcx, [despacho.0]",
+            "    jmp [rcx + rax*8]",
+            "despacho.0:",
+            "    dq caso.1",
+            "    dq caso.2",
+            "    dq caso.defecto",
+            "    dq caso.defecto",
+            "    dq caso.5",
+            "    dq caso.6",
+        ])
+    
+    def test_arbol(self):
+        for valores in ([1, 100, 1000, 10000], [-500, -3, 7, 90, 400, 2000, 9000, 77777], list(range(0, 3000, 100))):
+            with self.subTest(valores=valores):
+                lineas = self.comprobar(valores)
+                self.assertFalse(any(linea.startswith("    dq ") for linea in lineas))
+                # Cada caso se compara una sola vez en todo el arbol
+                self.assertEqual(sum(linea.startswith("    je ") for linea in lineas), len(valores))
+
+
+class PruebaCadenaDeCasos(unittest.TestCase):
+    def condicional(self, fuente):
+        return parsear_texto(f"int main() {{ int x = 2; {fuente} return 0; }}").funciones[0].cuerpo[1]
+    
+    def test_cadena(self):
+        cadena = cadena_de_casos(self.condicional(
+            "if (x == 1) { print(1); } else if (2 == x) { print(2); } else if (x == 1) { print(9); } "
+            "else if (x == 3) { print(3); } else if (x == 4) { print(4); } else { print(0); }"
+        ))
+        self.assertEqual(cadena.variable.nombre, "x")
+        # El segundo x == 1 no se alcanza nunca
+        self.assertEqual([valor for valor, _ in cadena.casos], [1, 2, 3, 4])
+        self.assertEqual(len(cadena.defecto), 1)
+    
+    def test_no_es_cadena(self):
+        casos = {
+            "pocos casos": "if (x == 1) { print(1); } else if (x == 2) { print(2); } else if (x == 3) { print(3); }",
+            "otra condicion al principio": (
+                "if (x > 1) { print(1); } else if (x == 2) { print(2); } else if (x == 3) { print(3); } "
+                "else if (x == 4) { print(4); } else if (x == 5) { print(5); }"
+            ),
+        }
+        for nombre, fuente in casos.items():
+            with self.subTest(nombre):
+                self.assertIsNone(cadena_de_casos(self.condicional(fuente)))
+
+
+if __name__ == "__main__":
+    unittest.main()